@@ -1,4 +1,4 @@
-from flask import Flask, render_template_string, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, g, has_request_context, render_template, request, jsonify, stream_with_context
 import requests
 import json
 import warnings
@@ -6,31 +6,368 @@ import re
 import uuid
 import os
 import sqlite3
+import threading
 import hashlib
+import logging
+import math
+import time
+from array import array
 from datetime import datetime, timedelta
-from contextlib import contextmanager
+from contextlib import closing, contextmanager
+from functools import lru_cache
+
+from config import get_config
+from metrics import REGISTRY, create_shared_metrics
+from structured_logging import configure_logging
+from near_duplicate import SimHashIndex, band_keys, to_unsigned
+from static_assets import AssetBundle, choose_encoding
+from response_compression import ResponseCompression, compress_stream
+from request_profiler import RequestProfiler
+from shared_cache import TieredCache, create_backend
+from rate_limit import RateLimiter, create_store as create_rate_limit_store
+from graceful_shutdown import GracefulShutdown
+from client_disconnect import ClientDisconnected, client_socket, run_cancellable
+from langflow_health import LangflowMonitor
+from message_archive import SegmentStore
+from message_codec import ContentCodec
+from conversation_summary import (
+    ExtractiveSummarizer, LangflowSummarizer, SummaryScheduler, get_summary_context
+)
 
 # Suprimir ResourceWarning temporariamente
 warnings.filterwarnings("ignore", category=ResourceWarning)
 
-app = Flask(__name__)
+# Rotas e hooks da aplicação (registrados em create_app)
+routes = Blueprint('chatbot', __name__)
 
 # Configuração do banco de dados
-DATABASE = 'chatbot_memory.db'
+DATABASE = os.environ.get('DATABASE_PATH', 'chatbot_memory.db')
+# Arquivo frio do histórico (ver message_archive.py e archive_worker.py).
+# Vazio: diretório <banco>_archive ao lado do banco
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', '')
+ARCHIVE_CODEC = os.environ.get('ARCHIVE_CODEC', 'zlib')
+# Compressão do conteúdo das mensagens na tabela (ver message_codec.py): off, zlib ou zstd
+MESSAGE_CODEC = os.environ.get('MESSAGE_CODEC', 'zlib')
+MESSAGE_COMPRESS_MIN_BYTES = int(os.environ.get('MESSAGE_COMPRESS_MIN_BYTES', '1024'))
+# Versão do esquema gravada em PRAGMA user_version; incrementar a cada mudança em init_database
+SCHEMA_VERSION = 8
+
+# Configuração de debug - registra um evento estruturado por mensagem do /chat
+# (nível, formato, amostragem e limite de taxa: ver structured_logging.py)
+DEBUG_MEMORY = os.environ.get('DEBUG_MEMORY', '1') == '1'
+logger = configure_logging()
+
+# Configuração de embeddings (vector store local em SQLite)
+# Se EMBEDDING_API_URL estiver definido, usa um endpoint compatível com /v1/embeddings;
+# caso contrário, usa o embedder local por hashing de tokens
+EMBEDDING_API_URL = os.environ.get('EMBEDDING_API_URL', '')
+EMBEDDING_MODEL = os.environ.get('EMBEDDING_MODEL', 'local-hashing-v1')
+EMBEDDING_DIM = int(os.environ.get('EMBEDDING_DIM', '256'))
+
+# Configuração da compressão das respostas JSON
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+
+# Tamanho máximo de página do histórico paginado
+MAX_PAGE_SIZE = 500
+
+# Embutir a página mais recente da conversa no HTML inicial (evita a requisição extra do histórico)
+INLINE_INITIAL_CONVERSATION = os.environ.get('INLINE_INITIAL_CONVERSATION', '0') == '1'
+INITIAL_PAGE_SIZE = 100  # Mesmo tamanho de página usado pelo front end
+
+# Configuração do Langflow
+LANGFLOW_URL = os.environ.get('LANGFLOW_URL', 'http://localhost:7860')
+FLOW_ID = os.environ.get('LANGFLOW_FLOW_ID', '7da02070-24ec-4cc2-bb99-e089ce0cc283')
+# API de cancelamento de execuções (vazio: não suportada). Cada execução vai com o
+# cabeçalho X-Run-Id; o caminho recebe {run_id}, ex.: /api/v1/runs/{run_id}/cancel
+LANGFLOW_CANCEL_PATH = os.environ.get('LANGFLOW_CANCEL_PATH', '')
+# Aquecimento na subida (ver langflow_health.py): o prompt só é enviado com LANGFLOW_WARMUP
+# na configuração (produção); vazio desativa o prompt
+LANGFLOW_WARMUP_PROMPT = os.environ.get('LANGFLOW_WARMUP_PROMPT', 'Olá')
+LANGFLOW_WARM_CONNECTIONS = int(os.environ.get('LANGFLOW_WARM_CONNECTIONS', '4'))
+# Intervalo da sonda de saúde que alimenta o indicador de status e a rota /ready (0 desativa)
+LANGFLOW_PROBE_INTERVAL = float(os.environ.get('LANGFLOW_PROBE_INTERVAL', '30'))
+
+# Configuração dos resumos de longo prazo da conversa
+# SUMMARY_BACKEND: 'local' (extrativo), 'langflow' ou 'off'
+SUMMARY_BACKEND = os.environ.get('SUMMARY_BACKEND', 'local')
+SUMMARY_EVERY_TURNS = int(os.environ.get('SUMMARY_EVERY_TURNS', '10'))
+SUMMARY_KEEP_RECENT = 12  # Mesmo tamanho da janela de contexto usada no /chat
+SUMMARY_MAX_CHARS = int(os.environ.get('SUMMARY_MAX_CHARS', '1200'))
+
+# Configuração da detecção de perguntas quase duplicadas (SimHash)
+NEAR_DUPLICATE_ENABLED = os.environ.get('NEAR_DUPLICATE_ENABLED', '1') == '1'
+NEAR_DUPLICATE_MAX_DISTANCE = int(os.environ.get('NEAR_DUPLICATE_MAX_DISTANCE', '5'))
+NEAR_DUPLICATE_MAX_AGE_HOURS = int(os.environ.get('NEAR_DUPLICATE_MAX_AGE_HOURS', '168'))
+# Se ativo, a resposta armazenada é devolvida sem chamar o Langflow (por padrão ela só é
+# indicada na resposta do /chat, e o agente responde normalmente)
+NEAR_DUPLICATE_SKIP_AGENT = os.environ.get('NEAR_DUPLICATE_SKIP_AGENT', '0') == '1'
+
+# Profiling sob demanda (cabeçalho X-Profile + X-Admin-Token); desligado sem ADMIN_TOKEN
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_KEEP_SLOWEST = int(os.environ.get('PROFILE_KEEP_SLOWEST', '20'))
+
+# Métricas e estatísticas SQL somadas entre os workers (ver metrics.SharedMetrics):
+# 'memory' mostra só o processo que atende; o gunicorn.conf.py usa SQLite com mais de um worker
+METRICS_URL = os.environ.get('METRICS_URL', 'memory')
+METRICS_PUBLISH_SECONDS = float(os.environ.get('METRICS_PUBLISH_SECONDS', '5'))
+
+# Consultas SQL mais lentas que isto (execução + leitura das linhas) vão para o log
+DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', '100'))
+
+# Cache das respostas e do HTML renderizado: LRU no processo na frente de um nível
+# compartilhado entre os workers (SQLite local por padrão, Redis opcional, 'memory' desliga)
+CACHE_URL = os.environ.get('CACHE_URL', f"sqlite:///{os.path.splitext(DATABASE)[0]}_cache.db")
+CACHE_LOCAL_ITEMS = int(os.environ.get('CACHE_LOCAL_ITEMS', '256'))
+# O HTML depende do código de renderização: o TTL limita quanto tempo uma versão antiga sobrevive a um deploy
+CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', str(24 * 3600)))
+
+# Limite de requisições por usuário (token bucket por hash do IP): o /chat dispara uma
+# execução do agente, as rotas de leitura só consultam o banco. Rajada = requisições
+# aceitas de uma vez; RATE_LIMIT_URL=sqlite:///arquivo.db compartilha os baldes entre workers
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_CHAT_PER_MINUTE = float(os.environ.get('RATE_LIMIT_CHAT_PER_MINUTE', '10'))
+RATE_LIMIT_CHAT_BURST = int(os.environ.get('RATE_LIMIT_CHAT_BURST', '5'))
+RATE_LIMIT_READ_PER_MINUTE = float(os.environ.get('RATE_LIMIT_READ_PER_MINUTE', '300'))
+RATE_LIMIT_READ_BURST = int(os.environ.get('RATE_LIMIT_READ_BURST', '60'))
+# 'memory': cada processo tem os próprios baldes, então com N workers o limite efetivo
+# chega a N vezes o configurado (o gunicorn.conf.py usa um arquivo SQLite com mais de um worker)
+RATE_LIMIT_URL = os.environ.get('RATE_LIMIT_URL', 'memory')
+
+# Chaves de idempotência do /chat (cabeçalho Idempotency-Key, gerado pelo front end)
+IDEMPOTENCY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24'))
+# Quanto um reenvio espera pela execução original ainda em andamento antes do 409 com Retry-After
+# (espera curta: segurar o worker pelo timeout inteiro do Langflow esgotaria o pool; o front end repete)
+IDEMPOTENCY_WAIT_SECONDS = min(int(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '3')), 10)
+# Execução em andamento há mais que isto: o processo morreu, o reenvio assume a chave
+IDEMPOTENCY_STALE_SECONDS = 1260
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,128}$')
+
+# Desligamento gracioso: prazo para os /chat em andamento terminarem depois do SIGTERM
+# (no gunicorn vira o graceful_timeout; o orquestrador precisa esperar pelo menos isso)
+SHUTDOWN_DRAIN_SECONDS = int(os.environ.get('SHUTDOWN_DRAIN_SECONDS', '120'))
+
+# Métricas (expostas em /metrics no formato do Prometheus)
+REQUEST_LATENCY = REGISTRY.histogram('http_request_duration_seconds', 'Duração das requisições por rota', ('route', 'method'))
+REQUESTS_TOTAL = REGISTRY.counter('http_requests_total', 'Requisições atendidas por rota e status', ('route', 'method', 'status'))
+REQUESTS_IN_FLIGHT = REGISTRY.gauge('http_requests_in_flight', 'Requisições em andamento')
+CHAT_STAGE_LATENCY = REGISTRY.histogram('chat_stage_duration_seconds', 'Duração de cada etapa do /chat', ('stage',))
+DB_QUERIES = REGISTRY.counter('db_queries_total', 'Consultas SQL executadas por tipo de comando', ('statement',))
+DB_QUERY_LATENCY = REGISTRY.histogram('db_query_duration_seconds', 'Duração das consultas SQL (execução + leitura das linhas)', ('statement',))
+DB_ROWS = REGISTRY.counter('db_rows_total', 'Linhas lidas ou alteradas por tipo de comando', ('statement',))
+DB_QUERIES_PER_REQUEST = REGISTRY.histogram('db_queries_per_request', 'Consultas SQL por requisição', ('route',),
+                                            buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55))
+LANGFLOW_RESPONSES = REGISTRY.counter('langflow_responses_total', 'Respostas do Langflow por status HTTP', ('status',))
+LANGFLOW_IN_FLIGHT = REGISTRY.gauge('langflow_requests_in_flight', 'Chamadas ao Langflow em andamento')
+LANGFLOW_UP = REGISTRY.gauge('langflow_up', 'Resultado da última sonda de saúde do Langflow (1 no ar)',
+                             multiprocess_mode='livemax')
+CHAT_CANCELLED = REGISTRY.counter('chat_cancelled_total', 'Execuções do agente canceladas porque o cliente desconectou', ('cancel_api',))
+CHAT_REPLAYS = REGISTRY.counter('chat_idempotent_replays_total', 'Reenvios do /chat com chave de idempotência já usada', ('result',))
+RATE_LIMITED = REGISTRY.counter('rate_limited_total', 'Requisições recusadas pelo limite por usuário', ('budget',))
+CACHE_LOOKUPS = REGISTRY.counter('cache_lookups_total', 'Consultas aos caches por nível e resultado', ('cache', 'tier', 'result'))
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """SQL em uma linha só (chave das estatísticas por comando)"""
+    return ' '.join(sql.split())
+
+def record_db_query(sql):
+    """Contabiliza uma consulta SQL (total por comando e por requisição)"""
+    DB_QUERIES.inc(statement=sql.lstrip().split(None, 1)[0].upper())
+    if has_request_context():
+        g.db_queries = g.get('db_queries', 0) + 1
+
+class QueryStats:
+    """Tempo e linhas acumulados por comando SQL (normalizado)"""
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+    
+    def record(self, statement, seconds, rows):
+        with self._lock:
+            stats = self._stats.get(statement)
+            if stats is None:
+                stats = self._stats[statement] = [0, 0.0, 0.0, 0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] += rows
+    
+    def snapshot(self, limit=50):
+        """Comandos ordenados pelo tempo total gasto"""
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: -item[1][1])[:limit]
+        return [{
+            'sql': statement,
+            'calls': calls,
+            'total_ms': round(total * 1000, 3),
+            'mean_ms': round(total * 1000 / calls, 3),
+            'max_ms': round(maximum * 1000, 3),
+            'rows': rows
+        } for statement, (calls, total, maximum, rows) in items]
+    
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+    
+    def state(self):
+        """Estatísticas em formato JSON (publicadas pelos workers, ver SharedMetrics)"""
+        with self._lock:
+            return {statement: list(stats) for statement, stats in self._stats.items()}
+    
+    @classmethod
+    def merge(cls, states):
+        """Estatísticas somadas de vários processos"""
+        merged = cls()
+        for state in states:
+            for statement, (calls, total, maximum, rows) in state.items():
+                stats = merged._stats.setdefault(statement, [0, 0.0, 0.0, 0])
+                stats[0] += calls
+                stats[1] += total
+                stats[2] = max(stats[2], maximum)
+                stats[3] += rows
+        return merged
+
+QUERY_STATS = QueryStats()
+shared_metrics = create_shared_metrics(METRICS_URL, REGISTRY, sources={'query_stats': QUERY_STATS},
+                                       interval=METRICS_PUBLISH_SECONDS)
+
+# Lista dos comandos SQL executados; usada pela verificação de planos nos testes
+QUERY_CAPTURE = None
+
+@contextmanager
+def capture_queries():
+    """Registra todos os comandos SQL executados dentro do bloco"""
+    global QUERY_CAPTURE
+    QUERY_CAPTURE = captured = []
+    try:
+        yield captured
+    finally:
+        QUERY_CAPTURE = None
+
+def record_query_timing(statement, seconds, rows):
+    """Registra o tempo e as linhas de um comando; loga se passar do limite de lentidão"""
+    kind = statement.split(None, 1)[0].upper()
+    DB_QUERY_LATENCY.observe(seconds, statement=kind)
+    DB_ROWS.inc(rows, statement=kind)
+    QUERY_STATS.record(statement, seconds, rows)
+    if seconds * 1000 >= DB_SLOW_QUERY_MS:
+        # Sem os parâmetros: eles carregam o texto das mensagens
+        logger.warning('slow_query', extra={'fields': {
+            'sql': statement[:500],
+            'duration_ms': round(seconds * 1000, 2),
+            'rows': rows
+        }})
+
+class CountingCursor(sqlite3.Cursor):
+    """Cursor que contabiliza as consultas e mede tempo e linhas de cada uma.
+    
+    A medição de um SELECT inclui a leitura das linhas e é fechada no fetchone/fetchall
+    (ou no próximo execute); comandos sem linhas são fechados no próprio execute.
+    """
+    _statement = None
+    
+    def _begin(self, sql):
+        self._finish()
+        record_db_query(sql)
+        self._statement = normalize_sql(sql)
+        self._elapsed = 0.0
+        self._rows = 0
+        if QUERY_CAPTURE is not None:
+            QUERY_CAPTURE.append(self._statement)
+    
+    def _finish(self):
+        if self._statement is not None:
+            statement, self._statement = self._statement, None
+            record_query_timing(statement, self._elapsed, self._rows)
+    
+    def _executed(self, started):
+        self._elapsed += time.perf_counter() - started
+        if self.description is None:
+            self._rows = max(self.rowcount, 0)
+            self._finish()
+    
+    def execute(self, sql, parameters=()):
+        self._begin(sql)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._executed(started)
+    
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._executed(started)
+    
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        if self._statement is not None:
+            self._elapsed += time.perf_counter() - started
+            self._rows += row is not None
+            self._finish()
+        return row
+    
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        if self._statement is not None:
+            self._elapsed += time.perf_counter() - started
+            self._rows += len(rows)
+            self._finish()
+        return rows
 
-# Configuração de debug - altere para False em produção
-DEBUG_MEMORY = True
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexão cujos cursores são instrumentados"""
+    def cursor(self, factory=CountingCursor):
+        return super().cursor(factory)
 
 class DatabaseManager:
-    def __init__(self, db_path=DATABASE):
+    def __init__(self, db_path=DATABASE, archive_dir=None, content_codec=None):
         self.db_path = db_path
+        self._local = threading.local()
+        # Mensagens antigas saem da tabela quente para segmentos comprimidos (lidos sob demanda)
+        self.archive = SegmentStore(archive_dir or os.path.splitext(db_path)[0] + '_archive', ARCHIVE_CODEC)
+        # Mensagens grandes ficam comprimidas na coluna content (lidas por message_content() no SQL)
+        self.content_codec = ContentCodec(content_codec or MESSAGE_CODEC, MESSAGE_COMPRESS_MIN_BYTES,
+                                          dictionary_loader=self._load_content_dictionary)
         self.init_database()
     
+    def _connect(self, timeout=5.0):
+        """Conexão instrumentada com o banco, aberta uma vez por thread e por processo
+        (uma conexão SQLite não pode ser usada depois do fork, então o PID faz parte da chave)"""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = sqlite3.connect(self.db_path, timeout=timeout, factory=InstrumentedConnection)
+            local.conn.create_function('message_content', 2, self.content_codec.decode, deterministic=True)
+            local.pid = os.getpid()
+            local.timeout = timeout
+        elif local.timeout != timeout:
+            local.conn.execute(f'PRAGMA busy_timeout = {int(timeout * 1000)}')
+            local.timeout = timeout
+        return local.conn
+    
     def init_database(self):
-        """Inicializa o banco de dados e cria as tabelas necessárias"""
-        with sqlite3.connect(self.db_path) as conn:
+        """Inicializa o banco de dados e cria as tabelas necessárias.
+        
+        Banco já na versão atual do esquema (PRAGMA user_version): nenhum DDL é executado.
+        O modo WAL (leitores não bloqueiam o escritor) fica gravado no arquivo; o PRAGMA só
+        converte bancos criados antes dele e não custa nada nos demais.
+        """
+        with self._connect() as conn:
             cursor = conn.cursor()
             
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute('PRAGMA user_version')
+            if cursor.fetchone()[0] >= SCHEMA_VERSION:
+                return
+            
             # Tabela de usuários (identificados por IP)
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS users (
@@ -61,12 +398,17 @@ class DatabaseManager:
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     conversation_id INTEGER,
                     message_type TEXT NOT NULL, -- 'user' ou 'ai'
-                    content TEXT NOT NULL,
+                    content TEXT NOT NULL, -- texto, ou BLOB comprimido conforme content_codec
                     timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     response_id TEXT UNIQUE,
+                    content_codec TEXT, -- NULL (texto puro), 'zlib', 'zstd' ou 'zstd:<dicionário>'
                     FOREIGN KEY (conversation_id) REFERENCES conversations (id)
                 )
             ''')
+            # Bancos criados antes da compressão do conteúdo (esquema < 4)
+            cursor.execute('PRAGMA table_info(messages)')
+            if 'content_codec' not in {column[1] for column in cursor.fetchall()}:
+                cursor.execute('ALTER TABLE messages ADD COLUMN content_codec TEXT')
             
             # Índices para melhor performance
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_users_ip_hash ON users (ip_hash)')
@@ -74,13 +416,166 @@ class DatabaseManager:
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_conversation_id ON messages (conversation_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp)')
             
+            # Tabela de embeddings das mensagens (vector store)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS message_embeddings (
+                    message_id INTEGER PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (message_id) REFERENCES messages (id)
+                )
+            ''')
+            
+            # Resumos hierárquicos da conversa (level 0 = mensagens, level N = resumos do nível N-1)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS conversation_summaries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id INTEGER NOT NULL,
+                    level INTEGER NOT NULL DEFAULT 0,
+                    start_message_id INTEGER NOT NULL,
+                    end_message_id INTEGER NOT NULL,
+                    content TEXT NOT NULL,
+                    superseded_by INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    FOREIGN KEY (conversation_id) REFERENCES conversations (id)
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_summaries_conversation_id ON conversation_summaries (conversation_id, level)')
+            # Uma faixa por nível: dois workers resumindo a mesma faixa gravam um único resumo
+            # (bancos anteriores ao índice, esquema < 8: as duplicatas apontam para o primeiro resumo)
+            cursor.execute('''
+                UPDATE conversation_summaries SET superseded_by = (
+                    SELECT MIN(k.id) FROM conversation_summaries d
+                    JOIN conversation_summaries k ON k.conversation_id = d.conversation_id
+                        AND k.level = d.level AND k.start_message_id = d.start_message_id
+                    WHERE d.id = conversation_summaries.superseded_by
+                )
+                WHERE superseded_by IS NOT NULL
+            ''')
+            # ... e o resumo mantido herda a condensação de uma duplicata já condensada
+            cursor.execute('''
+                UPDATE conversation_summaries SET superseded_by = (
+                    SELECT MIN(d.superseded_by) FROM conversation_summaries d
+                    WHERE d.conversation_id = conversation_summaries.conversation_id
+                        AND d.level = conversation_summaries.level
+                        AND d.start_message_id = conversation_summaries.start_message_id
+                )
+                WHERE superseded_by IS NULL
+            ''')
+            cursor.execute('''
+                DELETE FROM conversation_summaries WHERE id NOT IN (
+                    SELECT MIN(id) FROM conversation_summaries GROUP BY conversation_id, level, start_message_id
+                )
+            ''')
+            cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_summaries_range ON conversation_summaries (conversation_id, level, start_message_id)')
+            
+            # Impressões SimHash das perguntas (detecção de perguntas quase duplicadas).
+            # Cada resposta foi gerada com o histórico do próprio usuário: só é reaproveitada para ele
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS question_fingerprints (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    fingerprint INTEGER NOT NULL,
+                    response_id TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    user_id INTEGER
+                )
+            ''')
+            # Bancos criados antes do escopo por usuário (esquema < 5): as impressões antigas
+            # ficam sem usuário e nunca são reaproveitadas
+            cursor.execute('PRAGMA table_info(question_fingerprints)')
+            if 'user_id' not in {column[1] for column in cursor.fetchall()}:
+                cursor.execute('ALTER TABLE question_fingerprints ADD COLUMN user_id INTEGER')
+            cursor.execute('DROP INDEX IF EXISTS idx_question_fingerprints_user')
+            cursor.execute('DROP INDEX IF EXISTS idx_question_fingerprints_created_at')
+            
+            # Tabela de bandas do SimHash: consultada a cada pergunta, por todos os workers
+            # (band_key = banda * 256 + valor dos 8 bits da banda, ver near_duplicate.band_keys)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS question_fingerprint_bands (
+                    user_id INTEGER NOT NULL,
+                    band_key INTEGER NOT NULL,
+                    fingerprint_id INTEGER NOT NULL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_question_fingerprint_bands ON question_fingerprint_bands (user_id, band_key, fingerprint_id)')
+            # Impressões gravadas antes da tabela de bandas (esquema < 7)
+            cursor.execute('''
+                SELECT id, user_id, fingerprint FROM question_fingerprints
+                WHERE user_id IS NOT NULL AND id NOT IN (SELECT fingerprint_id FROM question_fingerprint_bands)
+            ''')
+            cursor.executemany(
+                'INSERT INTO question_fingerprint_bands (user_id, band_key, fingerprint_id) VALUES (?, ?, ?)',
+                [(user_id, key, fingerprint_id) for fingerprint_id, user_id, fingerprint in cursor.fetchall()
+                 for key in band_keys(to_unsigned(fingerprint))]
+            )
+            
+            # Checkpoints dos workers em background (permite retomar o processamento)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS worker_checkpoints (
+                    name TEXT PRIMARY KEY,
+                    last_id INTEGER NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Chaves de idempotência do /chat: um reenvio com a mesma chave não executa o agente de novo
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS chat_requests (
+                    user_id INTEGER NOT NULL,
+                    idempotency_key TEXT NOT NULL,
+                    message_hash TEXT NOT NULL,
+                    status TEXT NOT NULL, -- 'in_progress', 'completed' ou 'failed'
+                    response_id TEXT,
+                    user_message_id INTEGER,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (user_id, idempotency_key)
+                )
+            ''')
+            
+            # Índice do arquivo frio: blocos de mensagens (faixas contíguas de ids de uma conversa)
+            # gravados nos segmentos comprimidos, e as respostas arquivadas por response_id
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS archive_blocks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id INTEGER NOT NULL,
+                    first_id INTEGER NOT NULL,
+                    last_id INTEGER NOT NULL,
+                    message_count INTEGER NOT NULL,
+                    segment TEXT NOT NULL,
+                    byte_offset INTEGER NOT NULL,
+                    byte_length INTEGER NOT NULL,
+                    codec TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_archive_blocks_conversation ON archive_blocks (conversation_id, last_id)')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS archived_responses (
+                    response_id TEXT PRIMARY KEY,
+                    block_id INTEGER NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            
+            # Dicionários zstd treinados com as próprias mensagens (content_codec = 'zstd:<id>')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS content_dictionaries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    data BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            
+            cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
             conn.commit()
     
     def get_user_id(self, ip_address):
         """Obtém ou cria um usuário baseado no IP"""
         ip_hash = hashlib.sha256(ip_address.encode()).hexdigest()
         
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Tentar encontrar usuário existente
@@ -105,7 +600,7 @@ class DatabaseManager:
     
     def get_current_conversation_id(self, user_id):
         """Obtém ou cria uma conversa única para o usuário (sem sessões separadas)"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Procurar conversa existente do usuário (sempre a mesma)
@@ -136,13 +631,14 @@ class DatabaseManager:
     
     def save_message(self, conversation_id, message_type, content, response_id=None):
         """Salva uma mensagem no banco"""
-        with sqlite3.connect(self.db_path) as conn:
+        stored, codec = self.content_codec.encode(content)
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
-                INSERT INTO messages (conversation_id, message_type, content, response_id, timestamp) 
-                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (conversation_id, message_type, content, response_id))
+                INSERT INTO messages (conversation_id, message_type, content, content_codec, response_id, timestamp) 
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (conversation_id, message_type, stored, codec, response_id))
             
             # Atualizar última mensagem da conversa
             cursor.execute('''
@@ -162,11 +658,11 @@ class DatabaseManager:
     
     def get_conversation_history(self, user_id, limit=20):
         """Obtém histórico recente de conversas do usuário"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
-                SELECT m.message_type, m.content, m.timestamp 
+                SELECT m.message_type, message_content(m.content, m.content_codec), m.timestamp 
                 FROM messages m
                 JOIN conversations c ON m.conversation_id = c.id
                 WHERE c.user_id = ?
@@ -178,11 +674,11 @@ class DatabaseManager:
     
     def get_recent_session_messages(self, conversation_id, limit=6):
         """Obtém as mensagens mais recentes de uma conversa específica para contexto"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
-                SELECT message_type, content, timestamp 
+                SELECT message_type, message_content(content, content_codec), timestamp 
                 FROM messages 
                 WHERE conversation_id = ?
                 ORDER BY timestamp DESC
@@ -192,14 +688,20 @@ class DatabaseManager:
             return cursor.fetchall()
     
     def get_user_conversations(self, user_id):
-        """Lista todas as conversas do usuário"""
-        with sqlite3.connect(self.db_path) as conn:
+        """Lista todas as conversas do usuário.
+        A prévia é a primeira pergunta ainda na tabela quente: a linha é escolhida pelo MIN(id)
+        e só ela passa por message_content (as demais não são descomprimidas)"""
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
                 SELECT c.id, c.session_id, c.created_at, c.last_message_at, c.title,
-                       COUNT(m.id) as message_count,
-                       MAX(CASE WHEN m.message_type = 'user' THEN m.content END) as first_message
+                       COUNT(m.id) + COALESCE((
+                           SELECT SUM(a.message_count) FROM archive_blocks a WHERE a.conversation_id = c.id
+                       ), 0) as message_count,
+                       (SELECT message_content(p.content, p.content_codec) FROM messages p
+                        WHERE p.id = (SELECT MIN(f.id) FROM messages f
+                                      WHERE f.conversation_id = c.id AND f.message_type = 'user')) as first_message
                 FROM conversations c
                 LEFT JOIN messages m ON c.id = m.conversation_id
                 WHERE c.user_id = ?
@@ -209,9 +711,10 @@ class DatabaseManager:
             
             return cursor.fetchall()
     
-    def get_conversation_messages(self, conversation_id, user_id):
-        """Obtém todas as mensagens de uma conversa específica"""
-        with sqlite3.connect(self.db_path) as conn:
+    def get_conversation_messages(self, conversation_id, user_id, limit=None):
+        """Obtém as mensagens de uma conversa específica, em ordem cronológica.
+        Com limit: só as limit mais recentes (o arquivo só é lido se a tabela quente não bastar)"""
+        with self._connect() as conn:
             cursor = conn.cursor()
             
             # Verificar se a conversa pertence ao usuário
@@ -224,17 +727,83 @@ class DatabaseManager:
                 return []
             
             cursor.execute('''
-                SELECT message_type, content, timestamp, response_id
+                SELECT message_type, message_content(content, content_codec), timestamp, response_id
                 FROM messages 
                 WHERE conversation_id = ?
-                ORDER BY timestamp ASC
-            ''', (conversation_id,))
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (conversation_id, -1 if limit is None else limit))
+            rows = cursor.fetchall()
+        
+        # As arquivadas são todas mais antigas que as da tabela
+        if limit is None or len(rows) < limit:
+            remaining = None if limit is None else limit - len(rows)
+            rows += [row[1:] for row in self._archived_messages(conversation_id, before_id=2 ** 63 - 1,
+                                                                 limit=remaining)]
+        rows.reverse()
+        return rows
+    
+    def get_conversation_messages_page(self, conversation_id, before_id=None, limit=100):
+        """Obtém uma página de mensagens (as mais recentes antes de before_id), em ordem cronológica.
+        Retorna (mensagens, has_more)"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
             
-            return cursor.fetchall()
+            cursor.execute('''
+                SELECT id, message_type, message_content(content, content_codec), timestamp, response_id
+                FROM messages
+                WHERE conversation_id = ? AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (conversation_id, before_id if before_id is not None else 2 ** 63 - 1, limit + 1))
+            
+            rows = cursor.fetchall()
+        
+        # Página que passa do início da tabela quente: continua no arquivo
+        if len(rows) <= limit:
+            boundary = rows[-1][0] if rows else (before_id if before_id is not None else 2 ** 63 - 1)
+            rows += self._archived_messages(conversation_id, before_id=boundary, limit=limit + 1 - len(rows))
+        
+        has_more = len(rows) > limit
+        return list(reversed(rows[:limit])), has_more
+    
+    def get_messages_since(self, conversation_id, since_id, limit=500):
+        """Obtém as mensagens com id maior que since_id, em ordem cronológica (até limit + 1 linhas)"""
+        archived = self._archived_messages(conversation_id, after_id=since_id, limit=limit + 1)
+        if len(archived) > limit:
+            return archived
+        
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, message_type, message_content(content, content_codec), timestamp, response_id
+                FROM messages
+                WHERE conversation_id = ? AND id > ?
+                ORDER BY id ASC
+                LIMIT ?
+            ''', (conversation_id, since_id, limit + 1 - len(archived)))
+            
+            return archived + cursor.fetchall()
+    
+    def get_conversation_version(self, conversation_id):
+        """Versão da conversa: id da última mensagem (muda a cada mensagem nova) e blocos
+        arquivados (muda quando o arquivamento move mensagens para o arquivo frio)"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT MAX(id) FROM messages WHERE conversation_id = ?', (conversation_id,))
+            last_id = cursor.fetchone()[0]
+            
+            cursor.execute('SELECT MAX(last_id), COUNT(*) FROM archive_blocks WHERE conversation_id = ?',
+                           (conversation_id,))
+            archived_last_id, blocks = cursor.fetchone()
+            
+            return f"{conversation_id}-{max(last_id or 0, archived_last_id or 0)}-{blocks}"
     
     def update_conversation_title(self, conversation_id, title):
         """Atualiza o título de uma conversa"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._connect() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE conversations 
@@ -242,28 +811,722 @@ class DatabaseManager:
                 WHERE id = ?
             ''', (title, conversation_id))
     
-    def search_conversations(self, user_id, query):
-        """Busca conversas por conteúdo"""
-        with sqlite3.connect(self.db_path) as conn:
+    def search_conversations(self, user_id, query, limit=50):
+        """Busca conversas por conteúdo, na tabela quente e depois no arquivo frio.
+        Mensagens em texto puro são filtradas direto pelo LIKE; só as comprimidas passam pela
+        descompressão (message_content) antes da comparação. Os blocos arquivados só são lidos
+        se a tabela quente não completar o limite"""
+        with self._connect() as conn:
             cursor = conn.cursor()
             
+            pattern = f'%{query}%'
             cursor.execute('''
                 SELECT DISTINCT c.id, c.session_id, c.created_at, c.last_message_at, c.title,
-                       m.content as matching_content
+                       message_content(m.content, m.content_codec) as matching_content
                 FROM conversations c
                 JOIN messages m ON c.id = m.conversation_id
-                WHERE c.user_id = ? AND m.content LIKE ?
+                WHERE c.user_id = ? AND (
+                    (m.content_codec IS NULL AND m.content LIKE ?) OR
+                    (m.content_codec IS NOT NULL AND message_content(m.content, m.content_codec) LIKE ?)
+                )
                 ORDER BY c.last_message_at DESC
-                LIMIT 50
-            ''', (user_id, f'%{query}%'))
+                LIMIT ?
+            ''', (user_id, pattern, pattern, limit))
+            results = cursor.fetchall()
+            
+            if len(results) >= limit:
+                return results
+            
+            cursor.execute('''
+                SELECT c.id, c.session_id, c.created_at, c.last_message_at, c.title
+                FROM conversations c
+                WHERE c.user_id = ? AND EXISTS (SELECT 1 FROM archive_blocks a WHERE a.conversation_id = c.id)
+                ORDER BY c.last_message_at DESC
+            ''', (user_id,))
+            archived_conversations = cursor.fetchall()
+        
+        # Mesmo critério do LIKE do SQLite: % e _ são curingas e a caixa só é ignorada em ASCII
+        matcher = re.compile(''.join('.*' if c == '%' else '.' if c == '_' else re.escape(c) for c in query),
+                             re.IGNORECASE | re.ASCII | re.DOTALL)
+        seen = set(results)
+        for conversation in archived_conversations:
+            for row in self._iter_archived_messages(conversation[0], before_id=2 ** 63 - 1):
+                result = (*conversation, row[2])
+                if result not in seen and matcher.search(row[2]):
+                    seen.add(result)
+                    results.append(result)
+                    if len(results) >= limit:
+                        return results
+        return results
+    
+    def get_messages_after(self, after_id, limit=256):
+        """Obtém um lote de mensagens com id maior que after_id, em ordem de id"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, message_content(content, content_codec)
+                FROM messages
+                WHERE id > ?
+                ORDER BY id ASC
+                LIMIT ?
+            ''', (after_id, limit))
             
             return cursor.fetchall()
+    
+    def save_embeddings(self, embeddings, model, checkpoint=None, last_id=None, timeout=5.0):
+        """Grava um lote de embeddings (e opcionalmente o checkpoint) em uma única transação curta"""
+        rows = [
+            (message_id, model, len(vector), array('f', vector).tobytes())
+            for message_id, vector in embeddings
+        ]
+        
+        with self._connect(timeout) as conn:
+            cursor = conn.cursor()
+            
+            cursor.executemany('''
+                INSERT OR REPLACE INTO message_embeddings (message_id, model, dim, vector, created_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', rows)
+            
+            if checkpoint and last_id is not None:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO worker_checkpoints (name, last_id, updated_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                ''', (checkpoint, last_id))
+    
+    def get_message_embedding(self, message_id):
+        """Obtém o embedding de uma mensagem como lista de floats (ou None)"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT vector FROM message_embeddings WHERE message_id = ?', (message_id,))
+            row = cursor.fetchone()
+            
+            if not row:
+                return None
+            return array('f', row[0]).tolist()
+    
+    def get_last_summarized_id(self, conversation_id):
+        """Obtém o id da última mensagem já coberta por um resumo de nível 0"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT MAX(end_message_id) FROM conversation_summaries
+                WHERE conversation_id = ? AND level = 0
+            ''', (conversation_id,))
+            row = cursor.fetchone()
+            
+            return row[0] or 0
+    
+    def get_unsummarized_messages(self, conversation_id, after_id, keep_recent=12, limit=20):
+        """Obtém mensagens ainda não resumidas que já saíram da janela das keep_recent mais recentes"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, message_type, message_content(content, content_codec)
+                FROM messages
+                WHERE conversation_id = ? AND id > ? AND id < (
+                    SELECT MIN(id) FROM (
+                        SELECT id FROM messages
+                        WHERE conversation_id = ?
+                        ORDER BY id DESC
+                        LIMIT ?
+                    )
+                )
+                ORDER BY id ASC
+                LIMIT ?
+            ''', (conversation_id, after_id, conversation_id, keep_recent, limit))
+            
+            return cursor.fetchall()
+    
+    def get_active_summaries(self, conversation_id):
+        """Lista os resumos ainda não condensados em um nível superior"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, level, start_message_id, end_message_id, content
+                FROM conversation_summaries
+                WHERE conversation_id = ? AND superseded_by IS NULL
+                ORDER BY level ASC, start_message_id ASC
+            ''', (conversation_id,))
+            
+            return cursor.fetchall()
+    
+    def save_summary(self, conversation_id, level, start_message_id, end_message_id, content, children_ids=None):
+        """Salva um resumo e marca os resumos filhos como condensados.
+        Retorna None se outro worker já salvou um resumo da mesma faixa (nada é alterado)"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT OR IGNORE INTO conversation_summaries
+                    (conversation_id, level, start_message_id, end_message_id, content)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (conversation_id, level, start_message_id, end_message_id, content))
+            if not cursor.rowcount:
+                return None
+            summary_id = cursor.lastrowid
+            
+            if children_ids:
+                cursor.executemany('''
+                    UPDATE conversation_summaries SET superseded_by = ? WHERE id = ?
+                ''', [(summary_id, child_id) for child_id in children_ids])
+            
+            return summary_id
+    
+    def save_question_fingerprint(self, user_id, fingerprint, bands, response_id, created_at):
+        """Salva a impressão SimHash de uma pergunta respondida pelo usuário e as chaves das bandas"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO question_fingerprints (user_id, fingerprint, response_id, created_at)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, fingerprint, response_id, created_at))
+            fingerprint_id = cursor.lastrowid
+            cursor.executemany(
+                'INSERT INTO question_fingerprint_bands (user_id, band_key, fingerprint_id) VALUES (?, ?, ?)',
+                [(user_id, key, fingerprint_id) for key in bands]
+            )
+    
+    def get_question_fingerprint_candidates(self, user_id, bands, min_shared, since, limit=2000):
+        """Impressões do usuário criadas depois de since com pelo menos min_shared das bandas
+        (mais recentes primeiro)"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            placeholders = ', '.join('?' * len(bands))
+            cursor.execute(f'''
+                SELECT fingerprint, response_id
+                FROM question_fingerprints
+                WHERE id IN (
+                    SELECT fingerprint_id FROM question_fingerprint_bands
+                    WHERE user_id = ? AND band_key IN ({placeholders})
+                    GROUP BY fingerprint_id
+                    HAVING COUNT(*) >= ?
+                ) AND created_at >= ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', (user_id, *bands, min_shared, since, limit))
+            
+            return cursor.fetchall()
+    
+    def get_message_by_response_id(self, response_id):
+        """Obtém o conteúdo de uma resposta da IA pelo response_id"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT message_content(content, content_codec) FROM messages WHERE response_id = ?',
+                           (response_id,))
+            row = cursor.fetchone()
+        
+        if row:
+            return row[0]
+        archived = self._archived_response(response_id)
+        return archived[0][2] if archived else None
+    
+    def claim_chat_request(self, user_id, idempotency_key, message_hash, ttl_seconds, stale_seconds):
+        """Reserva a chave de idempotência para esta execução.
+        
+        Retorna (reservou, linha), com linha = (message_hash, status, response_id, user_message_id).
+        Também assume chaves de execuções que falharam ou que ficaram em andamento por mais de
+        stale_seconds (processo que morreu no meio). Remove as chaves vencidas do usuário.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('DELETE FROM chat_requests WHERE user_id = ? AND created_at < ?',
+                           (user_id, now - ttl_seconds))
+            
+            cursor.execute('''
+                INSERT OR IGNORE INTO chat_requests
+                    (user_id, idempotency_key, message_hash, status, created_at, updated_at)
+                VALUES (?, ?, ?, 'in_progress', ?, ?)
+            ''', (user_id, idempotency_key, message_hash, now, now))
+            claimed = cursor.rowcount == 1
+            
+            if not claimed:
+                cursor.execute('''
+                    UPDATE chat_requests SET status = 'in_progress', updated_at = ?
+                    WHERE user_id = ? AND idempotency_key = ? AND message_hash = ?
+                      AND (status = 'failed' OR (status = 'in_progress' AND updated_at < ?))
+                ''', (now, user_id, idempotency_key, message_hash, now - stale_seconds))
+                claimed = cursor.rowcount == 1
+            
+            cursor.execute('''
+                SELECT message_hash, status, response_id, user_message_id
+                FROM chat_requests
+                WHERE user_id = ? AND idempotency_key = ?
+            ''', (user_id, idempotency_key))
+            
+            return claimed, cursor.fetchone()
+    
+    def update_chat_request(self, user_id, idempotency_key, status, response_id=None, user_message_id=None):
+        """Atualiza o estado de uma chave de idempotência (os ids só são gravados se informados)"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                UPDATE chat_requests
+                SET status = ?, response_id = COALESCE(?, response_id),
+                    user_message_id = COALESCE(?, user_message_id), updated_at = ?
+                WHERE user_id = ? AND idempotency_key = ?
+            ''', (status, response_id, user_message_id, time.time(), user_id, idempotency_key))
+    
+    def get_chat_request(self, user_id, idempotency_key):
+        """Estado de uma chave de idempotência: (status, response_id) ou None"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT status, response_id FROM chat_requests
+                WHERE user_id = ? AND idempotency_key = ?
+            ''', (user_id, idempotency_key))
+            
+            return cursor.fetchone()
+    
+    def get_response_with_question(self, response_id):
+        """Obtém (resposta da IA, pergunta do usuário que a originou) pelo response_id"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT message_content(m.content, m.content_codec), (
+                    SELECT message_content(q.content, q.content_codec) FROM messages q
+                    WHERE q.conversation_id = m.conversation_id AND q.id < m.id AND q.message_type = 'user'
+                    ORDER BY q.id DESC
+                    LIMIT 1
+                ), m.id, m.conversation_id
+                FROM messages m
+                WHERE m.response_id = ?
+            ''', (response_id,))
+            row = cursor.fetchone()
+        
+        if row:
+            if row[1] is None:
+                # Resposta na borda da tabela quente: a pergunta pode já estar no arquivo
+                question = next((archived for archived in self._iter_archived_messages(row[3], before_id=row[2])
+                                 if archived[1] == 'user'), None)
+                return row[0], question[2] if question else None
+            return row[:2]
+        archived = self._archived_response(response_id)
+        if not archived:
+            return None
+        answer, conversation_id, earlier = archived
+        # A pergunta vem antes da resposta: no mesmo bloco ou num bloco anterior
+        questions = (row for row in reversed(earlier) if row[1] == 'user')
+        question = next(questions, None)
+        if question is None:
+            question = next((row for row in self._iter_archived_messages(conversation_id, before_id=answer[0])
+                             if row[1] == 'user'), None)
+        return answer[2], question[2] if question else None
+    
+    def _archived_messages(self, conversation_id, after_id=None, before_id=None, limit=None):
+        """Mensagens arquivadas de uma conversa como linhas (id, tipo, conteúdo, timestamp, response_id).
+        
+        Com before_id: as mais recentes antes dele, da mais nova para a mais antiga.
+        Caso contrário: as com id maior que after_id, em ordem cronológica.
+        Só descomprime os blocos necessários para chegar a limit linhas.
+        """
+        rows = []
+        if limit is not None and limit <= 0:
+            return rows
+        for row in self._iter_archived_messages(conversation_id, after_id, before_id):
+            rows.append(row)
+            if limit is not None and len(rows) >= limit:
+                break
+        return rows
+    
+    def _iter_archived_messages(self, conversation_id, after_id=None, before_id=None):
+        """Como _archived_messages, mas preguiçoso: cada bloco só é lido e descomprimido quando
+        o consumidor chega nele. Sem blocos arquivados, custa só uma busca no índice"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            newest_first = before_id is not None
+            if newest_first:
+                cursor.execute('''
+                    SELECT segment, byte_offset, byte_length, codec FROM archive_blocks
+                    WHERE conversation_id = ? AND first_id < ?
+                    ORDER BY last_id DESC
+                ''', (conversation_id, before_id))
+            else:
+                cursor.execute('''
+                    SELECT segment, byte_offset, byte_length, codec FROM archive_blocks
+                    WHERE conversation_id = ? AND last_id > ?
+                    ORDER BY last_id ASC
+                ''', (conversation_id, after_id or 0))
+            blocks = cursor.fetchall()
+        
+        for block in blocks:
+            block_rows = self.archive.read(*block)
+            if newest_first:
+                yield from (row for row in reversed(block_rows) if row[0] < before_id)
+            else:
+                yield from (row for row in block_rows if row[0] > (after_id or 0))
+    
+    def _archived_response(self, response_id):
+        """Resposta arquivada: (linha, conversation_id, linhas anteriores do mesmo bloco) ou None"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT b.conversation_id, b.segment, b.byte_offset, b.byte_length, b.codec
+                FROM archived_responses r
+                JOIN archive_blocks b ON b.id = r.block_id
+                WHERE r.response_id = ?
+            ''', (response_id,))
+            block = cursor.fetchone()
+        
+        if not block:
+            return None
+        block_rows = self.archive.read(*block[1:])
+        for index, row in enumerate(block_rows):
+            if row[4] == response_id:
+                return row, block[0], block_rows[:index]
+        return None
+    
+    def get_archive_candidates(self, older_than_seconds, after_conversation_id=0, limit=100):
+        """Conversas (em ordem de id, depois de after_conversation_id) com mensagens mais antigas
+        que older_than_seconds na tabela quente"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT DISTINCT conversation_id FROM messages
+                WHERE timestamp < datetime('now', ?) AND conversation_id > ?
+                ORDER BY conversation_id
+                LIMIT ?
+            ''', (f'-{int(older_than_seconds)} seconds', after_conversation_id, limit))
+            
+            return [row[0] for row in cursor.fetchall()]
+    
+    def get_archivable_messages(self, conversation_id, older_than_seconds, keep_recent, max_id, limit=1000):
+        """Prefixo da conversa que pode ir para o arquivo, em ordem de id: mensagens antes da
+        primeira mais nova que o limite de idade, fora das keep_recent mais recentes e com id <= max_id"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, message_type, message_content(content, content_codec), timestamp, response_id
+                FROM messages
+                WHERE conversation_id = ? AND id <= ?
+                  AND id < COALESCE((
+                      SELECT MIN(id) FROM messages
+                      WHERE conversation_id = ? AND timestamp >= datetime('now', ?)
+                  ), 9223372036854775807)
+                  AND id < (
+                      SELECT COALESCE(MIN(id), 0) FROM (
+                          SELECT id FROM messages
+                          WHERE conversation_id = ?
+                          ORDER BY id DESC
+                          LIMIT ?
+                      )
+                  )
+                ORDER BY id ASC
+                LIMIT ?
+            ''', (conversation_id, max_id, conversation_id, f'-{int(older_than_seconds)} seconds',
+                  conversation_id, keep_recent, limit))
+            
+            return cursor.fetchall()
+    
+    def archive_message_block(self, conversation_id, rows, location):
+        """Registra um bloco já gravado no segmento e remove as mensagens da tabela quente, numa
+        única transação. location = (segmento, posição, tamanho, codec).
+        
+        Retorna False (sem alterar nada) se as mensagens não estiverem mais todas na tabela
+        (outro arquivador chegou antes): os bytes gravados ficam sem uso no segmento.
+        """
+        first_id, last_id = rows[0][0], rows[-1][0]
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM messages WHERE conversation_id = ? AND id BETWEEN ? AND ?
+            ''', (conversation_id, first_id, last_id))
+            if cursor.rowcount != len(rows):
+                conn.rollback()
+                return False
+            
+            cursor.execute('''
+                INSERT INTO archive_blocks
+                    (conversation_id, first_id, last_id, message_count, segment, byte_offset, byte_length, codec, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (conversation_id, first_id, last_id, len(rows), *location, time.time()))
+            block_id = cursor.lastrowid
+            
+            cursor.executemany('INSERT INTO archived_responses (response_id, block_id) VALUES (?, ?)',
+                               [(row[4], block_id) for row in rows if row[4]])
+            return True
+    
+    def get_uncompressed_messages(self, after_id, min_bytes, limit=500):
+        """Mensagens gravadas como texto puro com pelo menos min_bytes, em ordem de id: (id, conteúdo)"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT id, content FROM messages
+                WHERE id > ? AND content_codec IS NULL AND length(CAST(content AS BLOB)) >= ?
+                ORDER BY id ASC
+                LIMIT ?
+            ''', (after_id, min_bytes, limit))
+            
+            return cursor.fetchall()
+    
+    def update_message_contents(self, rows):
+        """Regrava o conteúdo comprimido de mensagens em texto puro: linhas (id, valor, codec).
+        Retorna quantas foram atualizadas"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.executemany('''
+                UPDATE messages SET content = ?, content_codec = ?
+                WHERE id = ? AND content_codec IS NULL
+            ''', [(value, codec, message_id) for message_id, value, codec in rows])
+            
+            return cursor.rowcount
+    
+    def get_dictionary_samples(self, limit=5000):
+        """Respostas da IA mais recentes (texto), para treinar o dicionário zstd"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT MAX(id) FROM messages')
+            last_id = cursor.fetchone()[0] or 0
+            # Metade das mensagens são respostas: olhar o dobro de ids cobre a amostra
+            cursor.execute('''
+                SELECT message_content(content, content_codec) FROM messages
+                WHERE id > ? AND message_type = 'ai'
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (last_id - 2 * limit, limit))
+            
+            return [row[0] for row in cursor.fetchall()]
+    
+    def save_content_dictionary(self, data):
+        """Grava um dicionário zstd treinado e passa a comprimir com ele. Retorna o id"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('INSERT INTO content_dictionaries (data, created_at) VALUES (?, ?)',
+                           (data, time.time()))
+            dict_id = cursor.lastrowid
+        
+        if self.content_codec.codec == 'zstd':
+            self.content_codec.use_dictionary(dict_id, data)
+        return dict_id
+    
+    def _load_content_dictionary(self, dict_id=None):
+        """(id, bytes) de um dicionário zstd (None: o mais recente). Usa uma conexão própria
+        porque é chamado de dentro da função SQL message_content, no meio de outra consulta"""
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            if dict_id is None:
+                return conn.execute('SELECT id, data FROM content_dictionaries ORDER BY id DESC LIMIT 1').fetchone()
+            return conn.execute('SELECT id, data FROM content_dictionaries WHERE id = ?', (dict_id,)).fetchone()
+    
+    def checkpoint_wal(self):
+        """Transfere o WAL para o arquivo principal e o trunca (chamado no desligamento)"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            return cursor.fetchone()
+    
+    def get_checkpoint(self, name):
+        """Obtém o último id processado por um worker (0 se nunca executou)"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT last_id FROM worker_checkpoints WHERE name = ?', (name,))
+            row = cursor.fetchone()
+            
+            return row[0] if row else 0
+
+@routes.before_app_request
+def assign_request_context():
+    # Identificadores anexados a todos os registros de log desta requisição
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+    # Mesmo hash gravado em users.ip_hash; também é a chave do limite de requisições
+    g.ip_hash = hashlib.sha256(get_client_ip().encode()).hexdigest()
+    g.user_hash = g.ip_hash[:12]
+    g.stage_timings = {}
+
+@routes.before_app_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    g.db_queries = 0
+    REQUESTS_IN_FLIGHT.inc()
+
+@routes.after_app_request
+def record_request_metrics(response):
+    # Registrado antes da compressão, então roda depois dela e inclui seu custo
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    REQUEST_LATENCY.observe(time.perf_counter() - g.request_started, route=route, method=request.method)
+    REQUESTS_TOTAL.inc(route=route, method=request.method, status=str(response.status_code))
+    DB_QUERIES_PER_REQUEST.observe(g.db_queries, route=route)
+    response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@routes.teardown_app_request
+def finish_request_metrics(exc):
+    REQUESTS_IN_FLIGHT.dec()
+
+# Comprimir respostas JSON grandes (histórico) conforme o Accept-Encoding
+response_compression = ResponseCompression(
+    min_size=COMPRESSION_MIN_SIZE,
+    gzip_level=COMPRESSION_LEVEL,
+    brotli_quality=COMPRESSION_BROTLI_QUALITY
+)
+
+# Profiling de requisições lentas; os N perfis mais lentos ficam em /admin/profiles
+request_profiler = RequestProfiler(
+    admin_token=ADMIN_TOKEN,
+    output_dir=PROFILE_DIR,
+    keep_slowest=PROFILE_KEEP_SLOWEST
+)
 
-# Inicializar o gerenciador de banco de dados
-db_manager = DatabaseManager()
+# Limite por usuário, checado antes de qualquer acesso ao banco ou ao Langflow
+rate_limiter = RateLimiter(
+    limits={
+        'chat': (RATE_LIMIT_CHAT_PER_MINUTE, RATE_LIMIT_CHAT_BURST),
+        'read': (RATE_LIMIT_READ_PER_MINUTE, RATE_LIMIT_READ_BURST)
+    },
+    endpoints={
+        'chatbot.chat': 'chat',
+        'chatbot.get_current_conversation': 'read',
+        'chatbot.get_current_conversation_delta': 'read',
+        'chatbot.get_conversations': 'read',
+        'chatbot.get_conversation': 'read',
+        'chatbot.search_conversations': 'read',
+        'chatbot.get_full_history': 'read',
+        'chatbot.generate_html': 'read',
+        'chatbot.view_html': 'read'
+    },
+    key_func=lambda: g.ip_hash,
+    shared=create_rate_limit_store(RATE_LIMIT_URL),
+    counter=RATE_LIMITED
+) if RATE_LIMIT_ENABLED else None
+
+# Drenagem no desligamento: só o /chat é longo o bastante para precisar esperar
+graceful_shutdown = GracefulShutdown(
+    drain_timeout=SHUTDOWN_DRAIN_SECONDS,
+    endpoints=('chatbot.chat',)
+)
+
+class LazyInstance:
+    """Objeto criado no primeiro acesso a um atributo (ou em instance()).
+    
+    Importar o app não abre arquivos: os CLIs (archive_worker.py, message_codec.py,
+    benchmark_database.py...) importam o módulo e abrem o banco do próprio --db, sem
+    criar um chatbot_memory.db no diretório atual.
+    """
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+    
+    def instance(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+    
+    def __getattr__(self, name):
+        return getattr(self.instance(), name)
+
+# Gerenciador de banco de dados do servidor: criado em create_app (EAGER_INIT) ou no primeiro uso
+db_manager = LazyInstance(lambda: DatabaseManager(archive_dir=ARCHIVE_DIR or None))
+
+# Respostas por response_id (resposta + pergunta) e páginas de /view_html já renderizadas.
+# O nível compartilhado é visto por todos os workers; o banco continua sendo a fonte da verdade
+cache_backend = create_backend(CACHE_URL)
+response_cache = TieredCache('responses', cache_backend, CACHE_LOCAL_ITEMS, CACHE_TTL_SECONDS, CACHE_LOOKUPS)
+html_cache = TieredCache('html', cache_backend, CACHE_LOCAL_ITEMS, CACHE_TTL_SECONDS, CACHE_LOOKUPS)
+
+# Cliente HTTP do Langflow (um por processo, criado em init_worker)
+langflow_session = None
+
+def create_langflow_session(pool_size=16):
+    """Sessão HTTP com pool de conexões reaproveitadas entre as requisições ao Langflow"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+langflow_monitor = LangflowMonitor(
+    LANGFLOW_URL,
+    FLOW_ID,
+    warm_connections=LANGFLOW_WARM_CONNECTIONS,
+    probe_interval=LANGFLOW_PROBE_INTERVAL,
+    gauge=LANGFLOW_UP
+) if LANGFLOW_PROBE_INTERVAL > 0 else None
+
+def cancel_langflow_run(run_id):
+    """Pede ao Langflow para interromper a execução (cliente desconectou). Retorna o resultado para a métrica"""
+    if not LANGFLOW_CANCEL_PATH:
+        return 'unsupported'
+    try:
+        response = langflow_session.post(LANGFLOW_URL + LANGFLOW_CANCEL_PATH.format(run_id=run_id), timeout=5)
+        return 'sent' if response.ok else 'failed'
+    except requests.exceptions.RequestException:
+        return 'failed'
+
+def create_summarizer(backend=SUMMARY_BACKEND):
+    """Cria o resumidor configurado ('local', 'langflow' ou 'off')"""
+    if backend == 'off':
+        return None
+    if backend == 'langflow':
+        return LangflowSummarizer(LANGFLOW_URL, FLOW_ID)
+    return ExtractiveSummarizer()
+
+summarizer = create_summarizer()
+summary_scheduler = SummaryScheduler(
+    db_manager,
+    summarizer,
+    every_turns=SUMMARY_EVERY_TURNS,
+    keep_recent=SUMMARY_KEEP_RECENT
+) if summarizer else None
+
+near_duplicate_index = SimHashIndex(
+    db_manager,
+    max_distance=NEAR_DUPLICATE_MAX_DISTANCE,
+    max_age_hours=NEAR_DUPLICATE_MAX_AGE_HOURS
+) if NEAR_DUPLICATE_ENABLED else None
+
+def find_near_duplicate_answer(user_id, fingerprint):
+    """Procura uma resposta já dada ao mesmo usuário para uma pergunta quase idêntica
+    (pela impressão SimHash da pergunta). Retorna (response_id, conteúdo, distância)"""
+    if not near_duplicate_index or fingerprint is None:
+        return None
+    
+    match = near_duplicate_index.lookup(user_id, fingerprint)
+    if not match:
+        return None
+    
+    # A resposta original foi gravada no cache compartilhado quando foi gerada (talvez por outro worker)
+    response_id, distance = match
+    stored = find_stored_response(response_id)
+    if not stored:
+        return None
+    return response_id, stored['response'], distance
 
-# Dicionário para armazenar as respostas temporariamente (mantido para compatibilidade)
-stored_responses = {}
+@contextmanager
+def chat_stage(stage):
+    """Mede uma etapa do /chat: alimenta o histograma e os tempos do log da requisição"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        CHAT_STAGE_LATENCY.observe(elapsed, stage=stage)
+        timings = g.stage_timings
+        timings[stage] = timings.get(stage, 0.0) + elapsed * 1000
 
 def get_client_ip():
     """Obtém o IP real do cliente considerando proxies"""
@@ -274,11 +1537,13 @@ def get_client_ip():
     else:
         return request.remote_addr
 
-def build_context_from_history(history, max_context=6):
+def build_context_from_history(history, max_context=6, summary=""):
     """Constrói contexto das conversas anteriores - garante pelo menos 3 interações completas"""
-    if not history:
+    if not history and not summary:
         return ""
     
+    summary_block = f"🗂️ **Resumo da conversa até aqui:**\n{summary}\n\n" if summary else ""
+    
     # Reorganizar mensagens por ordem cronológica (mais antigas primeiro)
     history_ordered = list(reversed(history[:max_context]))
     
@@ -319,822 +1584,147 @@ def build_context_from_history(history, max_context=6):
             context_messages.append("")  # Linha em branco para separação
         
         context_messages.append("---\n**Conversa atual:**\n")
-        return "\n".join(context_messages)
+        return summary_block + "\n".join(context_messages)
+    
+    if summary_block:
+        return summary_block + "---\n**Conversa atual:**\n"
     
     return ""
 
-@app.route('/')
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+def _hashing_embedding(text, dim):
+    """Embedding local por hashing de tokens (unigramas + bigramas), normalizado L2"""
+    vector = [0.0] * dim
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    
+    for feature in features:
+        digest = hashlib.md5(feature.encode()).digest()
+        index = int.from_bytes(digest[:4], 'little') % dim
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[index] += sign
+    
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm:
+        vector = [v / norm for v in vector]
+    return vector
+
+def embed_texts(texts, dim=EMBEDDING_DIM):
+    """Gera embeddings para um lote de textos em uma única chamada"""
+    if not texts:
+        return []
+    
+    if EMBEDDING_API_URL:
+        # Endpoint compatível com /v1/embeddings aceita o lote inteiro de uma vez
+        response = requests.post(
+            EMBEDDING_API_URL,
+            json={"input": list(texts), "model": EMBEDDING_MODEL},
+            timeout=120
+        )
+        response.raise_for_status()
+        data = sorted(response.json().get("data", []), key=lambda item: item.get("index", 0))
+        return [item["embedding"] for item in data]
+    
+    return [_hashing_embedding(text, dim) for text in texts]
+
+def build_home_assets(flask_app):
+    """Monta a página inicial uma única vez: CSS/JS com hash no nome e HTML pré-comprimido"""
+    bundle = AssetBundle(flask_app.static_folder)
+    css_url = bundle.add_file('css/chat.css', 'text/css; charset=utf-8')
+    js_url = bundle.add_file('js/chat.js', 'application/javascript; charset=utf-8')
+    
+    with flask_app.app_context():
+        bundle.set_page(render_template('index.html', css_url=css_url, js_url=js_url))
+    
+    return bundle
+
+# Montado no primeiro acesso (ou em create_app, com EAGER_INIT)
+home_assets = None
+home_assets_lock = threading.Lock()
+
+def get_home_assets():
+    global home_assets
+    if home_assets is None:
+        with home_assets_lock:
+            if home_assets is None:
+                home_assets = build_home_assets(current_app)
+    return home_assets
+
+def render_initial_conversation():
+    """Bloco JSON com a página mais recente da conversa do usuário, para embutir no HTML"""
+    user_id = db_manager.get_user_id(get_client_ip())
+    conversation_id = db_manager.get_current_conversation_id(user_id)
+    page, has_more = db_manager.get_conversation_messages_page(conversation_id, None, INITIAL_PAGE_SIZE)
+    
+    payload = json.dumps({
+        "success": True,
+        "conversation_id": conversation_id,
+        "version": db_manager.get_conversation_version(conversation_id),
+        "messages": format_page_messages(page),
+        "has_more": has_more
+    }, ensure_ascii=False)
+    
+    # Impedir que o conteúdo feche a tag <script>
+    payload = payload.replace('<', '\\u003c')
+    return f'<script type="application/json" id="initial-conversation">{payload}</script>\n'
+
+@routes.route('/')
 def home():
-    html_content = """
-    <!DOCTYPE html>
-    <html lang="pt-br">
-    <head>
-      <meta charset="UTF-8" />
-      <meta name="viewport" content="width=device-width, initial-scale=1.0" />
-      <title>SmartOps AI</title>
-      <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap" rel="stylesheet">
-      <style>
-        * {
-          margin: 0;
-          padding: 0;
-          box-sizing: border-box;
-        }
-        
-        :root {
-          --primary-black: #000000;
-          --primary-white: #ffffff;
-          --gray-50: #fafafa;
-          --gray-100: #f5f5f5;
-          --gray-200: #e5e5e5;
-          --gray-300: #d4d4d4;
-          --gray-400: #a3a3a3;
-          --gray-500: #737373;
-          --gray-600: #525252;
-          --gray-700: #404040;
-          --gray-800: #262626;
-          --gray-900: #171717;
-          --shadow-sm: 0 1px 2px 0 rgb(0 0 0 / 0.05);
-          --shadow: 0 1px 3px 0 rgb(0 0 0 / 0.1), 0 1px 2px -1px rgb(0 0 0 / 0.1);
-          --shadow-lg: 0 10px 15px -3px rgb(0 0 0 / 0.1), 0 4px 6px -4px rgb(0 0 0 / 0.1);
-          --shadow-xl: 0 20px 25px -5px rgb(0 0 0 / 0.1), 0 8px 10px -6px rgb(0 0 0 / 0.1);
-        }
-        
-        body {
-          font-family: 'Inter', -apple-system, BlinkMacSystemFont, sans-serif;
-          background: var(--primary-white);
-          color: var(--primary-black);
-          line-height: 1.6;
-          min-height: 100vh;
-          transition: all 0.3s ease;
-        }
-        
-        body.dark-mode {
-          background: var(--primary-black);
-          color: var(--primary-white);
-        }
-        
-        /* Header Styles */
-        .header {
-          background: var(--primary-black);
-          padding: 1rem 2rem;
-          box-shadow: var(--shadow-lg);
-          position: sticky;
-          top: 0;
-          z-index: 100;
-        }
-        
-        body.dark-mode .header {
-          background: var(--gray-900);
-          border-bottom: 1px solid var(--gray-800);
-        }
-        
-        .header-content {
-          max-width: 1400px;
-          margin: 0 auto;
-          display: flex;
-          justify-content: space-between;
-          align-items: center;
-        }
-        
-        .logo {
-          display: flex;
-          align-items: center;
-          gap: 0.75rem;
-        }
-        
-        .logo-icon {
-          width: 40px;
-          height: 40px;
-          background: var(--primary-white);
-          border-radius: 8px;
-          display: flex;
-          align-items: center;
-          justify-content: center;
-          font-size: 1.5rem;
-          font-weight: 700;
-          color: var(--primary-black);
-        }
-        
-        .logo-text {
-          color: var(--primary-white);
-          font-size: 1.5rem;
-          font-weight: 700;
-          letter-spacing: -0.025em;
-        }
-        
-        .header-controls {
-          display: flex;
-          gap: 1rem;
-          align-items: center;
-        }
-        
-        .btn {
-          background: transparent;
-          border: 2px solid var(--primary-white);
-          color: var(--primary-white);
-          padding: 0.5rem 1rem;
-          border-radius: 8px;
-          cursor: pointer;
-          font-weight: 500;
-          font-size: 0.875rem;
-          transition: all 0.2s ease;
-          text-decoration: none;
-          display: inline-flex;
-          align-items: center;
-          gap: 0.5rem;
-        }
-        
-        .btn:hover {
-          background: var(--primary-white);
-          color: var(--primary-black);
-        }
-        
-        body.dark-mode .btn {
-          border-color: var(--gray-400);
-          color: var(--gray-400);
-        }
-        
-        body.dark-mode .btn:hover {
-          background: var(--gray-400);
-          color: var(--primary-black);
-        }
-        
-        /* Main Layout */
-        .container {
-          max-width: 1200px;
-          margin: 0 auto;
-          padding: 2rem;
-          min-height: calc(100vh - 80px);
-          display: flex;
-          justify-content: center;
-          align-items: flex-start;
-          align-items: start;
-        }
-        
-        /* Sidebar */
-        .sidebar {
-          background: var(--gray-50);
-          border-radius: 16px;
-          padding: 2rem;
-          box-shadow: var(--shadow);
-          height: fit-content;
-          position: sticky;
-          top: 100px;
-        }
-        
-        body.dark-mode .sidebar {
-          background: var(--gray-900);
-          border: 1px solid var(--gray-800);
-        }
-        
-        .sidebar-title {
-          font-size: 1.25rem;
-          font-weight: 600;
-          margin-bottom: 1rem;
-          display: flex;
-          align-items: center;
-          gap: 0.5rem;
-        }
-        
-        .sidebar-subtitle {
-          color: var(--gray-600);
-          font-size: 0.875rem;
-          margin-bottom: 1.5rem;
-          line-height: 1.5;
-        }
-        
-        body.dark-mode .sidebar-subtitle {
-          color: var(--gray-400);
-        }
-        
-        /* Removed History Sidebar CSS - no longer needed */
-        
-        /* Chat Section */
-        .chat-section {
-          background: var(--primary-white);
-          border-radius: 16px;
-          box-shadow: var(--shadow-xl);
-          overflow: hidden;
-          height: 600px;
-          width: 100%;
-          max-width: 800px;
-          display: flex;
-          flex-direction: column;
-          border: 1px solid var(--gray-200);
-        }
-        
-        body.dark-mode .chat-section {
-          background: var(--gray-900);
-          border-color: var(--gray-800);
-        }
-        
-        .chat-header {
-          background: var(--primary-black);
-          padding: 1.5rem 2rem;
-          border-bottom: 1px solid var(--gray-200);
-        }
-        
-        body.dark-mode .chat-header {
-          background: var(--gray-800);
-          border-bottom-color: var(--gray-700);
-        }
-        
-        .chat-header-content {
-          display: flex;
-          align-items: center;
-          justify-content: space-between;
-        }
-        
-        .chat-info-left {
-          display: flex;
-          align-items: center;
-          gap: 1rem;
-        }
-        
-        .chat-avatar {
-          width: 48px;
-          height: 48px;
-          background: var(--primary-white);
-          border-radius: 12px;
-          display: flex;
-          align-items: center;
-          justify-content: center;
-          font-size: 1.5rem;
-        }
-        
-        .chat-info h3 {
-          color: var(--primary-white);
-          font-size: 1.125rem;
-          font-weight: 600;
-          margin-bottom: 0.25rem;
-        }
-        
-        .chat-status {
-          display: flex;
-          align-items: center;
-          gap: 0.5rem;
-          color: var(--gray-300);
-          font-size: 0.875rem;
-        }
-        
-        .status-indicator {
-          width: 8px;
-          height: 8px;
-          background: #10b981;
-          border-radius: 50%;
-        }
-        
-        /* Removed new-chat-btn styles - no longer needed */
-        
-        /* Messages */
-        .chat-messages {
-          flex: 1;
-          overflow-y: auto;
-          padding: 1.5rem;
-          display: flex;
-          flex-direction: column;
-          gap: 1rem;
-          background: var(--gray-50);
-        }
-        
-        body.dark-mode .chat-messages {
-          background: var(--primary-black);
-        }
-        
-        .chat-messages::-webkit-scrollbar {
-          width: 6px;
-        }
-        
-        .chat-messages::-webkit-scrollbar-track {
-          background: transparent;
-        }
-        
-        .chat-messages::-webkit-scrollbar-thumb {
-          background: var(--gray-300);
-          border-radius: 3px;
-        }
-        
-        body.dark-mode .chat-messages::-webkit-scrollbar-thumb {
-          background: var(--gray-600);
-        }
-        
-        .message {
-          max-width: 80%;
-          padding: 1rem 1.25rem;
-          border-radius: 16px;
-          font-size: 0.875rem;
-          line-height: 1.5;
-          animation: slideIn 0.3s ease-out;
-          word-wrap: break-word;
-          white-space: pre-wrap;
-        }
-        
-        @keyframes slideIn {
-          from {
-            opacity: 0;
-            transform: translateY(10px);
-          }
-          to {
-            opacity: 1;
-            transform: translateY(0);
-          }
-        }
-        
-        .message.user {
-          align-self: flex-end;
-          background: var(--primary-black);
-          color: var(--primary-white);
-          border-bottom-right-radius: 4px;
-        }
-        
-        body.dark-mode .message.user {
-          background: var(--gray-700);
-        }
-        
-        .message.ai {
-          align-self: flex-start;
-          background: var(--primary-white);
-          color: var(--primary-black);
-          border: 1px solid var(--gray-200);
-          border-bottom-left-radius: 4px;
-          position: relative;
-        }
-        
-        body.dark-mode .message.ai {
-          background: var(--gray-800);
-          color: var(--primary-white);
-          border-color: var(--gray-700);
-        }
-        
-        .message.typing {
-          align-self: flex-start;
-          background: var(--gray-200);
-          color: var(--gray-600);
-          font-style: italic;
-        }
-        
-        body.dark-mode .message.typing {
-          background: var(--gray-700);
-          color: var(--gray-400);
-        }
-        
-        .html-generate-btn {
-          position: absolute;
-          top: -8px;
-          right: -8px;
-          width: 28px;
-          height: 28px;
-          background: var(--primary-black);
-          color: var(--primary-white);
-          border: none;
-          border-radius: 50%;
-          font-size: 12px;
-          cursor: pointer;
-          display: flex;
-          align-items: center;
-          justify-content: center;
-          box-shadow: var(--shadow);
-          transition: all 0.2s ease;
-        }
-        
-        .html-generate-btn:hover {
-          background: var(--gray-700);
-          transform: scale(1.1);
-        }
-        
-        body.dark-mode .html-generate-btn {
-          background: var(--primary-white);
-          color: var(--primary-black);
-        }
-        
-        body.dark-mode .html-generate-btn:hover {
-          background: var(--gray-200);
-        }
-        
-        /* Input Area */
-        .chat-input-area {
-          padding: 1.5rem;
-          background: var(--primary-white);
-          border-top: 1px solid var(--gray-200);
-        }
-        
-        body.dark-mode .chat-input-area {
-          background: var(--gray-900);
-          border-top-color: var(--gray-800);
-        }
-        
-        .input-container {
-          display: flex;
-          gap: 0.75rem;
-          align-items: flex-end;
-        }
-        
-        .chat-input {
-          flex: 1;
-          padding: 0.75rem 1rem;
-          border: 2px solid var(--gray-200);
-          border-radius: 12px;
-          font-size: 0.875rem;
-          resize: none;
-          outline: none;
-          transition: all 0.2s ease;
-          font-family: inherit;
-          max-height: 100px;
-          min-height: 44px;
-        }
-        
-        .chat-input:focus {
-          border-color: var(--primary-black);
-        }
-        
-        body.dark-mode .chat-input {
-          background: var(--gray-800);
-          border-color: var(--gray-700);
-          color: var(--primary-white);
-        }
-        
-        body.dark-mode .chat-input:focus {
-          border-color: var(--gray-500);
-        }
-        
-        .send-button {
-          width: 44px;
-          height: 44px;
-          background: var(--primary-black);
-          color: var(--primary-white);
-          border: none;
-          border-radius: 12px;
-          cursor: pointer;
-          display: flex;
-          align-items: center;
-          justify-content: center;
-          transition: all 0.2s ease;
-          flex-shrink: 0;
-        }
-        
-        .send-button:hover:not(:disabled) {
-          background: var(--gray-800);
-        }
-        
-        .send-button:disabled {
-          background: var(--gray-300);
-          cursor: not-allowed;
-        }
-        
-        body.dark-mode .send-button {
-          background: var(--gray-700);
-        }
-        
-        body.dark-mode .send-button:hover:not(:disabled) {
-          background: var(--gray-600);
-        }
-        
-        body.dark-mode .send-button:disabled {
-          background: var(--gray-800);
-        }
-        
-        /* Removed Modal Styles - no longer needed */
-        
-        /* Responsive Design */
-        @media (max-width: 1200px) {
-          .container {
-            grid-template-columns: 250px 1fr;
-            gap: 1.5rem;
-          }
-          
-          .history-sidebar {
-            display: none;
-          }
-        }
-        
-        @media (max-width: 1024px) {
-          .container {
-            grid-template-columns: 1fr;
-            gap: 1.5rem;
-            padding: 1rem;
-          }
-          
-          .sidebar {
-            position: relative;
-            top: 0;
-          }
-          
-          .chat-section {
-            height: 500px;
-          }
-        }
-        
-        @media (max-width: 768px) {
-          .header {
-            padding: 1rem;
-          }
-          
-          .header-content {
-            flex-direction: column;
-            gap: 1rem;
-            text-align: center;
-          }
-          
-          .logo {
-            justify-content: center;
-          }
-          
-          .container {
-            padding: 1rem 0.5rem;
-          }
-          
-          .sidebar,
-          .chat-section {
-            border-radius: 12px;
-          }
-          
-          .sidebar {
-            padding: 1.5rem;
-          }
-          
-          .chat-header {
-            padding: 1rem 1.5rem;
-          }
-          
-          .chat-messages {
-            padding: 1rem;
-          }
-          
-          .chat-input-area {
-            padding: 1rem 1.5rem;
-          }
-          
-          .message {
-            max-width: 90%;
-            padding: 0.875rem 1rem;
-          }
-        }
-      </style>
-      <script>
-        // Removido currentSessionId - agora usando conversa única contínua
-        
-        window.addEventListener('DOMContentLoaded', function() {
-          // Theme toggle functionality
-          const themeBtn = document.getElementById('theme-toggle');
-          themeBtn.addEventListener('click', function() {
-            document.body.classList.toggle('dark-mode');
-            if(document.body.classList.contains('dark-mode')) {
-              themeBtn.textContent = 'Modo Claro';
-            } else {
-              themeBtn.textContent = 'Modo Escuro';
-            }
-          });
-
-          // Removed loadConversationHistory() - no longer needed
-
-          // Chat functionality  
-          const chatInput = document.getElementById('chat-input');
-          const sendBtn = document.getElementById('send-button');
-          const messagesContainer = document.getElementById('chat-messages');
-
-          // Removed search functionality - no longer needed
-
-          function scrollToBottom() {
-            messagesContainer.scrollTop = messagesContainer.scrollHeight;
-          }
-
-          function createHtmlButton(responseId) {
-            const btn = document.createElement('button');
-            btn.className = 'html-generate-btn';
-            btn.innerHTML = '📄';
-            btn.title = 'Gerar HTML desta resposta';
-            btn.onclick = function(e) {
-              e.stopPropagation();
-              generateHtml(responseId);
-            };
-            return btn;
-          }
-
-          async function generateHtml(responseId) {
-            try {
-              const response = await fetch('/generate_html', {
-                method: 'POST',
-                headers: {
-                  'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ response_id: responseId })
-              });
-
-              const data = await response.json();
-             
-              if (data.success) {
-                window.open('/view_html/' + responseId, '_blank');
-              } else {
-                alert('Erro ao gerar HTML: ' + (data.error || 'Erro desconhecido'));
-              }
-            } catch (error) {
-              console.error('Erro ao gerar HTML:', error);
-              alert('Erro ao gerar HTML. Tente novamente.');
-            }
-          }
+    if not INLINE_INITIAL_CONVERSATION:
+        return get_home_assets().page.to_response()
+    
+    head, tail = get_home_assets().page_parts
+    
+    def generate():
+        # O shell estático sai primeiro; os dados do usuário vêm em seguida no mesmo response
+        yield head
+        try:
+            yield render_initial_conversation().encode('utf-8')
+        except Exception:
+            # Sem o bloco embutido a página busca o histórico normalmente
+            logger.exception('inline_conversation_failed')
+        yield tail
+    
+    encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+    body = generate()
+    if encoding:
+        body = compress_stream(body, encoding, COMPRESSION_LEVEL if encoding == 'gzip' else COMPRESSION_BROTLI_QUALITY,
+                               flush_each=True)
+    
+    response = Response(stream_with_context(body), content_type='text/html; charset=utf-8')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
-          function addMessage(content, type, responseId = null) {
-            const message = document.createElement('div');
-            message.className = `message ${type}`;
-            message.textContent = content;
-           
-            if (type === 'ai' && responseId) {
-              message.style.position = 'relative';
-              const htmlBtn = createHtmlButton(responseId);
-              message.appendChild(htmlBtn);
-            }
-           
-            messagesContainer.appendChild(message);
-            setTimeout(scrollToBottom, 100);
-          }
-
-          // Removed loadConversationHistory, loadConversation, and searchConversations functions - no longer needed
-
-          async function sendMessage() {
-            const message = chatInput.value.trim();
-            if (message && !sendBtn.disabled) {
-              sendBtn.disabled = true;
-              chatInput.disabled = true;
-
-              addMessage(message, 'user');
-
-              const typingMessage = document.createElement('div');
-              typingMessage.className = 'message ai typing';
-              typingMessage.textContent = 'SmartOps AI está digitando...';
-              messagesContainer.appendChild(typingMessage);
-              scrollToBottom();
-
-              chatInput.value = '';
-
-              try {
-                const response = await fetch('/chat', {
-                  method: 'POST',
-                  headers: {
-                    'Content-Type': 'application/json',
-                  },
-                  body: JSON.stringify({ 
-                    message: message
-                    // Removed session_id - using single continuous conversation
-                  })
-                });
-
-                const data = await response.json();
-                messagesContainer.removeChild(typingMessage);
-                addMessage(
-                  data.response || 'Desculpe, não consegui processar sua mensagem.',
-                  'ai',
-                  data.response_id
-                );
-
-                // Removed loadConversationHistory() call - no longer needed
-
-              } catch (error) {
-                console.error('Erro ao enviar mensagem:', error);
-                messagesContainer.removeChild(typingMessage);
-                addMessage('Desculpe, ocorreu um erro na comunicação. Tente novamente.', 'ai');
-              }
-
-              sendBtn.disabled = false;
-              chatInput.disabled = false;
-              chatInput.focus();
-            }
-          }
+@routes.route('/assets/<name>')
+def static_asset(name):
+    asset = get_home_assets().get(name)
+    if not asset:
+        return "Arquivo não encontrado", 404
+    return asset.to_response()
 
-          sendBtn.addEventListener('click', sendMessage);
-          chatInput.addEventListener('keypress', function(e) {
-            if (e.key === 'Enter' && !e.shiftKey && !sendBtn.disabled) {
-              e.preventDefault();
-              sendMessage();
-            }
-          });
-
-          chatInput.addEventListener('input', function() {
-            this.style.height = 'auto';
-            this.style.height = Math.min(this.scrollHeight, 100) + 'px';
-          });
-
-          // Removed history modal functionality - no longer needed
-          
-          // Load current conversation on page load
-          async function loadCurrentConversation() {
-            try {
-              const response = await fetch('/get_current_conversation');
-              const data = await response.json();
-              
-              if (data.success && data.messages.length > 0) {
-                messagesContainer.innerHTML = '';
-                data.messages.forEach(msg => {
-                  addMessage(msg.content, msg.message_type, msg.response_id);
-                });
-              } else {
-                // Show welcome message if no conversation exists
-                addMessage('Olá! Sou o SmartOps AI. Como posso ajudá-lo hoje?', 'ai');
-              }
-            } catch (error) {
-              console.error('Erro ao carregar conversa:', error);
-              addMessage('Olá! Sou o SmartOps AI. Como posso ajudá-lo hoje?', 'ai');
-            }
-          }
-          
-          // Load conversation on page load
-          loadCurrentConversation();
-          
-          // Removed loadConversationHistory() - no longer needed
-        });
-      </script>
-    </head>
-    <body>
-      <!-- Header -->
-      <header class="header">
-        <div class="header-content">
-          <div class="logo">
-            <div class="logo-icon">W</div>
-            <div class="logo-text">SmartOps AI</div>
-          </div>
-          <div class="header-controls">
-            <!-- Removed history button - no longer needed -->
-            <button id="theme-toggle" class="btn">Modo Escuro</button>
-          </div>
-        </div>
-      </header>
-
-      <!-- Main Container -->
-      <div class="container">
-        <!-- Left Sidebar -->
-        <aside class="sidebar">
-          <h2 class="sidebar-title">
-            🧠 Assistente Virtual Wood
-          </h2>
-          <p class="sidebar-subtitle">
-            Seu agente inteligente para automação e operações. Otimize seus processos de TI com o poder da inteligência artificial.
-          </p>
-        </aside>
-
-        <!-- Chat Section -->
-        <main class="chat-section">
-          <div class="chat-header">
-            <div class="chat-header-content">
-              <div class="chat-info-left">
-                <div class="chat-avatar">🤖</div>
-                <div class="chat-info">
-                  <h3>SmartOps AI</h3>
-                  <div class="chat-status">
-                    <div class="status-indicator"></div>
-                    <span>Online</span>
-                  </div>
-                </div>
-              </div>
-              <!-- Removed Nova Conversa button - using single continuous chat -->
-            </div>
-          </div>
-
-          <div class="chat-messages" id="chat-messages">
-            <!-- Messages will appear here -->
-          </div>
-
-          <div class="chat-input-area">
-            <div class="input-container">
-              <textarea 
-                id="chat-input" 
-                class="chat-input" 
-                placeholder="Digite sua mensagem..." 
-                rows="1"
-              ></textarea>
-              <button id="send-button" class="send-button">
-                <svg width="20" height="20" viewBox="0 0 24 24" fill="currentColor">
-                  <path d="M2.01 21L23 12 2.01 3 2 10l15 2-15 2z"/>
-                </svg>
-              </button>
-            </div>
-          </div>
-        </main>
-
-        <!-- Removed Right Sidebar - History no longer needed -->
-      </div>
-
-      <!-- Removed History Modal - No longer needed -->
-    </body>
-    </html>
-    """
-    return render_template_string(html_content)
+def extract_response_text(result):
+    """Extrai o texto da resposta da estrutura retornada pelo Langflow (None se não houver texto)"""
+    if isinstance(result, str):
+        result = json.loads(result)
+
+    outputs = result.get("outputs", [])
+    if isinstance(outputs, list) and outputs:
+        first_output = outputs[0]
+        nested_outputs = first_output.get("outputs", [])
+        if isinstance(nested_outputs, list) and nested_outputs:
+            deep_output = nested_outputs[0]
+            message_data = deep_output.get("results", {}).get("message", {}).get("data", {})
+            return message_data.get("text") or None
+    return None
 
 def extract_clean_response(result):
-    """Extrai a resposta de texto da estrutura retornada pelo Langflow"""
+    """Extrai a resposta de texto da estrutura retornada pelo Langflow (ou um texto de erro)"""
     try:
-        if isinstance(result, str):
-            result = json.loads(result)
-
-        outputs = result.get("outputs", [])
-        if isinstance(outputs, list) and outputs:
-            first_output = outputs[0]
-            nested_outputs = first_output.get("outputs", [])
-            if isinstance(nested_outputs, list) and nested_outputs:
-                deep_output = nested_outputs[0]
-                message_data = deep_output.get("results", {}).get("message", {}).get("data", {})
-                text = message_data.get("text")
-                if text:
-                    return text
-        return "Desculpe, não consegui interpretar a resposta."
+        return extract_response_text(result) or "Desculpe, não consegui interpretar a resposta."
     except Exception as e:
         return f"Erro ao extrair resposta: {str(e)}"
 
@@ -1225,7 +1815,9 @@ def markdown_to_html(markdown_text):
     html_content = re.sub(r'`([^`\n]+?)`', r'<code>\1</code>', html_content)
     
     # Processar links [texto](url)
-    html_content = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<a href="\2" target="_blank">\1</a>', html_content)
+    # Texto e URL não atravessam linhas nem outros colchetes/parênteses: uma tentativa que
+    # falha para no próximo delimitador (senão "[[[[..." custa tempo quadrático)
+    html_content = re.sub(r'\[([^\[\]\n]+)\]\(([^()\s]+)\)', r'<a href="\2" target="_blank">\1</a>', html_content)
     
     # Separar em linhas para processar listas e parágrafos
     lines = html_content.split('\n')
@@ -1283,14 +1875,21 @@ def markdown_to_html(markdown_text):
     
     return '\n'.join(processed_lines)
 
-def format_markdown_to_html(markdown_text, user_question=""):
-    """Converte markdown em HTML bem formatado com template simples para impressão"""
+def render_markdown_body(markdown_text):
+    """Converte o texto da resposta no HTML do corpo do documento (a parte cara da renderização)"""
     
     # Primeiro aplicar melhorias no markdown
     improved_markdown = text_to_markdown(markdown_text)
     
     # Converter para HTML
-    html_content = markdown_to_html(improved_markdown)
+    return markdown_to_html(improved_markdown)
+
+def format_markdown_to_html(markdown_text, user_question="", html_content=None):
+    """Converte markdown em HTML bem formatado com template simples para impressão
+    (html_content: corpo já renderizado, por exemplo vindo do cache)"""
+    
+    if html_content is None:
+        html_content = render_markdown_body(markdown_text)
     
     # Template HTML simples para impressão
     full_html = f"""<!DOCTYPE html>
@@ -1503,93 +2102,268 @@ def format_markdown_to_html(markdown_text, user_question=""):
     
     return full_html
 
-@app.route('/chat', methods=['POST'])
+def replay_chat_request(user_id, idempotency_key, row, message_hash):
+    """Resposta para um reenvio com chave já usada: o resultado gravado, ou 409 com Retry-After
+    se a execução original não terminar em IDEMPOTENCY_WAIT_SECONDS"""
+    if row[0] != message_hash:
+        CHAT_REPLAYS.inc(result='mismatch')
+        return jsonify({"error": "Idempotency-Key já usada com outra mensagem"}), 422
+    
+    status, response_id = row[1], row[2]
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.1
+    while status == 'in_progress' and time.monotonic() < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, 1.0)
+        status, response_id = db_manager.get_chat_request(user_id, idempotency_key) or ('failed', None)
+    
+    if status != 'completed':
+        CHAT_REPLAYS.inc(result=status)
+        response = jsonify({"error": "A mensagem anterior ainda está sendo processada. Tente novamente."})
+        response.status_code = 409
+        response.headers['Retry-After'] = '5'
+        return response
+    
+    CHAT_REPLAYS.inc(result='completed')
+    response = jsonify({
+        "response": db_manager.get_message_by_response_id(response_id),
+        "response_id": response_id,
+        "replayed": True
+    })
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+@routes.route('/chat', methods=['POST'])
 def chat():
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is not None and not IDEMPOTENCY_KEY_PATTERN.match(idempotency_key):
+        return jsonify({"error": "Idempotency-Key inválida"}), 400
+    claimed, user_id = False, None
+    
     try:
         data = request.get_json()
         user_message = data.get('message', '')
         # session_id não é mais usado - removido para conversas contínuas
         
         # Obter IP do cliente e ID do usuário
-        client_ip = get_client_ip()
-        user_id = db_manager.get_user_id(client_ip)
-        
-        # Obter ou criar conversa única do usuário
-        conversation_id = db_manager.get_current_conversation_id(user_id)
+        with chat_stage('resolve_user'):
+            client_ip = get_client_ip()
+            user_id = db_manager.get_user_id(client_ip)
+            
+            # Obter ou criar conversa única do usuário
+            conversation_id = db_manager.get_current_conversation_id(user_id)
+        
+        # Reenvio (timeout ou falha de rede no navegador): não executar o agente de novo
+        user_message_id = None
+        if idempotency_key:
+            message_hash = hashlib.sha256(user_message.encode('utf-8')).hexdigest()
+            with chat_stage('idempotency'):
+                claimed, row = db_manager.claim_chat_request(
+                    user_id, idempotency_key, message_hash,
+                    IDEMPOTENCY_TTL_HOURS * 3600, IDEMPOTENCY_STALE_SECONDS
+                )
+            if not claimed:
+                return replay_chat_request(user_id, idempotency_key, row, message_hash)
+            # Execução anterior com esta chave falhou depois de gravar a pergunta
+            user_message_id = row[3]
         
         # Obter mensagens recentes da conversa única do usuário
         # Busca mais mensagens para manter contexto completo
-        recent_messages = db_manager.get_recent_session_messages(conversation_id, limit=12)
-        
-        # Construir contexto das mensagens anteriores
-        context = build_context_from_history(recent_messages)
+        with chat_stage('recent_messages'):
+            recent_messages = db_manager.get_recent_session_messages(conversation_id, limit=12)
+            if user_message_id:
+                # A pergunta (e a resposta de erro) da tentativa anterior não entram de novo no contexto
+                for index, message in enumerate(recent_messages):
+                    if message[:2] == ('user', user_message):
+                        recent_messages = recent_messages[index + 1:]
+                        break
+        
+        # Construir contexto das mensagens anteriores (com o resumo de longo prazo)
+        with chat_stage('build_context'):
+            summary = get_summary_context(db_manager, conversation_id, SUMMARY_MAX_CHARS) if summary_scheduler else ""
+            context = build_context_from_history(recent_messages, summary=summary)
         
         # Salvar mensagem do usuário
-        db_manager.save_message(conversation_id, 'user', user_message)
+        if not user_message_id:
+            with chat_stage('save_message'):
+                user_message_id = db_manager.save_message(conversation_id, 'user', user_message)
+                if idempotency_key:
+                    db_manager.update_chat_request(user_id, idempotency_key, 'in_progress', user_message_id=user_message_id)
         
         # Preparar mensagem com contexto para o Langflow
         contextual_message = context + user_message if context else user_message
         
-        # Log para debug (configurável)
-        if DEBUG_MEMORY:
-            print(f"\n🔄 Nova mensagem do usuário (IP: {client_ip[:10]}...):")
-            print(f"📝 Mensagem: {user_message}")
-            print(f"🧠 Contexto aplicado: {'Sim' if context else 'Não'}")
-            if context:
-                print(f"📊 Tamanho do contexto: {len(context)} caracteres")
-                print(f"📋 Mensagens na conversa: {len(recent_messages)}")
-        
-        # Configuração do Langflow
-        langflow_url = "http://localhost:7860"
-        flow_id = "7da02070-24ec-4cc2-bb99-e089ce0cc283"
-        
-        payload = {
-            "input_value": contextual_message,
-            "output_type": "chat",
-            "input_type": "chat",
-            "tweaks": {}
-        }
-        
-        with requests.Session() as session:
-            response = session.post(
-                f"{langflow_url}/api/v1/run/{flow_id}",
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=1200
-            )
+        # Procurar pergunta quase idêntica já respondida (o cliente pode pedir resposta nova com "fresh")
+        with chat_stage('near_duplicate_lookup'):
+            # Calculada uma vez: serve para a busca e, no fim, para indexar a pergunta
+            question_fingerprint = near_duplicate_index.fingerprint(user_message) if near_duplicate_index else None
+            near_duplicate = None if data.get('fresh') else find_near_duplicate_answer(user_id, question_fingerprint)
+        agent_answered = False
+        # Só uma resposta de verdade do agente (não um texto de erro) é indexada para reaproveitamento
+        answer_extracted = False
+        
+        if near_duplicate and NEAR_DUPLICATE_SKIP_AGENT:
+            ai_response = near_duplicate[1]
+        else:
+            payload = {
+                "input_value": contextual_message,
+                "output_type": "chat",
+                "input_type": "chat",
+                "tweaks": {}
+            }
+            
+            run_id = uuid.uuid4().hex
+            
+            def cancel_run():
+                result = cancel_langflow_run(run_id)
+                CHAT_CANCELLED.inc(cancel_api=result)
+                LANGFLOW_RESPONSES.inc(status='cancelled')
+            
+            def call_langflow():
+                # Roda na thread auxiliar: se o cliente sair, a chamada continua até o Langflow
+                # responder (ou cancelar) e o gauge só desce quando ela termina de fato
+                LANGFLOW_IN_FLIGHT.inc()
+                try:
+                    return langflow_session.post(
+                        f"{LANGFLOW_URL}/api/v1/run/{FLOW_ID}",
+                        json=payload,
+                        headers={"Content-Type": "application/json", "X-Run-Id": run_id},
+                        timeout=1200
+                    )
+                finally:
+                    LANGFLOW_IN_FLIGHT.dec()
+            
+            try:
+                # Se o cliente fechar a conexão no meio, a espera termina e a execução é cancelada
+                with chat_stage('langflow'):
+                    response = run_cancellable(call_langflow, client_socket(request.environ), on_cancel=cancel_run)
+            except requests.exceptions.RequestException:
+                LANGFLOW_RESPONSES.inc(status='error')
+                raise
+            LANGFLOW_RESPONSES.inc(status=str(response.status_code))
            
             if response.status_code == 200:
-                result = response.json()
-                ai_response = extract_clean_response(result)
+                with chat_stage('extract_response'):
+                    result = response.json()
+                    ai_response = extract_clean_response(result)
+                    try:
+                        answer_extracted = extract_response_text(result) is not None
+                    except Exception:
+                        answer_extracted = False
+                agent_answered = True
             else:
                 ai_response = f"Erro na comunicação com o agente (Status: {response.status_code})"
         
         # Gerar response_id e salvar resposta da IA
         response_id = str(uuid.uuid4())
-        db_manager.save_message(conversation_id, 'ai', ai_response, response_id)
+        with chat_stage('save_message'):
+            db_manager.save_message(conversation_id, 'ai', ai_response, response_id)
+            if idempotency_key:
+                # Erro do agente: o reenvio com a mesma chave executa de novo em vez de repetir o erro
+                status = 'completed' if agent_answered or (near_duplicate and NEAR_DUPLICATE_SKIP_AGENT) else 'failed'
+                db_manager.update_chat_request(user_id, idempotency_key, status, response_id=response_id)
         
-        # Manter compatibilidade com sistema antigo
-        stored_responses[response_id] = {
-            'response': ai_response,
-            'question': user_message,
-            'timestamp': datetime.now()
-        }
-       
-        return jsonify({
+        # Indexar a pergunta para reaproveitar a resposta em perguntas semelhantes
+        if answer_extracted and question_fingerprint is not None:
+            near_duplicate_index.add(user_id, question_fingerprint, response_id)
+        
+        # Condensar mensagens antigas em background
+        if summary_scheduler:
+            summary_scheduler.maybe_schedule(conversation_id)
+        
+        # A visualização em HTML costuma vir logo em seguida
+        response_cache.set(response_id, {'response': ai_response, 'question': user_message})
+        
+        # Log para debug (configurável): um único registro com os tempos de cada etapa
+        if DEBUG_MEMORY:
+            fields = {
+                'conversation_id': conversation_id,
+                'context_chars': len(context),
+                'summary_chars': len(summary),
+                'recent_messages': len(recent_messages),
+                'near_duplicate_distance': near_duplicate[2] if near_duplicate else None,
+                'agent_answered': agent_answered,
+                'stages_ms': {stage: round(ms, 2) for stage, ms in g.stage_timings.items()}
+            }
+            # O texto da mensagem só aparece com LOG_LEVEL=DEBUG
+            if logger.isEnabledFor(logging.DEBUG):
+                fields['message'] = user_message[:200]
+            logger.info('chat', extra={'fields': fields})
+        
+        result = {
             "response": ai_response,
             "response_id": response_id
-        })
+        }
+        if near_duplicate:
+            result["near_duplicate"] = {
+                "response_id": near_duplicate[0],
+                "distance": near_duplicate[2],
+                "reused": NEAR_DUPLICATE_SKIP_AGENT
+            }
+       
+        return jsonify(result)
                
+    except ClientDisconnected:
+        # Ninguém vai ler a resposta: nada é gravado e um reenvio com a mesma chave executa de novo
+        stages = {stage: round(ms, 2) for stage, ms in g.stage_timings.items()}
+        logger.info('chat_cancelled', extra={'fields': {'stages_ms': stages}})
+        release_chat_request(claimed, user_id, idempotency_key)
+        return jsonify({"error": "Requisição cancelada pelo cliente"}), 499
     except requests.exceptions.RequestException as e:
+        stages = {stage: round(ms, 2) for stage, ms in g.stage_timings.items()}
+        logger.warning('langflow_unreachable', extra={'fields': {'error': str(e), 'stages_ms': stages}})
+        release_chat_request(claimed, user_id, idempotency_key)
         ai_response = f"Erro de conexão: {str(e)}"
         return jsonify({"response": ai_response})
     except Exception as e:
+        logger.exception('chat_failed')
+        release_chat_request(claimed, user_id, idempotency_key)
         ai_response = f"Erro interno: {str(e)}"
         return jsonify({"response": ai_response})
 
-@app.route('/get_current_conversation', methods=['GET'])
+def release_chat_request(claimed, user_id, idempotency_key):
+    """Marca a execução como falha para que um reenvio com a mesma chave tente de novo"""
+    if not claimed:
+        return
+    try:
+        db_manager.update_chat_request(user_id, idempotency_key, 'failed')
+    except Exception:
+        logger.exception('idempotency_release_failed')
+
+def query_int(name, default=None, minimum=0, maximum=None):
+    """Lê um parâmetro inteiro da query string. Ausente: default; acima de maximum: maximum.
+    Valor não inteiro ou abaixo de minimum gera ValueError (a rota responde 400)"""
+    raw = request.args.get(name)
+    if raw is None or raw == '':
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"Parâmetro '{name}' deve ser um número inteiro") from None
+    if value < minimum:
+        raise ValueError(f"Parâmetro '{name}' deve ser maior ou igual a {minimum}")
+    return value if maximum is None else min(value, maximum)
+
+def format_page_messages(rows):
+    """Formata linhas (id, tipo, conteúdo, timestamp, response_id) para JSON"""
+    return [{
+        'id': msg[0],
+        'message_type': msg[1],
+        'content': msg[2],
+        'timestamp': msg[3],
+        'response_id': msg[4]
+    } for msg in rows]
+
+@routes.route('/get_current_conversation', methods=['GET'])
 def get_current_conversation():
     """Retorna as mensagens da conversa única do usuário"""
+    # Paginação opcional: ?limit=N&before_id=X retorna as N mensagens anteriores a X
+    try:
+        limit = query_int('limit', minimum=1, maximum=MAX_PAGE_SIZE)
+        before_id = query_int('before_id', minimum=1)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
     try:
         client_ip = get_client_ip()
         user_id = db_manager.get_user_id(client_ip)
@@ -1597,8 +2371,21 @@ def get_current_conversation():
         # Obter a conversa única do usuário
         conversation_id = db_manager.get_current_conversation_id(user_id)
         
-        # Buscar todas as mensagens da conversa
-        messages = db_manager.get_conversation_messages(conversation_id, user_id)
+        if limit:
+            page, has_more = db_manager.get_conversation_messages_page(conversation_id, before_id, limit)
+            
+            return jsonify({
+                "success": True,
+                "conversation_id": conversation_id,
+                "version": db_manager.get_conversation_version(conversation_id) if before_id is None else None,
+                "messages": format_page_messages(page),
+                "has_more": has_more
+            })
+        
+        # Sem limit: a conversa inteira até MAX_PAGE_SIZE mensagens (as mais recentes)
+        messages = db_manager.get_conversation_messages(conversation_id, user_id, limit=MAX_PAGE_SIZE + 1)
+        has_more = len(messages) > MAX_PAGE_SIZE
+        messages = messages[-MAX_PAGE_SIZE:]
         
         formatted_messages = []
         for msg in messages:
@@ -1611,12 +2398,56 @@ def get_current_conversation():
         
         return jsonify({
             "success": True,
-            "messages": formatted_messages
+            "messages": formatted_messages,
+            "has_more": has_more
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@routes.route('/get_current_conversation/delta', methods=['GET'])
+def get_current_conversation_delta():
+    """Retorna apenas as mensagens novas (id > since_id) da conversa única, com versão/ETag"""
+    try:
+        since_id = query_int('since_id', default=0)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    try:
+        client_ip = get_client_ip()
+        user_id = db_manager.get_user_id(client_ip)
+        conversation_id = db_manager.get_current_conversation_id(user_id)
+        
+        version = db_manager.get_conversation_version(conversation_id)
+        if request.if_none_match.contains_weak(version):
+            response = Response(status=304)
+            response.set_etag(version, weak=True)
+            return response
+        
+        rows = db_manager.get_messages_since(conversation_id, since_id, MAX_PAGE_SIZE)
+        
+        if len(rows) > MAX_PAGE_SIZE:
+            # Cache do cliente antigo demais - devolver só a página mais recente e pedir reinício
+            rows, has_more = db_manager.get_conversation_messages_page(conversation_id, None, MAX_PAGE_SIZE)
+            reset = True
+        else:
+            has_more = None
+            reset = False
+        
+        response = jsonify({
+            "success": True,
+            "conversation_id": conversation_id,
+            "version": version,
+            "reset": reset,
+            "has_more": has_more,
+            "messages": format_page_messages(rows)
         })
+        response.set_etag(version, weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/get_conversations', methods=['GET'])
+@routes.route('/get_conversations', methods=['GET'])
 def get_conversations():
     """Retorna lista de conversas do usuário"""
     try:
@@ -1643,14 +2474,22 @@ def get_conversations():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/get_conversation/<int:conversation_id>', methods=['GET'])
+@routes.route('/get_conversation/<int:conversation_id>', methods=['GET'])
 def get_conversation(conversation_id):
-    """Retorna mensagens de uma conversa específica"""
+    """Retorna mensagens de uma conversa específica (?limit=N: as N mais recentes)"""
+    try:
+        limit = query_int('limit', default=MAX_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
     try:
         client_ip = get_client_ip()
         user_id = db_manager.get_user_id(client_ip)
         
-        messages = db_manager.get_conversation_messages(conversation_id, user_id)
+        # Uma linha a mais só para saber se há mensagens mais antigas
+        messages = db_manager.get_conversation_messages(conversation_id, user_id, limit=limit + 1)
+        has_more = len(messages) > limit
+        messages = messages[-limit:]
         
         formatted_messages = []
         for msg in messages:
@@ -1663,12 +2502,13 @@ def get_conversation(conversation_id):
         
         return jsonify({
             "success": True,
-            "messages": formatted_messages
+            "messages": formatted_messages,
+            "has_more": has_more
         })
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
-@app.route('/search_conversations', methods=['POST'])
+@routes.route('/search_conversations', methods=['POST'])
 def search_conversations():
     """Busca conversas por conteúdo"""
     try:
@@ -1700,7 +2540,7 @@ def search_conversations():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/get_full_history', methods=['GET'])
+@routes.route('/get_full_history', methods=['GET'])
 def get_full_history():
     """Retorna histórico completo do usuário para o modal"""
     try:
@@ -1727,13 +2567,58 @@ def get_full_history():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/generate_html', methods=['POST'])
+@routes.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas no formato texto do Prometheus (de todos os workers com METRICS_URL compartilhada)"""
+    body = shared_metrics.render() if shared_metrics else REGISTRY.render()
+    return Response(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@routes.route('/ready', methods=['GET'])
+def ready():
+    """Prontidão para o balanceador e estado do Langflow para o indicador da página"""
+    # Servidores WSGI sem o hook de início do worker: o primeiro health check inicia o aquecimento
+    start_langflow_monitor(current_app)
+    status = langflow_monitor.status() if langflow_monitor else {'state': 'ready'}
+    if graceful_shutdown.draining.is_set():
+        status['state'] = 'draining'
+    return jsonify(status), 200 if status['state'] == 'ready' else 503
+
+@routes.route('/admin/db_stats', methods=['GET'])
+def db_stats():
+    """Comandos SQL que mais consumiram tempo desde a subida dos workers (só administradores)"""
+    request_profiler.require_admin()
+    try:
+        limit = query_int('limit', default=50, minimum=1, maximum=500)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    stats = QueryStats.merge(shared_metrics.collect('query_stats')) if shared_metrics else QUERY_STATS
+    return jsonify({
+        'slow_query_ms': DB_SLOW_QUERY_MS,
+        'statements': stats.snapshot(limit)
+    })
+
+def find_stored_response(response_id):
+    """Resposta e pergunta pelo response_id: primeiro no cache, depois no banco
+    (com vários workers, a resposta pode ter sido gerada em outro processo)"""
+    def load():
+        row = db_manager.get_response_with_question(response_id)
+        return {'response': row[0], 'question': row[1] or ''} if row else None
+    
+    return response_cache.get_or_set(response_id, load)
+
+@routes.route('/admin/cache_stats', methods=['GET'])
+def cache_stats():
+    """Acertos por nível de cada cache (só administradores)"""
+    request_profiler.require_admin()
+    return jsonify({cache.name: cache.stats() for cache in (response_cache, html_cache)})
+
+@routes.route('/generate_html', methods=['POST'])
 def generate_html():
     try:
         data = request.get_json()
         response_id = data.get('response_id')
        
-        if not response_id or response_id not in stored_responses:
+        if not response_id or not find_stored_response(response_id):
             return jsonify({"success": False, "error": "Resposta não encontrada"})
        
         return jsonify({"success": True})
@@ -1741,18 +2626,121 @@ def generate_html():
     except Exception as e:
         return jsonify({"success": False, "error": str(e)})
 
-@app.route('/view_html/<response_id>')
+@routes.route('/view_html/<response_id>')
 def view_html(response_id):
-    if response_id not in stored_responses:
-        return "<h1>Resposta não encontrada</h1>", 404
+    # Só o corpo vai para o cache: o rodapé traz a data de geração do documento
+    body_html = html_cache.get(response_id)
+    if body_html is None:
+        response_data = find_stored_response(response_id)
+        if not response_data:
+            return "<h1>Resposta não encontrada</h1>", 404
+        
+        body_html = render_markdown_body(response_data['response'])
+        html_cache.set(response_id, body_html)
    
-    response_data = stored_responses[response_id]
-    html_content = format_markdown_to_html(
-        response_data['response'],
-        response_data['question']
-    )
-   
-    return html_content
+    return format_markdown_to_html(None, html_content=body_html)
+
+def init_worker(flask_app=None):
+    """Inicialização de cada processo que atende requisições.
+    
+    Chamada em create_app e de novo em cada worker depois do fork do servidor WSGI
+    (ver gunicorn.conf.py): sockets e threads não podem ser herdados do processo mestre.
+    As conexões SQLite já são recriadas sozinhas ao detectar o novo PID.
+    """
+    global langflow_session
+    pool_size = flask_app.config['LANGFLOW_POOL_SIZE'] if flask_app else get_config().LANGFLOW_POOL_SIZE
+    langflow_session = create_langflow_session(pool_size)
+    if summary_scheduler:
+        summary_scheduler.restart()
+    if shared_metrics:
+        shared_metrics.start()
+
+def start_langflow_monitor(flask_app=None):
+    """Inicia o aquecimento e as sondas do Langflow neste processo.
+    
+    Chamada ao iniciar o servidor de desenvolvimento e em cada worker do gunicorn (nunca
+    no mestre, que só faz o fork). A subida não espera o Langflow; a rota /ready sim.
+    """
+    if not langflow_monitor:
+        return
+    warmup = flask_app.config['LANGFLOW_WARMUP'] if flask_app else get_config().LANGFLOW_WARMUP
+    langflow_monitor.warmup_prompt = LANGFLOW_WARMUP_PROMPT if warmup else ''
+    langflow_monitor.start(langflow_session)
+
+def create_app(config=None):
+    """Cria a aplicação Flask com a configuração indicada (padrão: variável APP_CONFIG)"""
+    global home_assets
+    
+    flask_app = Flask(__name__)
+    flask_app.config.from_object(config or get_config())
+    
+    # A ordem importa: os hooks de métricas (no blueprint) rodam depois da compressão
+    flask_app.register_blueprint(routes)
+    # Logo depois dos hooks do blueprint (que calculam g.ip_hash): requisições recusadas não passam pelo profiler
+    if rate_limiter:
+        rate_limiter.init_app(flask_app)
+    graceful_shutdown.init_app(flask_app)
+    response_compression.init_app(flask_app)
+    request_profiler.init_app(flask_app)
+    
+    if flask_app.config['EAGER_INIT']:
+        home_assets = build_home_assets(flask_app)
+        if isinstance(db_manager, LazyInstance):
+            db_manager.instance()
+    init_worker(flask_app)
+    return flask_app
+
+@graceful_shutdown.register
+def flush_summaries():
+    """Termina os resumos pendentes (gravados em background depois das respostas)"""
+    if summary_scheduler:
+        summary_scheduler.shutdown(wait=True)
+
+@graceful_shutdown.register
+def stop_langflow_monitor():
+    if langflow_monitor:
+        langflow_monitor.stop(timeout=1)
+
+@graceful_shutdown.register
+def publish_metrics():
+    """Grava as métricas finais do processo (contadores de um worker que saiu continuam na soma)"""
+    if shared_metrics:
+        shared_metrics.stop()
+
+@graceful_shutdown.register
+def checkpoint_databases():
+    db_manager.checkpoint_wal()
+    if cache_backend and hasattr(cache_backend, 'checkpoint_wal'):
+        cache_backend.checkpoint_wal()
+
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # Backfill de embeddings em background (opcional)
+    if os.environ.get('EMBEDDING_BACKFILL') == '1':
+        from embedding_backfill import EmbeddingBackfillWorker
+        backfill_worker = EmbeddingBackfillWorker(db_manager, embed_texts, EMBEDDING_MODEL)
+        backfill_worker.start()
+        # Antes do checkpoint: o lote em andamento termina e grava o checkpoint do worker
+        graceful_shutdown.register(backfill_worker.stop, first=True)
+    
+    # Arquivamento do histórico antigo em background (opcional; em produção, prefira o CLI via cron)
+    if os.environ.get('MESSAGE_ARCHIVE') == '1':
+        from archive_worker import ArchiveWorker, keep_recent_for
+        archive_worker = ArchiveWorker(
+            db_manager,
+            keep_recent=keep_recent_for(SUMMARY_KEEP_RECENT),
+            summarized_only=SUMMARY_BACKEND != 'off'
+        )
+        archive_worker.start()
+        graceful_shutdown.register(archive_worker.stop, first=True)
+    
+    # SIGTERM drena os /chat em andamento antes de sair. Com o reloader do modo debug,
+    # só o processo filho (o que atende as requisições) instala o handler
+    if not app.config['DEBUG'] or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        graceful_shutdown.install_signal_handlers()
+        start_langflow_monitor(app)
+    
+    # Servidor de desenvolvimento (um processo só). Em produção, use o servidor WSGI:
+    #     gunicorn -c gunicorn.conf.py wsgi:application
+    app.run(host=app.config['HOST'], port=app.config['PORT'], debug=app.config['DEBUG'])
\ No newline at end of file
@@ -0,0 +1,190 @@
+"""
+Job de arquivamento: move o histórico antigo da tabela `messages` para o arquivo frio.
+
+Para cada conversa com mensagens mais antigas que o limite de idade, pega o
+prefixo arquivável (ver DatabaseManager.get_archivable_messages), grava em
+blocos comprimidos nos segmentos (message_archive.py) e, só depois do fsync,
+registra os blocos no índice e apaga as mensagens da tabela quente na mesma
+transação. As leituras paginadas do histórico continuam vendo as mensagens,
+agora vindas do arquivo.
+
+O que fica sempre na tabela quente:
+- as keep_recent mensagens mais recentes de cada conversa (contexto do /chat,
+  primeira página do histórico);
+- as mensagens ainda não cobertas pelos resumos de longo prazo, quando os
+  resumos estão ligados (o resumidor lê da tabela quente).
+
+As páginas liberadas pelo DELETE são reaproveitadas pelas novas mensagens, então
+o arquivo do banco para de crescer; --vacuum devolve o espaço ao sistema de
+arquivos de uma vez (trava o banco enquanto roda).
+
+Uso como CLI (ex.: diário, via cron ou timer do systemd):
+    python archive_worker.py --db chatbot_memory.db --older-than-days 30
+
+Uso como thread (as dependências vêm de quem chama; este módulo não importa o app):
+    worker = ArchiveWorker(db_manager, keep_recent=..., summarized_only=...)
+    worker.start()
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+
+# Mantém na tabela quente pelo menos as primeiras páginas do histórico (quem chama soma a janela
+# de contexto do /chat, ver keep_recent_for)
+DEFAULT_KEEP_RECENT = 200
+
+
+def keep_recent_for(summary_keep_recent):
+    """Mensagens que ficam na tabela quente: a janela de contexto do /chat e as primeiras páginas"""
+    return max(summary_keep_recent, DEFAULT_KEEP_RECENT)
+
+
+class ArchiveWorker:
+    def __init__(self, db_manager, older_than_days=30, keep_recent=DEFAULT_KEEP_RECENT, block_size=200,
+                 summarized_only=True, pause=0.05, idle_interval=3600.0, verbose=False):
+        self.db_manager = db_manager
+        self.older_than_seconds = older_than_days * 86400
+        self.keep_recent = keep_recent
+        # Mensagens por bloco comprimido (uma página do histórico descomprime no máximo dois)
+        self.block_size = block_size
+        # Só arquiva o que os resumos de longo prazo já cobrem
+        self.summarized_only = summarized_only
+        # Pausa entre conversas: nunca segurar o lock de escrita do SQLite por muito tempo
+        self.pause = pause
+        # Intervalo entre as passadas no modo contínuo
+        self.idle_interval = idle_interval
+        self.verbose = verbose
+
+        self.archived = 0
+        self.blocks = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    def archive_conversation(self, conversation_id):
+        """Arquiva o prefixo antigo de uma conversa. Retorna o número de mensagens arquivadas"""
+        max_id = self.db_manager.get_last_summarized_id(conversation_id) if self.summarized_only else 2 ** 63 - 1
+        archived = 0
+        while not self._stop_event.is_set():
+            rows = self.db_manager.get_archivable_messages(
+                conversation_id, self.older_than_seconds, self.keep_recent, max_id, self.block_size
+            )
+            if not rows:
+                break
+
+            # Primeiro o bloco no disco, depois o índice e o DELETE (uma queda no meio só deixa bytes sem uso)
+            location = self.db_manager.archive.append(conversation_id, rows)
+            if not self.db_manager.archive_message_block(conversation_id, rows, location):
+                self._log(f"⚠️ Conversa {conversation_id}: mensagens já arquivadas por outro processo")
+                break
+
+            archived += len(rows)
+            self.blocks += 1
+            self._log(f"🧊 Conversa {conversation_id}: ids {rows[0][0]}-{rows[-1][0]} arquivados "
+                      f"({len(rows)} mensagens, {location[2]} bytes)")
+            self._stop_event.wait(self.pause)
+            if len(rows) < self.block_size:
+                break
+
+        self.archived += archived
+        return archived
+
+    def run_once(self):
+        """Uma passada por todas as conversas com mensagens antigas. Retorna quantas mensagens arquivou"""
+        archived = 0
+        last_conversation_id = 0
+        while not self._stop_event.is_set():
+            candidates = self.db_manager.get_archive_candidates(self.older_than_seconds, last_conversation_id)
+            if not candidates:
+                break
+            for conversation_id in candidates:
+                if self._stop_event.is_set():
+                    break
+                archived += self.archive_conversation(conversation_id)
+                last_conversation_id = conversation_id
+        return archived
+
+    def run(self, follow=False):
+        """Arquiva tudo o que estiver elegível (e repete a cada idle_interval se follow=True)"""
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e):
+                    raise
+                # Banco ocupado pelo tráfego ao vivo - tenta na próxima passada
+                self._log("⏳ Banco ocupado, arquivamento adiado")
+            if not follow:
+                break
+            self._stop_event.wait(self.idle_interval)
+
+        self._log(f"✅ Arquivamento finalizado: {self.archived} mensagens em {self.blocks} blocos")
+        return self.archived
+
+    def start(self, follow=True):
+        """Inicia o worker em uma thread daemon"""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self.run,
+            kwargs={'follow': follow},
+            name='message-archive',
+            daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        """Sinaliza a parada e aguarda a thread terminar o bloco atual"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+def main():
+    from app import ARCHIVE_DIR, DATABASE, SUMMARY_BACKEND, SUMMARY_KEEP_RECENT, DatabaseManager
+
+    parser = argparse.ArgumentParser(description='Move o histórico antigo para o arquivo frio comprimido')
+    parser.add_argument('--db', default=DATABASE, help='Caminho do banco SQLite')
+    parser.add_argument('--archive-dir', default=ARCHIVE_DIR or None,
+                        help='Diretório dos segmentos (padrão: <banco>_archive)')
+    parser.add_argument('--older-than-days', type=float, default=30, help='Idade mínima das mensagens arquivadas')
+    parser.add_argument('--keep-recent', type=int, default=keep_recent_for(SUMMARY_KEEP_RECENT),
+                        help='Mensagens mais recentes de cada conversa que ficam na tabela')
+    parser.add_argument('--block-size', type=int, default=200, help='Mensagens por bloco comprimido')
+    parser.add_argument('--vacuum', action='store_true', help='Devolve o espaço liberado ao sistema de arquivos')
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(args.db, archive_dir=args.archive_dir)
+    worker = ArchiveWorker(
+        db_manager,
+        older_than_days=args.older_than_days,
+        keep_recent=args.keep_recent,
+        block_size=args.block_size,
+        summarized_only=SUMMARY_BACKEND != 'off',
+        verbose=True
+    )
+
+    started = time.perf_counter()
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        print(f"\n⏹️ Interrompido - {worker.archived} mensagens já arquivadas")
+        return
+    print(f"⏱️ {time.perf_counter() - started:.1f}s")
+
+    if args.vacuum:
+        with sqlite3.connect(args.db) as conn:
+            conn.execute('VACUUM')
+        print("🧹 VACUUM concluído")
+
+
+if __name__ == '__main__':
+    main()
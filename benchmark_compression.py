@@ -0,0 +1,92 @@
+"""
+Benchmark da compressão das respostas JSON de histórico.
+
+Gera uma conversa sintética, chama as rotas de histórico com cada codificação e
+mede os bytes enviados e o tempo de CPU por requisição.
+
+Uso:
+    python benchmark_compression.py --messages 400 --requests 20 --output bench_compression.json
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import app as chatbot
+from app import DatabaseManager
+from static_assets import brotli
+from synthetic_data import random_answer, random_question
+
+ENDPOINTS = ['/get_current_conversation', '/get_full_history', '/get_conversations']
+CLIENT_IP = '10.1.1.1'
+
+
+def populate(db_manager, messages, seed=42):
+    rng = random.Random(seed)
+    user_id = db_manager.get_user_id(CLIENT_IP)
+    conversation_id = db_manager.get_current_conversation_id(user_id)
+    for _ in range(messages // 2):
+        db_manager.save_message(conversation_id, 'user', random_question(rng))
+        db_manager.save_message(conversation_id, 'ai', random_answer(rng), os.urandom(8).hex())
+
+
+def measure(client, endpoint, accept_encoding, requests_count):
+    headers = {'X-Forwarded-For': CLIENT_IP, 'Accept-Encoding': accept_encoding}
+    wire_bytes = 0
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(requests_count):
+        response = client.get(endpoint, headers=headers)
+        wire_bytes = len(response.get_data())
+    return {
+        'bytes': wire_bytes,
+        'cpu_ms': (time.process_time() - cpu_start) * 1000 / requests_count,
+        'wall_ms': (time.perf_counter() - wall_start) * 1000 / requests_count
+    }
+
+
+def run(messages, requests_count):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        chatbot.db_manager = DatabaseManager(os.path.join(tmp_dir, 'bench.db'))
+        populate(chatbot.db_manager, messages)
+
+        client = chatbot.app.test_client()
+        variants = [('identity', {}), ('gzip', {'gzip_level': 1}),
+                    ('gzip', {'gzip_level': 6}), ('gzip', {'gzip_level': 9})]
+        if brotli:
+            variants += [('br', {'brotli_quality': 4}), ('br', {'brotli_quality': 11})]
+
+        results = []
+        for endpoint in ENDPOINTS:
+            for encoding, options in variants:
+                # Reconfigura o middleware já registrado no app
+                compressor = chatbot.response_compression
+                compressor.gzip_level = options.get('gzip_level', compressor.gzip_level)
+                compressor.brotli_quality = options.get('brotli_quality', compressor.brotli_quality)
+
+                result = measure(client, endpoint, encoding, requests_count)
+                result.update({'endpoint': endpoint, 'encoding': encoding, 'options': options})
+                results.append(result)
+                print(f"{endpoint:28} {encoding:8} {json.dumps(options):24} "
+                      f"{result['bytes']:>10} bytes  {result['cpu_ms']:8.2f} ms CPU/req")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da compressão das rotas de histórico')
+    parser.add_argument('--messages', type=int, default=400, help='Mensagens na conversa sintética')
+    parser.add_argument('--requests', type=int, default=20, help='Requisições por combinação')
+    parser.add_argument('--output', help='Arquivo JSON para salvar os resultados')
+    args = parser.parse_args()
+
+    results = run(args.messages, args.requests)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'messages': args.messages, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
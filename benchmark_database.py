@@ -0,0 +1,214 @@
+"""
+Benchmark do DatabaseManager em escala.
+
+Gera bancos sintéticos de vários tamanhos (até 10 mil usuários e 1 milhão de
+mensagens, com tamanhos de mensagem realistas e poucos usuários muito ativos) e
+mede a latência das operações usadas pelas rotas. Os resultados vão para JSON e
+podem ser comparados com os de outro commit (--compare), falhando se alguma
+operação piorar além do limite.
+
+Com --content-codec, as mensagens geradas são comprimidas (message_codec.py) antes
+das medições, e o relatório mostra o tamanho do banco e a vazão de leitura do
+histórico para comparar com a execução sem compressão.
+
+Uso:
+    python benchmark_database.py --scales small medium --output bench_database.json
+    python benchmark_database.py --scales medium --content-codec zlib --compare bench_database.json
+    python benchmark_database.py --scales large --data-dir /tmp/bench-dbs --compare bench_database.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from app import DatabaseManager
+from message_codec import compress_existing, train_dictionary
+from synthetic_data import activity_weights, populate_database, random_answer, random_question, user_ip
+
+# (usuários, mensagens)
+SCALES = {
+    'small': (100, 10_000),
+    'medium': (1_000, 100_000),
+    'large': (10_000, 1_000_000)
+}
+SEARCH_TERMS = ['backup', 'firewall', 'certificado', 'Kubernetes', 'deploy']
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def time_operation(operation, iterations):
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        operation(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.mean(samples), 4),
+        'p50_ms': round(percentile(samples, 0.5), 4),
+        'p95_ms': round(percentile(samples, 0.95), 4),
+        'p99_ms': round(percentile(samples, 0.99), 4),
+        'ops_per_sec': round(iterations / (sum(samples) / 1000), 1)
+    }
+
+
+def prepare_database(path, users, messages, seed, content_codec='off'):
+    """Cria o banco sintético (ou reaproveita um já gerado com os mesmos parâmetros)"""
+    if os.path.exists(path):
+        return 0.0
+    started = time.perf_counter()
+    db_manager = DatabaseManager(path, content_codec=content_codec)
+    populate_database(path, users, messages, random.Random(seed))
+    if content_codec != 'off':
+        if content_codec == 'zstd':
+            db_manager.save_content_dictionary(train_dictionary(db_manager.get_dictionary_samples()))
+        compress_existing(db_manager, batch_size=5000, pause=0)
+        with sqlite3.connect(path) as conn:
+            conn.execute('VACUUM')
+    return time.perf_counter() - started
+
+
+def read_throughput(db_manager, conversation_ids, limit=100):
+    """MB/s de texto entregue lendo a primeira página do histórico de cada conversa"""
+    started = time.perf_counter()
+    total = 0
+    for conversation_id in conversation_ids:
+        messages, _ = db_manager.get_conversation_messages_page(conversation_id, limit=limit)
+        total += sum(len(message[2].encode('utf-8')) for message in messages)
+    return round(total / (1024 * 1024) / (time.perf_counter() - started), 2)
+
+
+def run_scale(name, users, messages, data_dir, iterations, seed, content_codec='off'):
+    suffix = '' if content_codec == 'off' else f'_{content_codec}'
+    path = os.path.join(data_dir, f"bench_{users}u_{messages}m_{seed}{suffix}.db")
+    populate_seconds = prepare_database(path, users, messages, seed, content_codec)
+    db_manager = DatabaseManager(path, content_codec=content_codec)
+    rng = random.Random(seed)
+
+    # Metade sorteada uniformemente (usuários esporádicos) e metade pela atividade
+    # (quem mais conversa também é quem mais faz requisições)
+    weighted = rng.choices(range(users), cum_weights=activity_weights(users), k=iterations)
+    sample = [weighted[i] if i % 2 else rng.randrange(users) for i in range(iterations)]
+    ips = [user_ip(i) for i in sample]
+    user_ids = [db_manager.get_user_id(ip) for ip in ips]
+    conversation_ids = [db_manager.get_current_conversation_id(user_id) for user_id in user_ids]
+    questions = [random_question(rng) for _ in range(iterations)]
+    answers = [random_answer(rng, 200, 2000) for _ in range(iterations)]
+
+    operations = {
+        'get_user_id': lambda i: db_manager.get_user_id(ips[i]),
+        'get_current_conversation_id': lambda i: db_manager.get_current_conversation_id(user_ids[i]),
+        'get_recent_session_messages': lambda i: db_manager.get_recent_session_messages(conversation_ids[i], limit=12),
+        'get_user_conversations': lambda i: db_manager.get_user_conversations(user_ids[i]),
+        'search_conversations': lambda i: db_manager.search_conversations(user_ids[i], SEARCH_TERMS[i % len(SEARCH_TERMS)]),
+        'get_conversation_messages': lambda i: db_manager.get_conversation_messages(conversation_ids[i], user_ids[i]),
+        'get_conversation_messages_page': lambda i: db_manager.get_conversation_messages_page(conversation_ids[i], limit=50),
+        # Escritas por último para as leituras verem o banco como foi gerado
+        'save_message': lambda i: db_manager.save_message(
+            conversation_ids[i], 'user' if i % 2 == 0 else 'ai',
+            questions[i] if i % 2 == 0 else answers[i])
+    }
+
+    result = {
+        'scale': name,
+        'users': users,
+        'messages': messages,
+        'content_codec': content_codec,
+        'db_size_bytes': os.path.getsize(path),
+        'populate_seconds': round(populate_seconds, 2),
+        'history_read_mb_per_sec': read_throughput(db_manager, conversation_ids),
+        'operations': {}
+    }
+    print(f"{name:>7} {'db_size':30} {result['db_size_bytes'] / (1024 * 1024):9.1f} MB  "
+          f"leitura do histórico {result['history_read_mb_per_sec']:.1f} MB/s ({content_codec})")
+    for operation_name, operation in operations.items():
+        stats = time_operation(operation, iterations)
+        result['operations'][operation_name] = stats
+        print(f"{name:>7} {operation_name:30} p50 {stats['p50_ms']:9.3f} ms  "
+              f"p95 {stats['p95_ms']:9.3f} ms  p99 {stats['p99_ms']:9.3f} ms")
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, max_regression):
+    """Compara o p50 de cada operação com um resultado anterior. Retorna as regressões"""
+    with open(baseline_path) as f:
+        baseline = {r['scale']: r for r in json.load(f)['results']}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['scale'])
+        if not previous:
+            continue
+        for name, stats in result['operations'].items():
+            before = previous['operations'].get(name)
+            if not before or not before['p50_ms']:
+                continue
+            ratio = stats['p50_ms'] / before['p50_ms']
+            marker = '⚠️' if ratio > max_regression else '  '
+            print(f"{marker} {result['scale']:>7} {name:30} {before['p50_ms']:9.3f} -> {stats['p50_ms']:9.3f} ms ({ratio:.2f}x)")
+            if ratio > max_regression:
+                regressions.append((result['scale'], name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do DatabaseManager com dados sintéticos')
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=['small', 'medium'])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=2024)
+    parser.add_argument('--data-dir', help='Diretório para guardar e reaproveitar os bancos gerados')
+    parser.add_argument('--content-codec', choices=['off', 'zlib', 'zstd'], default='off',
+                        help='Comprime o conteúdo das mensagens geradas antes das medições')
+    parser.add_argument('--output', help='Arquivo JSON para salvar os resultados')
+    parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--max-regression', type=float, default=1.5,
+                        help='Falha se o p50 de alguma operação crescer mais que este fator')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_dir = args.data_dir or tmp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        results = [run_scale(name, *SCALES[name], data_dir, args.iterations, args.seed, args.content_codec)
+                   for name in args.scales]
+
+    report = {
+        'commit': git_commit(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'iterations': args.iterations,
+        'seed': args.seed,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        if regressions:
+            print(f"❌ {len(regressions)} operação(ões) acima de {args.max_regression}x")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
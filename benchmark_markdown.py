@@ -0,0 +1,150 @@
+"""
+Benchmark e gate de regressão da renderização de markdown (/view_html).
+
+O corpus mistura respostas realistas da IA (títulos, listas, negrito, links) com
+entradas adversariais que exploram as expressões regulares de text_to_markdown e
+markdown_to_html: delimitadores sem fechamento, colchetes e parênteses em série,
+linhas enormes, milhares de linhas curtas. Cada caso é renderizado em tamanhos
+crescentes; o gate falha se o tempo por KB passar do orçamento ou se o tempo
+crescer mais que linearmente com o tamanho da entrada.
+
+Uso:
+    python benchmark_markdown.py --sizes 4 16 64 --output bench_markdown.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+from synthetic_data import SENTENCES, random_answer
+
+# Orçamento de tempo por KB de resposta (uma resposta de 64 KB fica abaixo de ~320 ms)
+BUDGET_MS_PER_KB = float(os.environ.get('MARKDOWN_BUDGET_MS_PER_KB', '5'))
+# Expoente máximo de crescimento (1 = linear); a folga absorve ruído de medição
+MAX_GROWTH_EXPONENT = 1.3
+# Abaixo deste tempo a medição é ruído demais para estimar o crescimento
+MIN_GROWTH_MS = 5
+
+
+def _repeat(unit, size):
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def _realistic(size):
+    rng = random.Random(size)
+    parts = []
+    while sum(len(p) for p in parts) < size:
+        parts.append(random_answer(rng, 500, 3000))
+        parts.append(f"Mais detalhes em [documentação interna](https://wiki.exemplo.com.br/pagina-{len(parts)}) "
+                     f"e no comando `systemctl status servico-{len(parts)}`.")
+    return '\n\n'.join(parts)[:size]
+
+
+def _plain_paragraphs(size):
+    rng = random.Random(size)
+    return _repeat(' '.join(rng.choice(SENTENCES) for _ in range(200)) + '\n\n', size)
+
+
+CORPUS = {
+    # Respostas realistas
+    'realista': _realistic,
+    'paragrafos': _plain_paragraphs,
+    'lista_longa': lambda size: _repeat('- **Item** com `codigo` e _enfase_ no texto\n', size),
+    # Entradas adversariais
+    'colchetes_abertos': lambda size: '[' * size,
+    'links_sem_fechamento': lambda size: _repeat('[a](', size),
+    'link_sem_url': lambda size: _repeat('[texto] ', size),
+    'negrito_sem_fechamento': lambda size: '**' + _repeat('a ', size - 2),
+    'negritos_em_serie': lambda size: _repeat('** a ', size),
+    'asteriscos': lambda size: '*' * size,
+    'sublinhados': lambda size: _repeat('_a', size),
+    'crases': lambda size: _repeat('`a', size),
+    'linha_unica_enorme': lambda size: _repeat('palavra ', size),
+    'titulo_e_linhas_vazias': lambda size: '#' + '\n' * (size - 2) + 'x',
+    'titulos_em_serie': lambda size: _repeat('# a\n\n', size),
+    'linhas_curtas': lambda size: _repeat('titulo\n', size),
+    'quebras_crlf': lambda size: _repeat('a\r\n', size),
+}
+
+
+def measure(render, text, repeat=3):
+    """Menor tempo (ms) de várias execuções: reduz a interferência do resto do sistema"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render(text)
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def run(render, sizes_kb, cases=None, repeat=3):
+    """Renderiza cada caso do corpus em cada tamanho. Retorna a lista de resultados"""
+    results = []
+    for name in cases or CORPUS:
+        timings = []
+        for size_kb in sizes_kb:
+            text = CORPUS[name](size_kb * 1024)
+            timings.append({'size_kb': size_kb, 'ms': round(measure(render, text, repeat), 3)})
+
+        first, last = timings[0], timings[-1]
+        exponent = None
+        if last['ms'] >= MIN_GROWTH_MS and first['ms'] > 0 and last['size_kb'] > first['size_kb']:
+            exponent = math.log(last['ms'] / first['ms']) / math.log(last['size_kb'] / first['size_kb'])
+        results.append({
+            'case': name,
+            'timings': timings,
+            'ms_per_kb': round(max(t['ms'] / t['size_kb'] for t in timings), 4),
+            'growth_exponent': round(exponent, 2) if exponent is not None else None
+        })
+    return results
+
+
+def check(results, budget_ms_per_kb=BUDGET_MS_PER_KB, max_exponent=MAX_GROWTH_EXPONENT):
+    """Lista as violações do gate (orçamento por KB ou crescimento superlinear)"""
+    failures = []
+    for result in results:
+        if result['ms_per_kb'] > budget_ms_per_kb:
+            failures.append(f"{result['case']}: {result['ms_per_kb']:.3f} ms/KB (orçamento {budget_ms_per_kb} ms/KB)")
+        if result['growth_exponent'] is not None and result['growth_exponent'] > max_exponent:
+            failures.append(f"{result['case']}: crescimento O(n^{result['growth_exponent']:.2f}) (máximo {max_exponent})")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark da renderização de markdown')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 16, 64], help='Tamanhos em KB')
+    parser.add_argument('--cases', nargs='+', choices=list(CORPUS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--budget', type=float, default=BUDGET_MS_PER_KB, help='Orçamento em ms por KB')
+    parser.add_argument('--max-exponent', type=float, default=MAX_GROWTH_EXPONENT)
+    parser.add_argument('--output', help='Arquivo JSON para salvar os resultados')
+    args = parser.parse_args()
+
+    from app import format_markdown_to_html
+
+    results = run(format_markdown_to_html, sorted(args.sizes), args.cases, args.repeat)
+    for result in results:
+        timings = '  '.join(f"{t['size_kb']:>4} KB {t['ms']:9.2f} ms" for t in result['timings'])
+        exponent = result['growth_exponent']
+        print(f"{result['case']:24} {timings}  {result['ms_per_kb']:7.3f} ms/KB  "
+              f"n^{exponent if exponent is not None else '-'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failures = check(results, args.budget, args.max_exponent)
+    if failures:
+        print("❌ Gate de renderização falhou:")
+        for failure in failures:
+            print(f"   {failure}")
+        sys.exit(1)
+    print("✅ Renderização dentro do orçamento e com crescimento linear")
+
+
+if __name__ == '__main__':
+    main()
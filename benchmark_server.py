@@ -0,0 +1,139 @@
+"""
+Compara o servidor de desenvolvimento do Flask com o gunicorn (vários workers).
+
+Sobe um Langflow falso e, para cada modo, um servidor em um banco temporário em
+um processo separado; depois roda a mesma carga de load_test.py contra cada um
+e mostra vazão e latências lado a lado.
+
+Uso:
+    python benchmark_server.py --users 50 --duration 30 --workers 4 --threads 16
+    python benchmark_server.py --modes gunicorn --output bench_server.json
+
+O ganho do gunicorn aparece no trabalho de CPU (markdown, compressão, JSON):
+com um único núcleo os modos tendem a empatar, porque a espera pelo Langflow já
+é atendida em paralelo pelas threads dos dois servidores.
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from fake_langflow import FakeLangflow
+from load_test import VirtualUser, summarize
+
+MODES = ('flask', 'gunicorn')
+
+
+def server_command(mode, port, workers, threads):
+    if mode == 'flask':
+        return [sys.executable, 'app.py']
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+            'wsgi:application']
+
+
+def start_server(mode, port, langflow_url, db_path, workers, threads):
+    """Inicia o servidor em um grupo de processos próprio e espera ele responder"""
+    env = dict(os.environ,
+               PORT=str(port), HOST='127.0.0.1', DATABASE_PATH=db_path,
+               LANGFLOW_URL=langflow_url, LOG_LEVEL='WARNING', RATE_LIMIT_ENABLED='0',
+               APP_CONFIG='production', WEB_THREADS=str(threads))
+    process = subprocess.Popen(server_command(mode, port, workers, threads), env=env,
+                               cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'{mode}: o servidor terminou ao iniciar (código {process.returncode})')
+        try:
+            # Só mede depois do aquecimento do Langflow (a rota /ready responde 503 até lá)
+            if requests.get(base_url + '/ready', timeout=1).status_code == 200:
+                return process, base_url
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f'{mode}: o servidor não respondeu em 30s')
+
+
+def stop_server(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=15)
+    except ProcessLookupError:
+        pass
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+def run_load(base_url, args):
+    results = []
+    started = time.monotonic()
+    deadline = started + args.duration
+    users = []
+    for index in range(args.users):
+        user = VirtualUser(index, base_url, deadline, (args.chat_share, args.view_share),
+                           args.think_time, results, True, args.seed)
+        user.start()
+        users.append(user)
+    for user in users:
+        user.join()
+    return summarize(results, time.monotonic() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor de desenvolvimento x gunicorn')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--users', type=int, default=30)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--think-time', type=float, default=0.2)
+    parser.add_argument('--chat-share', type=float, default=0.3)
+    parser.add_argument('--view-share', type=float, default=0.3)
+    parser.add_argument('--latency-ms', type=float, default=300, help='Mediana da latência do Langflow falso')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Processos do gunicorn')
+    parser.add_argument('--threads', type=int, default=16, help='Threads por processo do gunicorn')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Arquivo JSON para salvar os resultados')
+    args = parser.parse_args()
+
+    fake = FakeLangflow(latency_ms=args.latency_ms, seed=args.seed).start()
+    report = {'cpus': os.cpu_count(), 'users': args.users, 'duration_s': args.duration,
+              'workers': args.workers, 'threads': args.threads, 'modes': {}}
+    try:
+        for mode in args.modes:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                process, base_url = start_server(mode, args.port, fake.url, os.path.join(tmp_dir, 'bench.db'),
+                                                 args.workers, args.threads)
+                try:
+                    print(f"🚀 {mode}: {args.users} usuários por {args.duration:.0f}s...")
+                    report['modes'][mode] = run_load(base_url, args)
+                finally:
+                    stop_server(process)
+    finally:
+        fake.stop()
+
+    print(f"{'modo':10} {'rota':28} {'req/s':>8} {'erros':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for mode, endpoints in report['modes'].items():
+        for endpoint, stats in endpoints.items():
+            print(f"{mode:10} {endpoint:28} {stats['throughput_rps']:>8.1f} {stats['error_rate']:>7.1%} "
+                  f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark do carregamento inicial do histórico na página.
+
+Compara o carregamento completo (/get_current_conversation) com a primeira página
+usada pela lista virtualizada (?limit=100) em conversas de vários tamanhos,
+medindo bytes transferidos, tempo no servidor e quantas mensagens o navegador
+precisa processar no carregamento.
+
+Uso:
+    python benchmark_transcript.py --sizes 1000 5000 10000 --output bench_transcript.json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+
+import app as chatbot
+from app import DatabaseManager
+from synthetic_data import random_answer, random_question
+
+CLIENT_IP = '10.1.1.2'
+
+
+def populate(db_manager, messages, seed=7):
+    rng = random.Random(seed)
+    user_id = db_manager.get_user_id(CLIENT_IP)
+    conversation_id = db_manager.get_current_conversation_id(user_id)
+    for _ in range(messages // 2):
+        db_manager.save_message(conversation_id, 'user', random_question(rng))
+        db_manager.save_message(conversation_id, 'ai', random_answer(rng, 200, 2000), os.urandom(8).hex())
+
+
+def measure(client, url, repeat):
+    headers = {'X-Forwarded-For': CLIENT_IP, 'Accept-Encoding': 'gzip'}
+    started = time.perf_counter()
+    for _ in range(repeat):
+        response = client.get(url, headers=headers)
+    elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+
+    body = response.get_data()
+    if response.headers.get('Content-Encoding') == 'gzip':
+        payload = json.loads(gzip.decompress(body))
+    else:
+        payload = json.loads(body)
+    return {'ms': elapsed_ms, 'wire_bytes': len(body), 'messages': len(payload['messages'])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark do carregamento inicial do histórico')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 10000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Arquivo JSON para salvar os resultados')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            chatbot.db_manager = DatabaseManager(os.path.join(tmp_dir, 'bench.db'))
+            populate(chatbot.db_manager, size)
+            client = chatbot.app.test_client()
+
+            for mode, url in (('completo', '/get_current_conversation'),
+                              ('paginado', '/get_current_conversation?limit=100')):
+                result = measure(client, url, args.repeat)
+                result.update({'size': size, 'mode': mode})
+                results.append(result)
+                print(f"{size:>7} mensagens  {mode:9} {result['wire_bytes']:>10} bytes  "
+                      f"{result['ms']:8.1f} ms  {result['messages']:>6} mensagens entregues")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Cancelamento de chamadas longas quando o cliente desconecta.
+
+Uma execução do agente pode levar minutos. Se o usuário fecha a aba ou o front
+end aborta o fetch, a view continuaria esperando o Langflow e gravaria uma
+resposta que ninguém vai ler, ocupando a thread do worker e a capacidade do
+agente. Aqui a chamada ao Langflow roda numa thread auxiliar enquanto a thread
+da requisição observa o socket do cliente; ao detectar a desconexão, avisa o
+upstream (API de cancelamento, quando existir) e libera o worker na hora, sem
+esperar a chamada terminar.
+
+A desconexão é detectada no socket exposto pelo servidor WSGI
+(werkzeug.socket no servidor de desenvolvimento, gunicorn.socket no
+gunicorn): legível e com leitura vazia significa que o cliente fechou. Atrás de
+um proxy reverso, o proxy precisa fechar a conexão com o app quando o cliente
+desiste (padrão do nginx). Sem socket acessível (test client, TLS terminado no
+próprio gunicorn), a chamada roda direto na thread da requisição, como antes.
+"""
+
+import select
+import socket
+import ssl
+import threading
+
+# Intervalo entre as verificações do socket do cliente
+POLL_INTERVAL = 0.5
+
+
+class ClientDisconnected(Exception):
+    """O cliente fechou a conexão antes de receber a resposta"""
+
+
+def client_socket(environ):
+    """Socket da conexão com o cliente, quando o servidor WSGI o expõe"""
+    sock = environ.get('werkzeug.socket') or environ.get('gunicorn.socket')
+    # MSG_PEEK não funciona em sockets TLS
+    if sock is None or isinstance(sock, ssl.SSLSocket):
+        return None
+    return sock
+
+
+def is_disconnected(sock):
+    """True quando o cliente fechou a conexão (o socket fica legível e a leitura vem vazia).
+
+    Dados legíveis (próxima requisição de um keep-alive) contam como conectado.
+    """
+    try:
+        if sock.fileno() < 0:
+            return True
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b''
+    except (ConnectionError, OSError):
+        return True
+
+
+def run_cancellable(func, sock, on_cancel=None, poll_interval=POLL_INTERVAL):
+    """Executa func() e retorna o resultado, ou levanta ClientDisconnected se o cliente sair antes.
+
+    Na desconexão, on_cancel() é chamado e a função retorna sem esperar func():
+    a thread auxiliar termina sozinha quando o upstream responder (ou for cancelado).
+    """
+    if sock is None:
+        return func()
+
+    outcome = {}
+    done = threading.Event()
+
+    def target():
+        try:
+            outcome['value'] = func()
+        except BaseException as e:
+            outcome['error'] = e
+        finally:
+            done.set()
+
+    threading.Thread(target=target, name='cancellable-call', daemon=True).start()
+    while not done.wait(poll_interval):
+        if is_disconnected(sock):
+            if on_cancel is not None:
+                on_cancel()
+            raise ClientDisconnected()
+
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['value']
@@ -0,0 +1,52 @@
+"""
+Configurações da aplicação por ambiente.
+
+A configuração é escolhida pela variável APP_CONFIG ('development', 'production' ou
+'testing'). As opções de cada funcionalidade (compressão, resumos, embeddings...)
+continuam no topo do app.py; aqui ficam as do servidor e do processo.
+"""
+
+import os
+
+
+class Config:
+    DEBUG = False
+    TESTING = False
+    HOST = os.environ.get('HOST', '0.0.0.0')
+    PORT = int(os.environ.get('PORT', '5000'))
+    # Maior corpo de requisição aceito (as mensagens do chat são texto curto)
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', str(2 * 1024 * 1024)))
+    # Conexões mantidas abertas com o Langflow por processo (uma por thread do worker basta)
+    LANGFLOW_POOL_SIZE = int(os.environ.get('LANGFLOW_POOL_SIZE', os.environ.get('WEB_THREADS', '16')))
+    # Montar na subida o que seria montado no primeiro uso (página inicial, índice de
+    # perguntas). Em produção o processo mestre do gunicorn paga isso uma vez antes do
+    # fork; em desenvolvimento e nos testes a subida fica mais rápida
+    EAGER_INIT = False
+    # Enviar o prompt de aquecimento ao Langflow na subida de cada processo (ver
+    # langflow_health.py); sem ele, o primeiro /chat depois do deploy pega o flow frio
+    LANGFLOW_WARMUP = False
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    EAGER_INIT = True
+    LANGFLOW_WARMUP = True
+
+
+class TestingConfig(Config):
+    TESTING = True
+
+
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig
+}
+
+
+def get_config(name=None):
+    """Classe de configuração pelo nome (padrão: variável APP_CONFIG)"""
+    return CONFIGS[name or os.environ.get('APP_CONFIG', 'development')]
@@ -0,0 +1,21 @@
+"""
+Configuração comum dos testes (pytest).
+
+Importar o app abre o banco de DATABASE_PATH e aplica as migrações do esquema.
+Sem isto, cada execução dos testes alterava o chatbot_memory.db versionado no
+repositório (user_version, tabelas novas, linhas de teste). Este arquivo é
+carregado antes de qualquer módulo de teste, então o app sempre é importado com
+um banco (e um cache) temporários.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+_TEST_DATA_DIR = tempfile.mkdtemp(prefix='chatbot-tests-')
+atexit.register(shutil.rmtree, _TEST_DATA_DIR, ignore_errors=True)
+
+os.environ['DATABASE_PATH'] = os.path.join(_TEST_DATA_DIR, 'chatbot_memory.db')
+os.environ.pop('CACHE_URL', None)
+os.environ.pop('ARCHIVE_DIR', None)
@@ -0,0 +1,211 @@
+"""
+Resumos hierárquicos da conversa única de cada usuário.
+
+Como cada IP tem uma única conversa que cresce para sempre, as mensagens antigas
+saem da janela de contexto (últimas 12 mensagens). A cada N interações que saem
+da janela, um job em background condensa essas mensagens em um resumo de nível 0.
+Quando um nível acumula resumos demais, os mais antigos são condensados em um
+resumo do nível acima. Assim o contexto de longo prazo fica com tamanho fixo.
+"""
+
+import logging
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+logger = logging.getLogger('chatbot.summary')
+
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+|\n+')
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Palavras muito comuns em português que não ajudam a pontuar frases
+STOPWORDS = {
+    'a', 'o', 'as', 'os', 'de', 'do', 'da', 'dos', 'das', 'e', 'é', 'em', 'no', 'na',
+    'nos', 'nas', 'um', 'uma', 'para', 'por', 'com', 'que', 'se', 'ou', 'ao', 'à',
+    'como', 'mais', 'mas', 'não', 'sim', 'seu', 'sua', 'eu', 'você', 'isso', 'este',
+    'esta', 'esse', 'essa', 'ser', 'ter', 'há', 'foi', 'são', 'pode', 'qual', 'quais'
+}
+
+
+class ExtractiveSummarizer:
+    """Resumidor local extrativo: escolhe as frases com maior frequência de termos"""
+
+    def __call__(self, texts, max_chars=600):
+        sentences = []
+        for text in texts:
+            for sentence in SENTENCE_PATTERN.split(text):
+                sentence = sentence.strip(' *#-')
+                if len(sentence) > 15:
+                    sentences.append(sentence)
+
+        if not sentences:
+            return ""
+
+        frequencies = Counter(
+            word for sentence in sentences
+            for word in WORD_PATTERN.findall(sentence.lower())
+            if word not in STOPWORDS
+        )
+
+        def score(sentence):
+            words = [w for w in WORD_PATTERN.findall(sentence.lower()) if w not in STOPWORDS]
+            if not words:
+                return 0
+            return sum(frequencies[w] for w in words) / len(words)
+
+        ranked = sorted(range(len(sentences)), key=lambda i: score(sentences[i]), reverse=True)
+
+        # Selecionar as melhores frases respeitando o limite e manter a ordem original
+        selected = []
+        total = 0
+        for index in ranked:
+            length = len(sentences[index]) + 1
+            if total + length > max_chars:
+                continue
+            selected.append(index)
+            total += length
+
+        return " ".join(sentences[i] for i in sorted(selected))
+
+
+class LangflowSummarizer:
+    """Resumidor que usa um flow do Langflow, com fallback para o extrativo local"""
+
+    def __init__(self, langflow_url, flow_id, timeout=120):
+        self.langflow_url = langflow_url
+        self.flow_id = flow_id
+        self.timeout = timeout
+        self.fallback = ExtractiveSummarizer()
+
+    def __call__(self, texts, max_chars=600):
+        prompt = (
+            f"Resuma a conversa abaixo em português, em no máximo {max_chars} caracteres, "
+            "mantendo fatos, decisões e pendências importantes:\n\n" + "\n".join(texts)
+        )
+        payload = {
+            "input_value": prompt,
+            "output_type": "chat",
+            "input_type": "chat",
+            "tweaks": {}
+        }
+
+        try:
+            response = requests.post(
+                f"{self.langflow_url}/api/v1/run/{self.flow_id}",
+                json=payload,
+                timeout=self.timeout
+            )
+            if response.status_code == 200:
+                outputs = response.json()["outputs"]
+                text = outputs[0]["outputs"][0]["results"]["message"]["data"]["text"]
+                if text:
+                    return text[:max_chars]
+        except (requests.exceptions.RequestException, KeyError, IndexError, TypeError, ValueError):
+            pass
+
+        return self.fallback(texts, max_chars)
+
+
+def format_messages_for_summary(messages):
+    """Formata mensagens (id, tipo, conteúdo) como linhas de texto para o resumidor"""
+    lines = []
+    for _, msg_type, content in messages:
+        role = "Usuário" if msg_type == "user" else "Assistente"
+        lines.append(f"{role}: {content}")
+    return lines
+
+
+def summarize_conversation(db_manager, conversation_id, summarizer, every_turns=10,
+                           keep_recent=12, fanout=4, max_chars=600):
+    """Condensa as mensagens que saíram da janela de contexto. Retorna quantos resumos foram criados"""
+    created = 0
+    batch_size = every_turns * 2
+
+    # Nível 0: blocos de N interações que já saíram da janela recente
+    while True:
+        last_id = db_manager.get_last_summarized_id(conversation_id)
+        pending = db_manager.get_unsummarized_messages(conversation_id, last_id, keep_recent, batch_size)
+        if len(pending) < batch_size:
+            break
+
+        content = summarizer(format_messages_for_summary(pending), max_chars)
+        # None: outro worker resumiu a mesma faixa primeiro (o próximo get_last_summarized_id já a inclui)
+        if db_manager.save_summary(conversation_id, 0, pending[0][0], pending[-1][0], content) is not None:
+            created += 1
+
+    # Níveis superiores: quando um nível acumula resumos demais, condensar os mais antigos
+    level = 0
+    while True:
+        summaries = db_manager.get_active_summaries(conversation_id)
+        if not summaries or level > max(s[1] for s in summaries):
+            break
+        active = [s for s in summaries if s[1] == level]
+        if len(active) > fanout:
+            children = active[:fanout]
+            content = summarizer([s[4] for s in children], max_chars)
+            summary_id = db_manager.save_summary(
+                conversation_id, level + 1, children[0][2], children[-1][3], content,
+                children_ids=[s[0] for s in children]
+            )
+            if summary_id is not None:
+                created += 1
+            continue
+        level += 1
+
+    return created
+
+
+def get_summary_context(db_manager, conversation_id, max_chars=1200):
+    """Texto do resumo de longo prazo da conversa (resumos ativos em ordem cronológica)"""
+    summaries = db_manager.get_active_summaries(conversation_id)
+    if not summaries:
+        return ""
+
+    text = "\n".join(s[4] for s in sorted(summaries, key=lambda s: s[2]) if s[4])
+    if len(text) > max_chars:
+        # Manter a parte mais recente do resumo
+        text = "..." + text[-max_chars:]
+    return text
+
+
+class SummaryScheduler:
+    """Agenda a sumarização em uma thread de background, uma execução por conversa por vez"""
+
+    def __init__(self, db_manager, summarizer, **options):
+        self.db_manager = db_manager
+        self.summarizer = summarizer
+        self.options = options
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='summary')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def maybe_schedule(self, conversation_id):
+        """Agenda a sumarização da conversa se ainda não houver uma na fila"""
+        with self._lock:
+            if conversation_id in self._pending:
+                return None
+            self._pending.add(conversation_id)
+
+        return self._executor.submit(self._run, conversation_id)
+
+    def _run(self, conversation_id):
+        try:
+            return summarize_conversation(self.db_manager, conversation_id, self.summarizer, **self.options)
+        except Exception:
+            logger.exception('summary_failed', extra={'fields': {'conversation_id': conversation_id}})
+            return 0
+        finally:
+            with self._lock:
+                self._pending.discard(conversation_id)
+
+    def restart(self):
+        """Recria a thread de background (usado no processo filho depois do fork)"""
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='summary')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
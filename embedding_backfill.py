@@ -0,0 +1,186 @@
+"""
+Worker em background para gerar embeddings das mensagens já existentes no banco.
+
+Percorre a tabela `messages` em lotes ordenados por id, gera os embeddings de cada
+lote de uma vez, grava no vector store (tabela `message_embeddings`) e salva um
+checkpoint para poder retomar de onde parou. Entre os lotes o worker faz pausas
+para nunca segurar o lock de escrita do SQLite por muito tempo.
+
+Uso como CLI:
+    python embedding_backfill.py --db chatbot_memory.db --batch-size 128 --pause 0.05
+
+Uso como thread (o processo passa o seu DatabaseManager e o seu embedder; este
+módulo não importa o app, que rodando como `python app.py` é o módulo __main__ e
+seria carregado uma segunda vez):
+    worker = EmbeddingBackfillWorker(db_manager, embed_texts, EMBEDDING_MODEL)
+    worker.start()
+
+Uma falha num lote (endpoint de embeddings fora do ar, erro do banco) é registrada
+no log e o lote é tentado de novo depois de uma espera crescente.
+"""
+
+import argparse
+import logging
+import sqlite3
+import threading
+import time
+
+CHECKPOINT_NAME = 'embedding_backfill'
+# Falhas seguidas toleradas no modo CLI (sem --follow) antes de desistir
+MAX_CONSECUTIVE_FAILURES = 5
+
+logger = logging.getLogger('chatbot.backfill')
+
+
+class EmbeddingBackfillWorker:
+    def __init__(self, db_manager, embed_texts, model, batch_size=128, pause=0.05, write_timeout=0.5,
+                 max_write_share=0.1, idle_interval=30.0, max_backoff=300.0, verbose=False):
+        self.db_manager = db_manager
+        # embed_texts(textos) -> vetores; model é o nome gravado junto de cada embedding
+        self.embed_texts = embed_texts
+        self.model = model
+        self.batch_size = batch_size
+        # Pausa mínima entre lotes (segundos)
+        self.pause = pause
+        # Timeout curto nas escritas: se o /chat estiver escrevendo, o worker desiste e tenta depois
+        self.write_timeout = write_timeout
+        # Fração máxima do tempo em que o worker pode estar escrevendo no banco
+        self.max_write_share = max_write_share
+        # Intervalo de espera quando não há mensagens novas (modo contínuo)
+        self.idle_interval = idle_interval
+        # Espera máxima entre tentativas depois de falhas seguidas
+        self.max_backoff = max_backoff
+        self.verbose = verbose
+
+        self.processed = 0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    def _throttle(self, write_time):
+        """Dorme o suficiente para manter a fração de tempo escrevendo abaixo do limite"""
+        delay = max(self.pause, write_time * (1 - self.max_write_share) / self.max_write_share)
+        self._stop_event.wait(delay)
+
+    def run_once(self):
+        """Processa um único lote. Retorna o número de mensagens processadas"""
+        last_id = self.db_manager.get_checkpoint(CHECKPOINT_NAME)
+        batch = self.db_manager.get_messages_after(last_id, self.batch_size)
+
+        if not batch:
+            return 0
+
+        # Embeddings calculados fora de qualquer transação
+        vectors = self.embed_texts([content for _, content in batch])
+        embeddings = [(message_id, vector) for (message_id, _), vector in zip(batch, vectors)]
+        new_last_id = batch[-1][0]
+
+        backoff = self.pause
+        while True:
+            started = time.perf_counter()
+            try:
+                self.db_manager.save_embeddings(
+                    embeddings,
+                    self.model,
+                    checkpoint=CHECKPOINT_NAME,
+                    last_id=new_last_id,
+                    timeout=self.write_timeout
+                )
+                break
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) or self._stop_event.is_set():
+                    raise
+                # Banco ocupado pelo tráfego ao vivo - recuar e tentar novamente
+                self._log(f"⏳ Banco ocupado, aguardando {backoff:.2f}s")
+                self._stop_event.wait(backoff)
+                backoff = min(backoff * 2, 5.0)
+
+        write_time = time.perf_counter() - started
+        self.processed += len(batch)
+        self._log(f"🧮 Lote gravado: ids {batch[0][0]}-{new_last_id} ({len(batch)} mensagens, {write_time * 1000:.1f}ms)")
+
+        self._throttle(write_time)
+        return len(batch)
+
+    def run(self, follow=False):
+        """Processa lotes até acabar as mensagens (ou continuamente se follow=True)"""
+        failures = 0
+        while not self._stop_event.is_set():
+            try:
+                count = self.run_once()
+            except Exception:
+                if self._stop_event.is_set():
+                    break
+                failures += 1
+                # O lote não foi gravado nem o checkpoint avançou: tentar de novo depois de esperar
+                backoff = min(2.0 ** failures, self.max_backoff)
+                logger.exception('embedding_backfill_failed',
+                                 extra={'fields': {'failures': failures, 'retry_in_s': round(backoff, 2)}})
+                if not follow and failures >= MAX_CONSECUTIVE_FAILURES:
+                    raise
+                self._stop_event.wait(backoff)
+                continue
+            failures = 0
+            if count == 0:
+                if not follow:
+                    break
+                self._stop_event.wait(self.idle_interval)
+
+        self._log(f"✅ Backfill finalizado: {self.processed} mensagens processadas")
+        return self.processed
+
+    def start(self, follow=True):
+        """Inicia o worker em uma thread daemon"""
+        if self._thread and self._thread.is_alive():
+            return self._thread
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self.run,
+            kwargs={'follow': follow},
+            name='embedding-backfill',
+            daemon=True
+        )
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        """Sinaliza a parada e aguarda a thread terminar o lote atual"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+def main():
+    from app import DATABASE, EMBEDDING_MODEL, DatabaseManager, embed_texts
+
+    parser = argparse.ArgumentParser(description='Gera embeddings das mensagens existentes em background')
+    parser.add_argument('--db', default=DATABASE, help='Caminho do banco SQLite')
+    parser.add_argument('--batch-size', type=int, default=128, help='Mensagens por lote')
+    parser.add_argument('--pause', type=float, default=0.05, help='Pausa mínima entre lotes (segundos)')
+    parser.add_argument('--max-write-share', type=float, default=0.1,
+                        help='Fração máxima do tempo segurando o lock de escrita')
+    parser.add_argument('--follow', action='store_true', help='Continua aguardando novas mensagens')
+    args = parser.parse_args()
+
+    worker = EmbeddingBackfillWorker(
+        DatabaseManager(args.db),
+        embed_texts,
+        EMBEDDING_MODEL,
+        batch_size=args.batch_size,
+        pause=args.pause,
+        max_write_share=args.max_write_share,
+        verbose=True
+    )
+
+    try:
+        worker.run(follow=args.follow)
+    except KeyboardInterrupt:
+        print(f"\n⏹️ Interrompido - checkpoint salvo ({worker.processed} mensagens processadas)")
+
+
+if __name__ == '__main__':
+    main()
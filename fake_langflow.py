@@ -0,0 +1,183 @@
+"""
+Servidor Langflow falso para testes de carga e testes de integração.
+
+Responde em /api/v1/run/<flow_id> com a mesma estrutura do Langflow
+(outputs[0].outputs[0].results.message.data.text), com latência log-normal,
+tamanho de resposta e taxa de erro configuráveis. Também atende /health e
+simula uma API de cancelamento: POST /api/v1/runs/<run_id>/cancel interrompe a
+execução enviada com o cabeçalho X-Run-Id (LANGFLOW_CANCEL_PATH no app).
+GET /api/v1/flows/<flow_id> responde como o Langflow (usado no aquecimento).
+
+Uso isolado:
+    python fake_langflow.py --port 7860 --latency-ms 800 --error-rate 0.02
+"""
+
+import argparse
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from synthetic_data import random_answer
+
+
+def langflow_payload(text):
+    """Corpo de resposta no formato do endpoint /api/v1/run do Langflow"""
+    return {
+        "session_id": "fake-session",
+        "outputs": [{
+            "inputs": {"input_value": ""},
+            "outputs": [{
+                "results": {"message": {"text": text, "data": {"text": text, "sender": "Machine"}}},
+                "artifacts": {},
+                "messages": [{"message": text, "type": "text"}]
+            }]
+        }]
+    }
+
+
+class FakeLangflow:
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=500, latency_sigma=0.5,
+                 min_chars=200, max_chars=4000, error_rate=0.0, pool_size=500, seed=None,
+                 flow_ids=None):
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.cancelled = 0
+        # Flows existentes em /api/v1/flows/<id> (None: qualquer id existe)
+        self.flow_ids = flow_ids
+        self.in_flight = 0
+        # run_id -> Event das execuções em andamento (acordadas pelo cancelamento)
+        self._runs = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        # Respostas pré-geradas: gerar markdown a cada requisição pesaria no próprio servidor falso
+        self._answers = [random_answer(self._rng, min_chars, max_chars) for _ in range(pool_size)]
+
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _next_reply(self):
+        """Sorteia (atraso em segundos, falhou, texto) para uma requisição"""
+        with self._lock:
+            self.requests += 1
+            delay = self._rng.lognormvariate(0, self.latency_sigma) * self.latency_ms / 1000 if self.latency_ms else 0
+            failed = self._rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return delay, failed, self._rng.choice(self._answers)
+
+    def cancel(self, run_id):
+        """Interrompe a execução em andamento. Retorna False se ela não existir"""
+        with self._lock:
+            event = self._runs.get(run_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parts = self.path.strip('/').split('/')
+                if self.path.rstrip('/') == '/health':
+                    self._send_json(200, {"status": "ok"})
+                elif parts[:3] == ['api', 'v1', 'flows'] and len(parts) == 4:
+                    if fake.flow_ids is None or parts[3] in fake.flow_ids:
+                        self._send_json(200, {"id": parts[3], "name": "Fake flow"})
+                    else:
+                        self._send_json(404, {"detail": "Flow not found"})
+                else:
+                    self._send_json(404, {"detail": "Not Found"})
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                parts = self.path.strip('/').split('/')
+                if parts[:3] == ['api', 'v1', 'runs'] and parts[-1] == 'cancel' and len(parts) == 5:
+                    if fake.cancel(parts[3]):
+                        self._send_json(202, {"status": "cancelled"})
+                    else:
+                        self._send_json(404, {"detail": "Run not found"})
+                    return
+                if not self.path.startswith('/api/v1/run/'):
+                    self._send_json(404, {"detail": "Not Found"})
+                    return
+
+                delay, failed, text = fake._next_reply()
+                run_id = self.headers.get('X-Run-Id') or object()
+                cancelled = threading.Event()
+                with fake._lock:
+                    fake._runs[run_id] = cancelled
+                    fake.in_flight += 1
+                try:
+                    cancelled.wait(delay)
+                finally:
+                    with fake._lock:
+                        del fake._runs[run_id]
+                        fake.in_flight -= 1
+                if cancelled.is_set():
+                    with fake._lock:
+                        fake.cancelled += 1
+                    self._send_json(499, {"detail": "Run cancelled"})
+                elif failed:
+                    self._send_json(500, {"detail": "Erro simulado do Langflow"})
+                else:
+                    self._send_json(200, langflow_payload(text))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-langflow', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor Langflow falso')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=7860)
+    parser.add_argument('--latency-ms', type=float, default=500, help='Mediana da latência')
+    parser.add_argument('--latency-sigma', type=float, default=0.5, help='Dispersão log-normal da latência')
+    parser.add_argument('--min-chars', type=int, default=200)
+    parser.add_argument('--max-chars', type=int, default=4000)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeLangflow(args.host, args.port, args.latency_ms, args.latency_sigma,
+                        args.min_chars, args.max_chars, args.error_rate)
+    print(f"🤖 Langflow falso em {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        fake.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
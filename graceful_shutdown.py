@@ -0,0 +1,142 @@
+"""
+Desligamento gracioso: drenagem das chamadas longas em andamento.
+
+Num deploy ou reinício, um /chat pode estar no meio de uma execução do agente
+que leva minutos. Ao receber SIGTERM, o processo para de aceitar novas
+conversas (503 com Retry-After), espera as chamadas em andamento terminarem e
+gravarem a resposta até um prazo, executa as rotinas de encerramento
+registradas (esvaziar filas de gravação em background, checkpoint do SQLite) e
+só então sai. Um segundo SIGTERM durante a drenagem encerra na hora.
+
+Uma chamada só conta como terminada quando a resposta foi inteiramente enviada
+ao cliente (call_on_close), não quando a view retorna.
+
+No gunicorn, o próprio worker para de aceitar conexões e espera as requisições
+em andamento (graceful_timeout); o hook worker_exit chama shutdown() para as
+rotinas de encerramento.
+"""
+
+import logging
+import signal
+import sys
+import threading
+import time
+
+from flask import g, jsonify, request
+
+logger = logging.getLogger('chatbot.shutdown')
+
+
+class GracefulShutdown:
+    def __init__(self, app=None, drain_timeout=120, endpoints=(), retry_after=10):
+        self.drain_timeout = drain_timeout
+        # Endpoints que iniciam trabalho longo: contados e recusados durante a drenagem
+        self.endpoints = set(endpoints)
+        self.retry_after = retry_after
+        self.draining = threading.Event()
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._cleanups = []
+        self._finished = False
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self.start_request)
+        app.after_request(self.track_response)
+        app.teardown_request(self.finish_unsent)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def register(self, cleanup, first=False):
+        """Registra uma rotina de encerramento (executadas na ordem de registro, ou antes
+        de todas com first=True). Usável como decorator"""
+        if first:
+            self._cleanups.insert(0, cleanup)
+        else:
+            self._cleanups.append(cleanup)
+        return cleanup
+
+    def start_request(self):
+        if request.endpoint not in self.endpoints:
+            return None
+
+        if self.draining.is_set():
+            response = jsonify({'error': 'O servidor está reiniciando. Tente novamente em alguns segundos.'})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(self.retry_after)
+            return response
+
+        with self._condition:
+            self._in_flight += 1
+        g.shutdown_tracked = True
+        return None
+
+    def _finish(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def track_response(self, response):
+        if g.pop('shutdown_tracked', False):
+            # Conta como terminada só depois que o servidor enviar o corpo inteiro
+            response.call_on_close(self._finish)
+        return response
+
+    def finish_unsent(self, exc):
+        # Exceção que escapou da view: after_request não rodou e não haverá call_on_close
+        if g.pop('shutdown_tracked', False):
+            self._finish()
+
+    def drain(self, timeout=None):
+        """Recusa novas chamadas e espera as em andamento. Retorna quantas ficaram sem terminar"""
+        self.draining.set()
+        deadline = time.monotonic() + (self.drain_timeout if timeout is None else timeout)
+        with self._condition:
+            while self._in_flight > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self._in_flight
+
+    def shutdown(self, timeout=None):
+        """Drena e executa as rotinas de encerramento (uma única vez)"""
+        if self._finished:
+            return 0
+        self._finished = True
+
+        started = time.perf_counter()
+        in_flight = self._in_flight
+        abandoned = self.drain(timeout)
+        for cleanup in self._cleanups:
+            try:
+                cleanup()
+            except Exception:
+                logger.exception('shutdown_cleanup_failed', extra={'fields': {'cleanup': getattr(cleanup, '__name__', repr(cleanup))}})
+
+        logger.info('shutdown', extra={'fields': {
+            'in_flight': in_flight,
+            'abandoned': abandoned,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1)
+        }})
+        return abandoned
+
+    def install_signal_handlers(self, signals=(signal.SIGTERM,)):
+        """Instala o handler de desligamento (servidor de desenvolvimento; precisa rodar na thread principal).
+
+        O handler bloqueia a thread principal, que é a que aceita conexões: as
+        requisições em andamento continuam nas threads delas até terminarem.
+        """
+        def handle(signum, frame):
+            if self._finished:
+                # Segundo sinal: sair sem esperar
+                sys.exit(1)
+            self.shutdown()
+            sys.exit(0)
+
+        for signum in signals:
+            signal.signal(signum, handle)
@@ -0,0 +1,52 @@
+"""
+Configuração do gunicorn: vários processos, cada um com um pool de threads.
+
+As chamadas ao Langflow passam a maior parte do tempo esperando a rede, então
+threads por worker dão a concorrência; os processos aproveitam os núcleos para a
+renderização de markdown e a compressão. A aplicação é carregada antes do fork
+(preload_app) e cada worker recria no post_fork o que não sobrevive ao fork:
+sessão HTTP do Langflow, thread de resumos e thread de logs, e inicia o
+aquecimento do Langflow (ver langflow_health.py). No SIGTERM, cada
+worker termina as requisições em andamento antes de sair.
+
+Com mais de um worker, o limite por usuário e as métricas passam a usar arquivos
+SQLite ao lado do banco (RATE_LIMIT_URL e METRICS_URL, se não foram definidas): na
+memória, cada processo teria os próprios baldes (o limite efetivo seria N vezes o
+configurado) e o /metrics mostraria só o worker que atendeu a coleta.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', '16'))
+
+# Lido antes do carregamento da aplicação (preload_app), então vale para o app.py
+if workers > 1:
+    shared_base = os.path.splitext(os.environ.get('DATABASE_PATH', 'chatbot_memory.db'))[0]
+    os.environ.setdefault('RATE_LIMIT_URL', f"sqlite:///{shared_base}_ratelimit.db")
+    os.environ.setdefault('METRICS_URL', f"sqlite:///{shared_base}_metrics.db")
+
+# O Langflow pode levar até 20 minutos (timeout da chamada no /chat)
+timeout = 1260
+# Prazo para os /chat em andamento terminarem num deploy (ver graceful_shutdown.py)
+graceful_timeout = int(os.environ.get('SHUTDOWN_DRAIN_SECONDS', '120'))
+keepalive = 5
+preload_app = True
+
+
+def post_fork(server, worker):
+    from app import init_worker, start_langflow_monitor
+    init_worker()
+    start_langflow_monitor()
+
+
+def worker_exit(server, worker):
+    # O worker já esperou as requisições em andamento (graceful_timeout); falta
+    # esvaziar as gravações em background e fazer o checkpoint do SQLite
+    from app import graceful_shutdown
+    graceful_shutdown.shutdown(timeout=0)
@@ -0,0 +1,191 @@
+"""
+Aquecimento e monitoramento do Langflow.
+
+Logo depois de um deploy, as primeiras conversas pegam o flow frio (modelo sendo
+carregado, grafo do flow sendo compilado) e levam muito mais que o normal. Cada
+processo faz uma fase de aquecimento numa thread em background, sem atrasar a
+subida do servidor:
+
+1. sonda leve em /health (o Langflow está no ar?);
+2. valida o flow_id configurado em /api/v1/flows/<flow_id> (404: id errado;
+   401/403: a API exige chave e a validação é pulada);
+3. abre conexões em paralelo, que ficam no pool da sessão HTTP do processo;
+4. envia o prompt de aquecimento pelo mesmo endpoint do /chat (opcional).
+
+Depois disso, a sonda em /health roda periodicamente. O estado alimenta o
+indicador de status da página e a rota /ready, que só responde 200 quando o
+Langflow está aquecido (o balanceador não manda tráfego antes). Se o Langflow
+cair e voltar, ele pode ter reiniciado frio: o aquecimento é refeito.
+
+Estados: starting, warming, ready, offline, invalid_flow.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+logger = logging.getLogger('chatbot.langflow')
+
+
+class LangflowMonitor:
+    def __init__(self, base_url, flow_id, warmup_prompt='', warm_connections=4,
+                 probe_interval=30.0, probe_timeout=5.0, warmup_timeout=600, gauge=None):
+        self.base_url = base_url.rstrip('/')
+        self.flow_id = flow_id
+        # Vazio: sem prompt de aquecimento (só validação e conexões)
+        self.warmup_prompt = warmup_prompt
+        self.warm_connections = warm_connections
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.warmup_timeout = warmup_timeout
+        # Gauge opcional do registro de métricas: 1 com o Langflow no ar, 0 fora
+        self.gauge = gauge
+
+        self.state = 'starting'
+        self.flow_valid = None
+        self.warm = False
+        self.latency_ms = None
+        self.checked_at = None
+        self._session = None
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return self.state == 'ready'
+
+    def status(self):
+        """Estado atual para a rota /ready e para o indicador da página"""
+        return {
+            'state': self.state,
+            'flow_valid': self.flow_valid,
+            'warm': self.warm,
+            'latency_ms': self.latency_ms,
+            'checked_at': self.checked_at
+        }
+
+    @property
+    def running(self):
+        # Depois do fork, a thread herdada do processo pai não existe mais no filho
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, session):
+        """Inicia a thread de aquecimento e sondas, se ainda não estiver rodando neste processo"""
+        with self._lock:
+            if self.running:
+                return
+            self._session = session
+            self._stop_event = threading.Event()
+            self.state, self.warm = 'starting', False
+            self._thread = threading.Thread(target=self._run, name='langflow-monitor', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _set_state(self, state, **fields):
+        if state != self.state:
+            level = logging.WARNING if state in ('offline', 'invalid_flow') else logging.INFO
+            logger.log(level, 'langflow_state', extra={'fields': dict(fields, state=state, previous=self.state)})
+        self.state = state
+
+    def _run(self):
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            if self.warm:
+                self.probe()
+                delay = self.probe_interval
+            elif self.warm_up():
+                backoff = 1.0
+                delay = self.probe_interval
+            else:
+                # Langflow fora do ar ou flow inválido: tentar de novo com espera crescente
+                delay, backoff = backoff, min(backoff * 2, self.probe_interval)
+            self._stop_event.wait(delay)
+
+    def probe(self):
+        """Sonda leve em /health. Retorna se o Langflow respondeu"""
+        started = time.perf_counter()
+        try:
+            ok = self._session.get(f'{self.base_url}/health', timeout=self.probe_timeout).ok
+        except requests.exceptions.RequestException:
+            ok = False
+        self.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.checked_at = time.time()
+        if self.gauge is not None:
+            self.gauge.set(1 if ok else 0)
+
+        if not ok:
+            # Pode voltar reiniciado (frio): aquecer de novo
+            self.warm = False
+            self._set_state('offline')
+        elif self.warm:
+            self._set_state('ready')
+        return ok
+
+    def validate_flow(self):
+        """True/False se o flow_id existe; None quando não dá para saber (API exige chave)"""
+        response = self._session.get(f'{self.base_url}/api/v1/flows/{self.flow_id}', timeout=self.probe_timeout)
+        if response.status_code == 404:
+            return False
+        return True if response.ok else None
+
+    def open_connections(self):
+        """Abre até warm_connections conexões em paralelo. Retorna quantas requisições deram certo"""
+        def touch(_):
+            try:
+                return self._session.get(f'{self.base_url}/health', timeout=self.probe_timeout).ok
+            except requests.exceptions.RequestException:
+                return False
+
+        if self.warm_connections <= 0:
+            return 0
+        with ThreadPoolExecutor(max_workers=self.warm_connections) as executor:
+            return sum(executor.map(touch, range(self.warm_connections)))
+
+    def send_warmup_prompt(self):
+        """Executa o flow uma vez (carrega o modelo e compila o grafo)"""
+        payload = {
+            "input_value": self.warmup_prompt,
+            "output_type": "chat",
+            "input_type": "chat",
+            "tweaks": {}
+        }
+        response = self._session.post(
+            f'{self.base_url}/api/v1/run/{self.flow_id}',
+            json=payload,
+            headers={"Content-Type": "application/json"},
+            timeout=self.warmup_timeout
+        )
+        return response.status_code == 200
+
+    def warm_up(self):
+        """Fase de aquecimento. Retorna True quando o Langflow ficou pronto"""
+        if not self.probe():
+            return False
+
+        started = time.perf_counter()
+        self._set_state('warming')
+        try:
+            self.flow_valid = self.validate_flow()
+            if self.flow_valid is False:
+                self._set_state('invalid_flow', flow_id=self.flow_id)
+                return False
+            connections = self.open_connections()
+            if self.warmup_prompt and not self.send_warmup_prompt():
+                self._set_state('offline', reason='warmup_prompt_failed')
+                return False
+        except requests.exceptions.RequestException as e:
+            self._set_state('offline', reason=str(e))
+            return False
+
+        self.warm = True
+        self._set_state('ready', connections=connections,
+                        duration_ms=round((time.perf_counter() - started) * 1000, 1))
+        return True
@@ -0,0 +1,206 @@
+"""
+Teste de carga ponta a ponta.
+
+Sobe a aplicação Flask (em um banco temporário) junto com um Langflow falso e
+simula muitos usuários simultâneos, cada um com seu IP via X-Forwarded-For,
+alternando entre /chat, /get_current_conversation e /view_html. Ao final mostra
+vazão, latências p50/p95/p99 e taxa de erro por rota.
+
+Uso:
+    python load_test.py --users 50 --duration 30 --latency-ms 800 --error-rate 0.02
+    python load_test.py --target http://localhost:5000 --users 100 --duration 60 --output load.json
+
+Com --target, o teste vai contra um servidor já em execução (o Langflow usado é o
+configurado nele; `python fake_langflow.py` pode fazer esse papel).
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+import requests
+
+from fake_langflow import FakeLangflow
+from synthetic_data import random_user_message
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+def start_embedded_app(langflow_url, db_path):
+    """Sobe a aplicação em uma thread, apontando para o Langflow falso. Retorna (url, servidor)"""
+    # Um registro por requisição atrapalharia a leitura do relatório
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    # Os usuários virtuais conversam bem mais rápido que o limite por usuário permite
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    from werkzeug.serving import make_server
+    import app as chatbot
+
+    db_manager = chatbot.DatabaseManager(db_path)
+    chatbot.db_manager = db_manager
+    if chatbot.summary_scheduler:
+        chatbot.summary_scheduler.db_manager = db_manager
+    if chatbot.near_duplicate_index:
+        chatbot.near_duplicate_index.db_manager = db_manager
+    chatbot.LANGFLOW_URL = langflow_url
+
+    server = make_server('127.0.0.1', 0, chatbot.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='load-test-app', daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server
+
+
+class VirtualUser(threading.Thread):
+    """Usuário simulado: um IP, uma sessão HTTP e uma sequência aleatória de ações"""
+
+    def __init__(self, index, base_url, deadline, mix, think_time, results, fresh, seed):
+        super().__init__(name=f'virtual-user-{index}', daemon=True)
+        self.base_url = base_url
+        self.deadline = deadline
+        self.mix = mix
+        self.think_time = think_time
+        self.results = results
+        self.fresh = fresh
+        self.rng = random.Random(seed + index)
+        self.headers = {'X-Forwarded-For': f"172.{16 + (index >> 16) % 16}.{(index >> 8) & 255}.{index & 255}"}
+        self.last_response_id = None
+
+    def _request(self, endpoint, method, url, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + url, headers=self.headers, timeout=1200, **kwargs)
+            ok = 200 <= response.status_code < 300
+            if ok and endpoint == '/chat':
+                data = response.json()
+                # O /chat devolve 200 com o texto do erro quando o Langflow falha
+                ok = 'response_id' in data and not data['response'].startswith('Erro')
+                if ok:
+                    self.last_response_id = data['response_id']
+            else:
+                response.content
+        except requests.exceptions.RequestException:
+            ok = False
+        self.results.append((endpoint, time.perf_counter() - started, ok))
+
+    def run(self):
+        chat_share, view_share = self.mix
+        with requests.Session() as self.session:
+            while time.monotonic() < self.deadline:
+                choice = self.rng.random()
+                if choice < chat_share or self.last_response_id is None and choice < chat_share + view_share:
+                    payload = {'message': random_user_message(self.rng)}
+                    if self.fresh:
+                        payload['fresh'] = True
+                    self._request('/chat', 'POST', '/chat', json=payload)
+                elif choice < chat_share + view_share:
+                    self._request('/view_html', 'GET', f'/view_html/{self.last_response_id}')
+                else:
+                    self._request('/get_current_conversation', 'GET', '/get_current_conversation?limit=100')
+
+                if self.think_time:
+                    time.sleep(self.rng.expovariate(1 / self.think_time))
+
+
+def summarize(results, elapsed):
+    report = {}
+    for endpoint in sorted({r[0] for r in results}) + ['total']:
+        rows = [r for r in results if endpoint == 'total' or r[0] == endpoint]
+        latencies = [r[1] * 1000 for r in rows]
+        errors = sum(1 for r in rows if not r[2])
+        report[endpoint] = {
+            'requests': len(rows),
+            'errors': errors,
+            'error_rate': round(errors / len(rows), 4) if rows else 0,
+            'throughput_rps': round(len(rows) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.5), 2) if rows else None,
+            'p95_ms': round(percentile(latencies, 0.95), 2) if rows else None,
+            'p99_ms': round(percentile(latencies, 0.99), 2) if rows else None
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga com Langflow falso')
+    parser.add_argument('--target', help='URL de um servidor já em execução (senão sobe um embutido)')
+    parser.add_argument('--users', type=int, default=20, help='Usuários simultâneos (um IP cada)')
+    parser.add_argument('--duration', type=float, default=20, help='Duração em segundos')
+    parser.add_argument('--ramp-up', type=float, default=2, help='Segundos para iniciar todos os usuários')
+    parser.add_argument('--think-time', type=float, default=0.5, help='Pausa média entre ações de um usuário')
+    parser.add_argument('--chat-share', type=float, default=0.3, help='Fração das ações que são /chat')
+    parser.add_argument('--view-share', type=float, default=0.1, help='Fração das ações que são /view_html')
+    parser.add_argument('--fresh', action='store_true', help='Pedir sempre resposta nova (sem reaproveitar perguntas semelhantes)')
+    parser.add_argument('--latency-ms', type=float, default=500, help='Mediana da latência do Langflow falso')
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--min-chars', type=int, default=200, help='Tamanho mínimo das respostas falsas')
+    parser.add_argument('--max-chars', type=int, default=4000, help='Tamanho máximo das respostas falsas')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração de respostas 500 do Langflow falso')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='Arquivo JSON para salvar o relatório')
+    args = parser.parse_args()
+
+    fake = server = None
+    tmp_dir = tempfile.TemporaryDirectory()
+    base_url = args.target
+    if not base_url:
+        fake = FakeLangflow(latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+                            min_chars=args.min_chars, max_chars=args.max_chars,
+                            error_rate=args.error_rate, seed=args.seed).start()
+        base_url, server = start_embedded_app(fake.url, os.path.join(tmp_dir.name, 'load.db'))
+        print(f"🤖 Langflow falso em {fake.url}, aplicação em {base_url}")
+
+    results = []
+    started = time.monotonic()
+    deadline = started + args.duration
+    users = []
+    print(f"🚀 {args.users} usuários por {args.duration:.0f}s...")
+    try:
+        for index in range(args.users):
+            user = VirtualUser(index, base_url, deadline, (args.chat_share, args.view_share),
+                               args.think_time, results, args.fresh, args.seed)
+            user.start()
+            users.append(user)
+            time.sleep(args.ramp_up / args.users)
+        for user in users:
+            user.join()
+    finally:
+        elapsed = time.monotonic() - started
+        if server:
+            server.shutdown()
+        if fake:
+            fake.stop()
+        tmp_dir.cleanup()
+
+    report = {
+        'users': args.users,
+        'duration_s': round(elapsed, 2),
+        'langflow': {
+            'latency_ms': args.latency_ms,
+            'error_rate': args.error_rate,
+            'calls': fake.requests,
+            'errors': fake.errors
+        } if fake else None,
+        'endpoints': summarize(results, elapsed)
+    }
+
+    print(f"{'rota':28} {'req':>7} {'req/s':>8} {'erros':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for endpoint, stats in report['endpoints'].items():
+        print(f"{endpoint:28} {stats['requests']:>7} {stats['throughput_rps']:>8.1f} "
+              f"{stats['error_rate']:>7.1%} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+
+    if fake:
+        print(f"🤖 Langflow falso: {fake.requests} chamadas, {fake.errors} erros simulados")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
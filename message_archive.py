@@ -0,0 +1,128 @@
+"""
+Arquivo frio do histórico: mensagens antigas em arquivos de segmento comprimidos.
+
+Cada usuário tem uma única conversa contínua que nunca é apagada, então a
+tabela `messages` cresce sem limite, e com ela o arquivo do banco, o cache de
+páginas e todos os índices. O job de arquivamento (archive_worker.py) tira as
+mensagens antigas da tabela quente e as grava aqui, em blocos:
+
+- um bloco é uma faixa contígua de ids de uma conversa (prefixo da conversa:
+  tudo o que foi arquivado é mais antigo que qualquer mensagem ainda quente),
+  serializado em JSON e comprimido com zlib (ou zstd, se o pacote zstandard
+  estiver instalado e ARCHIVE_CODEC=zstd);
+- os blocos são anexados a arquivos de segmento (só append, fsync a cada
+  bloco); cada processo que arquiva escreve no seu próprio segmento, então não
+  há lock entre processos. Bytes sem entrada no índice (queda entre a escrita
+  e o commit) são só espaço perdido;
+- o índice (conversa, faixa de ids, segmento, posição, codec) fica na tabela
+  `archive_blocks` do banco quente, que é pequena. Cada bloco leva um
+  cabeçalho com o codec, a conversa e a faixa de ids, o que permite reconstruir o
+  índice a partir dos segmentos.
+
+As leituras do histórico (DatabaseManager) consultam o índice e descomprimem só
+os blocos necessários; os blocos lidos ficam num LRU pequeno na memória.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+
+from shared_cache import LocalLRU
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b'CMA1'
+CODECS = ('zlib', 'zstd')
+# Cabeçalho de cada bloco: magic, codec, conversation_id, primeiro id, último id, tamanho do conteúdo
+HEADER = struct.Struct('>4sBQQQI')
+
+
+def encode_rows(rows, codec='zlib'):
+    """Linhas (id, tipo, conteúdo, timestamp, response_id) -> bytes comprimidos"""
+    raw = json.dumps([list(row) for row in rows], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=9).compress(raw)
+    return zlib.compress(raw, 9)
+
+
+def decode_rows(data, codec='zlib'):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('Bloco do arquivo comprimido com zstd, mas o pacote zstandard não está instalado')
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raw = zlib.decompress(data)
+    return [tuple(row) for row in json.loads(raw)]
+
+
+class SegmentStore:
+    """Arquivos de segmento de um diretório (criado só na primeira gravação)"""
+
+    def __init__(self, directory, codec='zlib', max_segment_bytes=64 * 1024 * 1024, cache_blocks=32):
+        if codec == 'zstd' and zstandard is None:
+            raise RuntimeError('ARCHIVE_CODEC=zstd, mas o pacote zstandard não está instalado')
+        self.directory = directory
+        self.codec = codec
+        self.max_segment_bytes = max_segment_bytes
+        self._blocks = LocalLRU(cache_blocks)
+        self._segment = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _writable_segment(self):
+        # Um segmento por processo escritor; um novo ao passar do tamanho máximo
+        path = os.path.join(self.directory, self._segment) if self._segment else None
+        if (self._pid != os.getpid() or path is None
+                or os.path.getsize(path) >= self.max_segment_bytes):
+            os.makedirs(self.directory, exist_ok=True)
+            self._segment = f'{time.time_ns()}-{os.getpid()}.seg'
+            self._pid = os.getpid()
+        return self._segment
+
+    def append(self, conversation_id, rows):
+        """Anexa um bloco (linhas em ordem de id) e garante que está no disco.
+        Retorna (segmento, posição, tamanho, codec) para o índice"""
+        payload = encode_rows(rows, self.codec)
+        header = HEADER.pack(MAGIC, CODECS.index(self.codec), conversation_id, rows[0][0], rows[-1][0], len(payload))
+        with self._lock:
+            segment = self._writable_segment()
+            with open(os.path.join(self.directory, segment), 'ab') as f:
+                offset = f.tell() + HEADER.size
+                f.write(header + payload)
+                f.flush()
+                os.fsync(f.fileno())
+        return segment, offset, len(payload), self.codec
+
+    def read(self, segment, offset, length, codec):
+        """Linhas de um bloco (do LRU, se já lido)"""
+        key = (segment, offset)
+        found, rows = self._blocks.get(key)
+        if found:
+            return rows
+        with open(os.path.join(self.directory, segment), 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        rows = decode_rows(data, codec)
+        self._blocks.set(key, rows)
+        return rows
+
+    def iter_blocks(self, segment):
+        """Percorre os blocos de um segmento: (conversation_id, primeiro id, último id, posição, tamanho, codec).
+        Usado para reconstruir ou conferir o índice"""
+        with open(os.path.join(self.directory, segment), 'rb') as f:
+            while True:
+                header = f.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return
+                magic, codec, conversation_id, first_id, last_id, length = HEADER.unpack(header)
+                if magic != MAGIC:
+                    raise ValueError(f'Segmento corrompido: {segment} na posição {f.tell() - HEADER.size}')
+                offset = f.tell()
+                f.seek(length, os.SEEK_CUR)
+                yield conversation_id, first_id, last_id, offset, length, CODECS[codec]
@@ -0,0 +1,194 @@
+"""
+Compressão transparente do conteúdo das mensagens no SQLite.
+
+As respostas da IA costumam ter vários KB de markdown repetitivo, guardados como
+TEXT em `messages.content`: isso infla o arquivo do banco, o cache de páginas e o
+I/O de toda leitura do histórico. Mensagens a partir de MESSAGE_COMPRESS_MIN_BYTES
+são gravadas comprimidas (BLOB) e a coluna `content_codec` diz como ler cada linha:
+
+- NULL: texto puro (mensagens curtas e todas as linhas anteriores a esta versão);
+- 'zlib': zlib (padrão, sem dependências);
+- 'zstd': zstd sem dicionário;
+- 'zstd:<id>': zstd com o dicionário treinado <id> da tabela content_dictionaries.
+  Um dicionário treinado com as próprias respostas do serviço comprime bem até
+  mensagens de 1-2 KB, onde o zlib quase não ganha nada.
+
+As consultas do DatabaseManager leem o conteúdo pela função SQL
+message_content(content, content_codec), registrada em cada conexão: nas leituras
+do histórico, só as linhas que saem da consulta (depois do WHERE e do LIMIT) são
+descomprimidas. A busca por texto (LIKE) é a exceção: ela precisa olhar o texto
+original de cada mensagem do usuário, então as comprimidas são descomprimidas
+para a comparação (as em texto puro são comparadas direto, sem a função).
+
+Treinar um dicionário e comprimir as mensagens antigas (em lotes, pode rodar com
+o serviço no ar):
+    python message_codec.py train-dictionary --db chatbot_memory.db
+    python message_codec.py compress-existing --db chatbot_memory.db --vacuum
+"""
+
+import argparse
+import sqlite3
+import threading
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Só vale gravar comprimido se economizar pelo menos 10%
+MIN_SAVING = 0.9
+
+
+class ContentCodec:
+    """Codifica o conteúdo de uma mensagem para gravação e decodifica qualquer linha gravada.
+
+    dictionary_loader(dict_id) devolve (id, bytes) de um dicionário zstd (dict_id=None: o mais
+    recente) ou None; é chamado só na primeira vez que cada dicionário é necessário.
+    """
+
+    def __init__(self, codec='zlib', min_bytes=1024, level=6, dictionary_loader=None):
+        if codec not in ('off', 'zlib', 'zstd'):
+            raise ValueError(f'MESSAGE_CODEC inválido: {codec}')
+        if codec == 'zstd' and zstandard is None:
+            raise RuntimeError('MESSAGE_CODEC=zstd, mas o pacote zstandard não está instalado')
+        self.codec = codec
+        self.min_bytes = min_bytes
+        self.level = level
+        self.dictionary_loader = dictionary_loader
+        self._dictionaries = {}
+        # (id, dicionário) usado para comprimir; False enquanto não foi procurado
+        self._active_dictionary = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _load(self, dict_id):
+        loaded = self.dictionary_loader(dict_id) if self.dictionary_loader else None
+        if not loaded:
+            return None
+        self._dictionaries[loaded[0]] = zstandard.ZstdCompressionDict(loaded[1])
+        return loaded[0], self._dictionaries[loaded[0]]
+
+    def _dictionary(self, dict_id):
+        """Dicionário zstd pelo id da tabela content_dictionaries"""
+        if dict_id not in self._dictionaries:
+            with self._lock:
+                if dict_id not in self._dictionaries and self._load(dict_id) is None:
+                    raise LookupError(f'Dicionário zstd {dict_id} não encontrado')
+        return self._dictionaries[dict_id]
+
+    def _active(self):
+        """(id, dicionário) mais recente, ou None sem dicionário treinado"""
+        if self._active_dictionary is False:
+            with self._lock:
+                if self._active_dictionary is False:
+                    self._active_dictionary = self._load(None)
+        return self._active_dictionary
+
+    def use_dictionary(self, dict_id, data):
+        """Passa a comprimir com este dicionário (recém-treinado)"""
+        with self._lock:
+            self._dictionaries[dict_id] = zstandard.ZstdCompressionDict(data)
+            self._active_dictionary = dict_id, self._dictionaries[dict_id]
+            self._local = threading.local()
+
+    def _compressor(self):
+        # Compressores zstd não podem ser usados por duas threads ao mesmo tempo: um por thread
+        local = self._local
+        if getattr(local, 'compressor', None) is None:
+            active = self._active()
+            if active is None:
+                local.compressor, local.codec = zstandard.ZstdCompressor(level=self.level), 'zstd'
+            else:
+                local.compressor = zstandard.ZstdCompressor(level=self.level, dict_data=active[1])
+                local.codec = f'zstd:{active[0]}'
+        return local.compressor, local.codec
+
+    def encode(self, text):
+        """Texto -> (valor para a coluna content, valor para content_codec)"""
+        raw = text.encode('utf-8')
+        if self.codec == 'off' or len(raw) < self.min_bytes:
+            return text, None
+        if self.codec == 'zstd':
+            compressor, codec = self._compressor()
+            data = compressor.compress(raw)
+        else:
+            data, codec = zlib.compress(raw, self.level), 'zlib'
+        if len(data) > len(raw) * MIN_SAVING:
+            return text, None
+        return data, codec
+
+    def decode(self, value, codec):
+        """Valor gravado -> texto (usado como função SQL message_content)"""
+        if codec is None:
+            return value
+        if codec == 'zlib':
+            return zlib.decompress(value).decode('utf-8')
+        if zstandard is None:
+            raise RuntimeError('Mensagem comprimida com zstd, mas o pacote zstandard não está instalado')
+        dictionary = self._dictionary(int(codec.split(':', 1)[1])) if ':' in codec else None
+        return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(value).decode('utf-8')
+
+
+def train_dictionary(samples, size=112 * 1024):
+    """Treina um dicionário zstd com exemplos de mensagens (textos)"""
+    if zstandard is None:
+        raise RuntimeError('Treinar um dicionário exige o pacote zstandard')
+    return zstandard.train_dictionary(size, [text.encode('utf-8') for text in samples]).as_bytes()
+
+
+def compress_existing(db_manager, batch_size=500, pause=0.05, verbose=False):
+    """Comprime as mensagens antigas gravadas como texto puro. Retorna quantas foram comprimidas"""
+    compressed = 0
+    last_id = 0
+    while True:
+        rows = db_manager.get_uncompressed_messages(last_id, db_manager.content_codec.min_bytes, batch_size)
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for message_id, content in rows:
+            value, codec = db_manager.content_codec.encode(content)
+            if codec is not None:
+                updates.append((message_id, value, codec))
+        compressed += db_manager.update_message_contents(updates)
+        if verbose:
+            print(f"🗜️ Até o id {last_id}: {compressed} mensagens comprimidas")
+        time.sleep(pause)
+    return compressed
+
+
+def main():
+    from app import DATABASE, DatabaseManager
+
+    parser = argparse.ArgumentParser(description='Compressão do conteúdo das mensagens no banco')
+    parser.add_argument('command', choices=['train-dictionary', 'compress-existing'])
+    parser.add_argument('--db', default=DATABASE, help='Caminho do banco SQLite')
+    parser.add_argument('--samples', type=int, default=5000, help='Respostas usadas no treino do dicionário')
+    parser.add_argument('--dict-size', type=int, default=112 * 1024, help='Tamanho do dicionário em bytes')
+    parser.add_argument('--batch-size', type=int, default=500, help='Mensagens por transação')
+    parser.add_argument('--vacuum', action='store_true', help='Devolve o espaço liberado ao sistema de arquivos')
+    args = parser.parse_args()
+
+    db_manager = DatabaseManager(args.db)
+    started = time.perf_counter()
+
+    if args.command == 'train-dictionary':
+        samples = db_manager.get_dictionary_samples(args.samples)
+        dict_id = db_manager.save_content_dictionary(train_dictionary(samples, args.dict_size))
+        print(f"📚 Dicionário {dict_id} treinado com {len(samples)} mensagens "
+              f"(usado com MESSAGE_CODEC=zstd)")
+    else:
+        count = compress_existing(db_manager, args.batch_size, verbose=True)
+        print(f"✅ {count} mensagens comprimidas ({db_manager.content_codec.codec})")
+    print(f"⏱️ {time.perf_counter() - started:.1f}s")
+
+    if args.vacuum:
+        with sqlite3.connect(args.db) as conn:
+            conn.execute('VACUUM')
+        print("🧹 VACUUM concluído")
+
+
+if __name__ == '__main__':
+    main()
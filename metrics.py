@@ -0,0 +1,382 @@
+"""
+Métricas do processo (contadores, gauges e histogramas) no formato texto do Prometheus.
+
+As operações são só incrementos protegidos por um lock, para que a instrumentação
+custe microssegundos no caminho quente do /chat. Os histogramas usam buckets fixos;
+os percentis p50/p90/p99 são estimados por interpolação dentro dos buckets.
+
+Com vários workers (gunicorn), cada processo só conta as próprias requisições.
+SharedMetrics publica o estado de cada processo em um arquivo SQLite a cada poucos
+segundos, e o /metrics de qualquer worker devolve a soma de todos (o mesmo papel do
+modo multiprocesso do prometheus_client): contadores e histogramas somam também os
+processos que já saíram; gauges só os que ainda publicam.
+"""
+
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Buckets em segundos: de 0,5 ms até 20 minutos (timeout do Langflow)
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200
+)
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs += extra
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+    def state(self):
+        """Valores por rótulos em formato JSON (publicados por SharedMetrics)"""
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._render(items)
+
+    def render_merged(self, states, live):
+        """Renderiza a combinação dos estados de vários processos (live: o processo ainda publica)"""
+        merged = {}
+        for state in states:
+            for key, value in state:
+                key = tuple(key)
+                merged[key] = self._combine(merged[key], value) if key in merged else value
+        return self._render(sorted(merged.items()))
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _combine(self, a, b):
+        return a + b
+
+    def _render(self, items):
+        lines = self.header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    type_name = 'gauge'
+    COMBINE = {'livesum': lambda a, b: a + b, 'livemax': max, 'livemin': min}
+
+    def __init__(self, name, documentation, labelnames=(), multiprocess_mode='livesum'):
+        super().__init__(name, documentation, labelnames)
+        # Como os valores dos processos são combinados no /metrics agregado
+        self.multiprocess_mode = multiprocess_mode
+        self._combine = self.COMBINE[multiprocess_mode]
+
+    def render_merged(self, states, live):
+        # Um processo que saiu não tem mais requisições em andamento nem estado atual
+        return super().render_merged([state for state, is_live in zip(states, live) if is_live],
+                                     [True] * sum(live))
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, value, value]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+            if value < state[3]:
+                state[3] = value
+            elif value > state[4]:
+                state[4] = value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def quantile(self, q, **labels):
+        """Estima o percentil q interpolando linearmente dentro do bucket"""
+        state = self._values.get(self._key(labels))
+        if not state or not state[2]:
+            return None
+        return self._quantile(state[0], state[2], q, state[3], state[4])
+
+    def _quantile(self, counts, total, q, minimum, maximum):
+        # Os limites do bucket são restringidos ao mínimo/máximo observados
+        rank = q * total
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = max(self.buckets[index - 1] if index > 0 else 0.0, minimum)
+                upper = min(self.buckets[index] if index < len(self.buckets) else maximum, maximum)
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return maximum
+
+    def state(self):
+        with self._lock:
+            return [[list(key), [list(state[0])] + state[1:]] for key, state in self._values.items()]
+
+    def _combine(self, a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2], min(a[3], b[3]), max(a[4], b[4])]
+
+    def render(self):
+        with self._lock:
+            items = [(key, [list(state[0])] + state[1:]) for key, state in sorted(self._values.items())]
+        return self._render(items)
+
+    def _render(self, items):
+        lines = self.header()
+        quantile_lines = []
+        for key, (counts, total_sum, total_count, minimum, maximum) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{labels} {total_count}")
+
+            for q in QUANTILES:
+                value = self._quantile(counts, total_count, q, minimum, maximum)
+                quantile_labels = _format_labels(self.labelnames, key, [('quantile', str(q))])
+                quantile_lines.append(f"{self.name}_quantile{quantile_labels} {_format_value(value)}")
+
+        if quantile_lines:
+            lines += [f"# HELP {self.name}_quantile Estimated p50/p90/p99 of {self.name}",
+                      f"# TYPE {self.name}_quantile gauge"] + quantile_lines
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), multiprocess_mode='livesum'):
+        return self._register(Gauge(name, documentation, labelnames, multiprocess_mode))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def state(self):
+        """Estado de todas as métricas, por nome (ver SharedMetrics)"""
+        return {metric.name: metric.state() for metric in list(self._metrics.values())}
+
+    def reset(self):
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def render(self, states=None, live=None):
+        """Todas as métricas no formato texto do Prometheus (versão 0.0.4).
+        Com states (um por processo) e live, a combinação de todos os processos"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            if states is None:
+                lines += metric.render()
+            else:
+                lines += metric.render_merged([state.get(metric.name, []) for state in states], live)
+        return '\n'.join(lines) + '\n'
+
+
+class SharedMetrics:
+    """Estado das métricas de cada processo em um arquivo SQLite compartilhado pelos workers.
+
+    Cada processo grava o próprio estado (uma linha por processo) a cada interval segundos
+    numa thread de background, e no desligamento. O /metrics grava o estado do processo
+    que atende e soma as linhas de todos: os outros workers aparecem com até interval
+    segundos de atraso. Outras fontes (objetos com state() e reset(), como as estatísticas
+    por comando SQL) vão na mesma linha e são lidas com collect(nome).
+    """
+
+    def __init__(self, path, registry, sources=None, interval=5.0, retention=7 * 86400):
+        self.path = path
+        self.registry = registry
+        self.sources = sources or {}
+        self.interval = interval
+        # Linhas de processos que pararam de publicar há mais que isto são apagadas
+        self.retention = retention
+        self._local = threading.local()
+        self._worker_id = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._thread = None
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS worker_metrics (
+                    worker TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _connect(self):
+        # Uma conexão por thread e por processo (não pode atravessar o fork)
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = sqlite3.connect(self.path, timeout=1.0)
+            local.conn.execute('PRAGMA synchronous = NORMAL')
+            local.pid = os.getpid()
+        return local.conn
+
+    def _after_fork(self):
+        # O filho herda os valores do processo mestre, que continua publicando os seus:
+        # zerados aqui, cada requisição é contada uma vez só. A thread não sobrevive ao fork
+        self.registry.reset()
+        for source in self.sources.values():
+            source.reset()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.interval:
+            self.start()
+
+    @property
+    def worker_id(self):
+        # PID + sufixo aleatório: um PID reaproveitado não sobrescreve os contadores de um worker antigo
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._worker_id = f"{self._pid}-{uuid.uuid4().hex[:8]}"
+        return self._worker_id
+
+    def publish(self):
+        """Grava o estado deste processo"""
+        state = {'metrics': self.registry.state()}
+        for name, source in self.sources.items():
+            state[name] = source.state()
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO worker_metrics (worker, state, updated_at) VALUES (?, ?, ?)',
+                         (self.worker_id, json.dumps(state), now))
+            conn.execute('DELETE FROM worker_metrics WHERE updated_at < ?', (now - self.retention,))
+
+    def _rows(self):
+        self.publish()
+        live_after = time.time() - max(3 * self.interval, 1.0)
+        rows = self._connect().execute('SELECT state, updated_at FROM worker_metrics').fetchall()
+        return [(json.loads(state), updated_at >= live_after) for state, updated_at in rows]
+
+    def collect(self, name):
+        """Estados da fonte name em todos os processos (o deste processo atualizado agora)"""
+        return [state[name] for state, _ in self._rows() if name in state]
+
+    def render(self):
+        """Métricas de todos os processos no formato texto do Prometheus"""
+        rows = self._rows()
+        return self.registry.render([state['metrics'] for state, _ in rows], [live for _, live in rows])
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.publish()
+            except sqlite3.Error:
+                # Banco ocupado: a próxima publicação leva o estado acumulado
+                pass
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='metrics-publisher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Para a thread e grava o estado final (chamado no desligamento do worker)"""
+        self._stop.set()
+        self.publish()
+
+
+def create_shared_metrics(url, registry, **kwargs):
+    """Agregação entre processos a partir da URL (None para 'memory': métricas só do processo)"""
+    if not url or url == 'memory':
+        return None
+    if url.startswith('sqlite:///'):
+        return SharedMetrics(url[len('sqlite:///'):], registry, **kwargs)
+    raise ValueError(f'METRICS_URL não suportada: {url}')
+
+
+REGISTRY = MetricsRegistry()
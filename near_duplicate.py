@@ -0,0 +1,139 @@
+"""
+Detecção de perguntas quase duplicadas com SimHash.
+
+Cada pergunta do usuário é normalizada e vira uma impressão digital SimHash de 64
+bits, calculada sobre os trigramas de caracteres do texto normalizado (uma palavra
+a mais ou flexionada muda poucos trigramas; com palavras inteiras como atributos,
+qualquer troca numa pergunta curta mudava a impressão demais para ser reconhecida).
+As impressões ficam só no SQLite, que todos os workers do gunicorn compartilham:
+uma pergunta respondida por um worker é reconhecida na mesma hora pelos outros.
+A busca usa uma tabela de bandas (question_fingerprint_bands): os 64 bits são
+divididos em 8 bandas de 8 bits e, pelo princípio da casa dos pombos, duas
+impressões a uma distância de Hamming menor que 8 compartilham pelo menos uma
+banda idêntica (a até d bits de distância, pelo menos 8 - d bandas). Uma consulta
+por igualdade de banda no índice (user_id, band_key) traz só os candidatos com
+bandas idênticas suficientes, que são comparados bit a bit.
+
+As impressões são separadas por usuário: a resposta armazenada foi gerada com o
+histórico e o resumo da conversa de quem perguntou, então nunca é oferecida a
+outro usuário.
+"""
+
+import hashlib
+import re
+import time
+import unicodedata
+from functools import lru_cache
+
+FINGERPRINT_BITS = 64
+# 8 bandas de 8 bits: duas impressões a menos de 8 bits de distância têm uma banda igual
+BANDS = 8
+BAND_BITS = FINGERPRINT_BITS // BANDS
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Palavras que não mudam o sentido da pergunta
+STOPWORDS = {
+    'a', 'o', 'as', 'os', 'de', 'do', 'da', 'dos', 'das', 'e', 'em', 'no', 'na', 'nos',
+    'nas', 'um', 'uma', 'uns', 'umas', 'para', 'pra', 'por', 'com', 'que', 'ao', 'aos',
+    'me', 'eu', 'voce', 'favor', 'poderia', 'pode', 'gostaria', 'sobre'
+}
+
+
+def normalize_question(text):
+    """Normaliza a pergunta: minúsculas, sem acentos, sem pontuação e sem stopwords"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return [word for word in WORD_PATTERN.findall(text) if word not in STOPWORDS]
+
+
+@lru_cache(maxsize=65536)
+def _feature_bits(feature):
+    """Hash de 64 bits do atributo como texto de '0'/'1', do bit 0 ao 63 (trigramas se repetem muito)"""
+    h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), 'little')
+    return format(h, '064b')[::-1]
+
+
+def simhash(tokens):
+    """Calcula o SimHash de 64 bits de uma lista de tokens (trigramas de caracteres do texto normalizado)"""
+    text = ' '.join(tokens)
+    bits = ''.join(_feature_bits(text[i:i + 3]) for i in range(len(text) - 2))
+    features = len(bits) // FINGERPRINT_BITS
+
+    # Peso do bit = atributos com o bit ligado - atributos com o bit desligado. A contagem por
+    # coluna (fatia com passo 64) roda em C, em vez de um laço Python de 64 passos por trigrama
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        if bits[bit::FINGERPRINT_BITS].count('1') * 2 > features:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def band_keys(fingerprint):
+    """Chaves das bandas da impressão (banda * 256 + valor dos 8 bits da banda), gravadas no SQLite"""
+    mask = (1 << BAND_BITS) - 1
+    return [band << BAND_BITS | (fingerprint >> (band * BAND_BITS)) & mask for band in range(BANDS)]
+
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count('1')
+
+
+def to_signed(fingerprint):
+    """Converte para inteiro com sinal de 64 bits (formato INTEGER do SQLite)"""
+    return fingerprint - (1 << 64) if fingerprint >= (1 << 63) else fingerprint
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class SimHashIndex:
+    """Índice de perguntas recentes por bandas, persistido e consultado no SQLite.
+
+    O /chat calcula a impressão uma vez (fingerprint) e a usa tanto na busca quanto no registro.
+    """
+
+    def __init__(self, db_manager, max_distance=5, min_tokens=4, max_age_hours=168,
+                 max_candidates=2000):
+        if max_distance >= BANDS:
+            raise ValueError("max_distance precisa ser menor que o número de bandas")
+
+        self.db_manager = db_manager
+        self.max_distance = max_distance
+        self.min_tokens = min_tokens
+        self.max_age = max_age_hours * 3600
+        self.max_candidates = max_candidates
+
+    def fingerprint(self, question):
+        """Retorna a impressão da pergunta, ou None se ela for curta demais para comparar"""
+        tokens = normalize_question(question)
+        if len(tokens) < self.min_tokens:
+            return None
+        return simhash(tokens)
+
+    def add(self, user_id, fingerprint, response_id):
+        """Registra a impressão da pergunta do usuário e o response_id da resposta da IA"""
+        if fingerprint is None:
+            return
+        self.db_manager.save_question_fingerprint(
+            user_id, to_signed(fingerprint), band_keys(fingerprint), response_id, time.time()
+        )
+
+    def lookup(self, user_id, fingerprint):
+        """Busca uma pergunta recente parecida do mesmo usuário. Retorna (response_id, distância) ou None"""
+        if fingerprint is None:
+            return None
+
+        # Cada bit diferente cai numa banda só: a até max_distance bits, pelo menos
+        # BANDS - max_distance bandas são idênticas (o SQLite descarta os demais candidatos).
+        # Mais recentes primeiro: no empate de distância fica a resposta mais nova
+        rows = self.db_manager.get_question_fingerprint_candidates(
+            user_id, band_keys(fingerprint), BANDS - self.max_distance,
+            time.time() - self.max_age, self.max_candidates
+        )
+        best = None
+        for candidate, response_id in rows:
+            distance = hamming_distance(fingerprint, to_unsigned(candidate))
+            if distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (response_id, distance)
+        return best
@@ -0,0 +1,160 @@
+"""
+Limite de requisições por usuário (token bucket).
+
+Cada usuário (o mesmo hash SHA-256 do IP usado em get_user_id) tem um balde por
+orçamento: um para o /chat, que dispara uma execução do agente, e outro para as
+rotas de leitura. A checagem roda antes de qualquer acesso ao banco ou ao
+Langflow e é só aritmética em um dicionário; acima do limite a resposta é 429
+com Retry-After.
+
+Com vários workers, cada processo vê só as próprias requisições. Um nível
+compartilhado (SQLite local, RATE_LIMIT_URL) guarda os baldes de todos os processos;
+o gunicorn.conf.py o liga sozinho com mais de um worker, e sem ele o limite vale por
+processo. O balde local continua na frente e recusa sozinho as rajadas, porque um
+balde que vê só parte das requisições nunca tem menos fichas que o compartilhado.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import jsonify, request
+
+
+class MemoryBuckets:
+    """Baldes na memória do processo, limitados aos usuários mais recentes"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Consome uma ficha. Retorna 0 se permitido, senão os segundos até a próxima ficha"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            # Um balde descartado volta cheio, o que só favorece usuários inativos há muito tempo
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+class SQLiteBuckets:
+    """Baldes compartilhados entre processos em um arquivo SQLite (uma transação por checagem)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+
+    def _connect(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            # Autocommit: a transação é aberta explicitamente com BEGIN IMMEDIATE
+            local.conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            local.conn.execute('PRAGMA synchronous = NORMAL')
+            local.pid = os.getpid()
+        return local.conn
+
+    def take(self, key, rate, burst):
+        # Relógio de parede: o monotônico não é comparável entre processos
+        now = time.time()
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute('INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return wait
+
+    def prune(self, idle_seconds=3600):
+        """Remove baldes parados há muito tempo (já estariam cheios de novo)"""
+        conn = self._connect()
+        conn.execute('DELETE FROM rate_limit_buckets WHERE updated_at < ?', (time.time() - idle_seconds,))
+
+
+def create_store(url):
+    """Nível compartilhado a partir da URL (None para usar só a memória do processo)"""
+    if not url or url == 'memory':
+        return None
+    if url.startswith('sqlite:///'):
+        return SQLiteBuckets(url[len('sqlite:///'):])
+    raise ValueError(f'RATE_LIMIT_URL não suportada: {url}')
+
+
+class RateLimiter:
+    def __init__(self, app=None, limits=None, endpoints=None, key_func=None, shared=None, counter=None):
+        # Orçamento -> (fichas por minuto, tamanho da rajada)
+        self.limits = {name: (per_minute / 60.0, burst) for name, (per_minute, burst) in (limits or {}).items()}
+        # Endpoint do Flask -> orçamento; endpoints fora do mapa não são limitados
+        self.endpoints = dict(endpoints or {})
+        self.key_func = key_func or (lambda: request.remote_addr or 'unknown')
+        self.local = MemoryBuckets()
+        self.shared = shared
+        # Contador opcional do registro de métricas, com o rótulo budget
+        self.counter = counter
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self.check_request)
+
+    def check(self, key, budget):
+        """Segundos até a próxima ficha do orçamento (0 = permitido)"""
+        rate, burst = self.limits[budget]
+        bucket_key = f'{budget}:{key}'
+        wait = self.local.take(bucket_key, rate, burst)
+        if not wait and self.shared is not None:
+            wait = self.shared.take(bucket_key, rate, burst)
+        return wait
+
+    def check_request(self):
+        budget = self.endpoints.get(request.endpoint)
+        if budget is None:
+            return None
+
+        wait = self.check(self.key_func(), budget)
+        if not wait:
+            return None
+
+        if self.counter is not None:
+            self.counter.inc(budget=budget)
+        retry_after = max(1, int(wait + 0.999))
+        response = jsonify({
+            'error': f'Muitas requisições em sequência. Tente novamente em {retry_after} segundo(s).',
+            'retry_after': retry_after
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(retry_after)
+        return response
@@ -0,0 +1,253 @@
+"""
+Profiling sob demanda de requisições em produção.
+
+Um administrador pede o profiling de uma requisição específica com o cabeçalho
+`X-Profile` (ou `?profile=`) junto com `X-Admin-Token`. O valor escolhe o modo:
+'cprofile' (determinístico, gera um arquivo .pstats) ou 'sample' (amostragem da
+pilha da thread a cada poucos milissegundos, gera pilhas colapsadas prontas para
+flamegraph). Só os perfis das N requisições mais lentas (e os gravados há poucos
+segundos, cujo id acabou de ser devolvido no cabeçalho X-Profile-Id) são mantidos em
+disco e podem ser consultados em /admin/profiles.
+
+O índice também fica no disco (um <id>.json ao lado de cada perfil): com vários
+workers, todos gravam no mesmo diretório, a lista mostra as mais lentas de todos e
+qualquer worker entrega um perfil gerado por outro.
+"""
+
+import hmac
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import Response, abort, g, jsonify, request
+
+logger = logging.getLogger('chatbot.profiler')
+
+PROFILE_MODES = ('cprofile', 'sample')
+# Linhas máximas do resumo em /admin/profiles/<id>?format=text
+MAX_TEXT_LINES = 1000
+
+
+class StackSampler:
+    """Profiler por amostragem: lê a pilha de uma thread em intervalos fixos"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        if stack:
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        """Pilhas no formato colapsado (uma linha 'a;b;c contagem' por pilha)"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    def __init__(self, app=None, admin_token='', output_dir='profiles', keep_slowest=20,
+                 keep_recent_seconds=60, sample_interval=0.005):
+        # Sem token de administrador o profiling fica desligado
+        self.admin_token = admin_token
+        self.output_dir = output_dir
+        self.keep_slowest = keep_slowest
+        # Perfis mais novos que isto não são descartados: o cliente acabou de receber o id
+        # (o perfil que acabou de ser gravado nunca é descartado na própria gravação)
+        self.keep_recent_seconds = keep_recent_seconds
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.before_request(self.start_profile)
+        app.after_request(self.tag_response)
+        app.teardown_request(self.finish_profile)
+        app.add_url_rule('/admin/profiles', 'list_profiles', self.list_profiles)
+        app.add_url_rule('/admin/profiles/<profile_id>', 'get_profile', self.get_profile)
+
+    def is_admin(self):
+        token = request.headers.get('X-Admin-Token', '')
+        return bool(self.admin_token) and hmac.compare_digest(token, self.admin_token)
+
+    def requested_mode(self):
+        mode = request.headers.get('X-Profile') or request.args.get('profile')
+        if not mode:
+            return None
+        mode = mode.lower()
+        return mode if mode in PROFILE_MODES else 'cprofile'
+
+    def start_profile(self):
+        mode = self.requested_mode()
+        if not mode or not self.is_admin():
+            return
+
+        # Id gerado no servidor: vira nome de arquivo, então nunca vem do cliente
+        g.profile_id = uuid.uuid4().hex[:16]
+        g.profile_mode = mode
+        g.profile_started = time.perf_counter()
+        if mode == 'sample':
+            g.profiler = StackSampler(threading.get_ident(), self.sample_interval)
+            g.profiler.start()
+        else:
+            # Importado só quando usado: o profiling é raro e não deve pesar na subida do servidor
+            import cProfile
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def tag_response(self, response):
+        if 'profile_id' in g:
+            response.headers['X-Profile-Id'] = g.profile_id
+        return response
+
+    def finish_profile(self, exc):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+
+        if g.profile_mode == 'sample':
+            profiler.stop()
+        else:
+            profiler.disable()
+        duration = time.perf_counter() - g.profile_started
+
+        try:
+            self._record(profiler, g.profile_mode, duration)
+        except OSError:
+            logger.exception('profile_save_failed')
+
+    def _record(self, profiler, mode, duration):
+        profile_id = g.profile_id
+        entry = {
+            'id': profile_id,
+            'request_id': g.get('request_id'),
+            'mode': mode,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'duration_ms': round(duration * 1000, 2),
+            'created_at': time.time()
+        }
+
+        with self._lock:
+            os.makedirs(self.output_dir, exist_ok=True)
+            if mode == 'sample':
+                entry['file'] = os.path.join(self.output_dir, f"{profile_id}.collapsed")
+                with open(entry['file'], 'w') as f:
+                    f.write(profiler.collapsed())
+            else:
+                entry['file'] = os.path.join(self.output_dir, f"{profile_id}.pstats")
+                profiler.dump_stats(entry['file'])
+
+            # Metadados gravados por último e trocados de uma vez: a lista nunca vê um perfil pela metade
+            meta_path = self._meta_path(profile_id)
+            with open(meta_path + '.tmp', 'w') as f:
+                json.dump(entry, f)
+            os.replace(meta_path + '.tmp', meta_path)
+
+            recent = time.time() - self.keep_recent_seconds
+            for stale in self.entries()[self.keep_slowest:]:
+                if stale['id'] != profile_id and stale['created_at'] < recent:
+                    for path in (stale['file'], self._meta_path(stale['id'])):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+
+    def _meta_path(self, profile_id):
+        return os.path.join(self.output_dir, f"{profile_id}.json")
+
+    def entries(self):
+        """Perfis guardados (por todos os workers), do mais lento para o mais rápido"""
+        try:
+            names = os.listdir(self.output_dir)
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.output_dir, name)) as f:
+                    entries.append(json.load(f))
+            except (OSError, ValueError):
+                # Descartado por outro worker entre o listdir e a leitura
+                continue
+        return sorted(entries, key=lambda entry: -entry['duration_ms'])
+
+    def require_admin(self):
+        """Interrompe a requisição se ela não vier de um administrador"""
+        if not self.admin_token:
+            abort(404)
+        if not self.is_admin():
+            abort(403)
+
+    def list_profiles(self):
+        """Lista as N requisições mais lentas com perfil"""
+        self.require_admin()
+        return jsonify({
+            'profiles': [{key: value for key, value in entry.items() if key != 'file'}
+                         for entry in self.entries()]
+        })
+
+    def get_profile(self, profile_id):
+        """Baixa um perfil; com ?format=text, um resumo legível das funções mais caras"""
+        self.require_admin()
+        entry = next((e for e in self.entries() if e['id'] == profile_id), None)
+        if entry is None or not os.path.exists(entry['file']):
+            abort(404)
+
+        if entry['mode'] == 'sample':
+            with open(entry['file']) as f:
+                return Response(f.read(), content_type='text/plain; charset=utf-8')
+
+        if request.args.get('format') == 'text':
+            # Importado só quando usado, como o cProfile
+            import pstats
+            sort_keys = sorted(key.value for key in pstats.SortKey)
+            sort = request.args.get('sort', 'cumulative')
+            if sort not in sort_keys:
+                return jsonify({'error': f"sort inválido; use um de: {', '.join(sort_keys)}"}), 400
+            try:
+                limit = int(request.args.get('limit', 40))
+            except ValueError:
+                return jsonify({'error': 'limit deve ser um número inteiro'}), 400
+            if limit < 1:
+                return jsonify({'error': 'limit deve ser maior ou igual a 1'}), 400
+
+            output = io.StringIO()
+            stats = pstats.Stats(entry['file'], stream=output)
+            stats.sort_stats(sort).print_stats(min(limit, MAX_TEXT_LINES))
+            return Response(output.getvalue(), content_type='text/plain; charset=utf-8')
+
+        with open(entry['file'], 'rb') as f:
+            return Response(f.read(), content_type='application/octet-stream', headers={
+                'Content-Disposition': f'attachment; filename="{profile_id}.pstats"'
+            })
@@ -0,0 +1,84 @@
+"""
+Compressão das respostas JSON (histórico de conversas).
+
+As rotas de histórico devolvem arrays grandes de respostas longas da IA, que
+comprimem muito bem. Este middleware negocia a codificação pelo Accept-Encoding
+(brotli quando disponível, senão gzip) e ignora corpos pequenos.
+
+O corpo é comprimido de uma vez: as rotas JSON já montam a resposta inteira em
+memória (jsonify), então comprimir em blocos depois não economizaria memória nem
+adiantaria o primeiro byte, só tiraria o Content-Length. compress_stream fica
+para quem gera o corpo em partes de verdade (a página inicial, ver home()).
+"""
+
+import zlib
+
+from flask import request
+
+from static_assets import brotli, choose_encoding, compress
+
+
+def compress_stream(chunks, encoding, level, flush_each=False):
+    """Comprime uma sequência de blocos em streaming.
+
+    Com flush_each=True cada bloco é enviado assim que comprimido (útil quando o
+    navegador deve começar a processar a página antes do resto ficar pronto).
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        compress_chunk, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        # wbits=31 gera o formato gzip (cabeçalho + trailer)
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        compress_chunk, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compress_chunk(chunk)
+        if flush_each:
+            data += flush()
+        if data:
+            yield data
+    yield finish()
+
+
+class ResponseCompression:
+    def __init__(self, app=None, min_size=1024, gzip_level=6, brotli_quality=4,
+                 mimetypes=('application/json',)):
+        # Corpos menores que min_size não compensam o custo de CPU
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.mimetypes = set(mimetypes)
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self.after_request)
+
+    def _level(self, encoding):
+        return self.brotli_quality if encoding == 'br' else self.gzip_level
+
+    def after_request(self, response):
+        if (response.mimetype not in self.mimetypes or
+                response.direct_passthrough or
+                not 200 <= response.status_code < 300 or
+                'Content-Encoding' in response.headers):
+            return response
+
+        response.vary.add('Accept-Encoding')
+
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if not encoding:
+            return response
+
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+
+        response.set_data(compress(body, encoding, self._level(encoding)))
+        response.headers['Content-Encoding'] = encoding
+        return response
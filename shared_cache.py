@@ -0,0 +1,254 @@
+"""
+Cache em dois níveis compartilhado entre os workers.
+
+O primeiro nível é um LRU na memória do processo (sem serialização, sem I/O); o
+segundo é compartilhado por todos os processos da máquina: um arquivo SQLite em
+modo WAL ou, quando configurado, um Redis. Uma falta no primeiro nível consulta o
+segundo e, se achar, promove o valor para a memória local.
+
+Os valores guardados aqui são imutáveis por chave (uma resposta nunca muda para o
+mesmo response_id), então não há invalidação entre processos: cada LRU local só
+precisa de limite de tamanho e TTL. Os valores precisam ser serializáveis em JSON.
+
+    CACHE_URL=sqlite:///chatbot_cache.db   (padrão)
+    CACHE_URL=redis://localhost:6379/0     (requer o pacote redis)
+    CACHE_URL=memory                       (só o nível local)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+TIERS = ('local', 'shared')
+
+
+class LocalLRU:
+    """LRU limitado por número de itens, com TTL, protegido por um lock"""
+
+    def __init__(self, max_items=256, ttl=None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna (achou, valor)"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._items[key]
+                return False, None
+            self._items.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + ttl if ttl else None)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteBackend:
+    """Nível compartilhado em um arquivo SQLite local (WAL: leitores não bloqueiam o escritor)"""
+
+    # A limpeza de expirados e do excesso roda a cada N gravações
+    PRUNE_EVERY = 256
+
+    def __init__(self, path, max_entries=10000):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        # O arquivo só é criado no primeiro uso (importar o app não cria arquivos)
+        self._ready = False
+
+    def _connect(self):
+        # Uma conexão por thread e por processo (não pode atravessar o fork)
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.conn = sqlite3.connect(self.path, timeout=1.0)
+            local.conn.execute('PRAGMA synchronous = NORMAL')
+            local.pid = os.getpid()
+        if not self._ready:
+            with local.conn as conn:
+                conn.execute('PRAGMA journal_mode = WAL')
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS cache_entries (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        expires_at REAL
+                    )
+                ''')
+            self._ready = True
+        return local.conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            'SELECT value, expires_at FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or row[1] is not None and row[1] <= time.time():
+            return False, None
+        return True, json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        with self._connect() as conn:
+            conn.execute('INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+                         (key, json.dumps(value), expires_at))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def delete(self, key):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def checkpoint_wal(self):
+        """Transfere o WAL para o arquivo principal e o trunca (usado no desligamento)"""
+        self._connect().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+
+    def prune(self):
+        """Remove os expirados e, acima do limite, as entradas mais antigas"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM cache_entries WHERE expires_at <= ?', (time.time(),))
+            conn.execute('''
+                DELETE FROM cache_entries WHERE rowid IN (
+                    SELECT rowid FROM cache_entries ORDER BY rowid
+                    LIMIT max(0, (SELECT COUNT(*) FROM cache_entries) - ?)
+                )
+            ''', (self.max_entries,))
+
+
+class RedisBackend:
+    """Nível compartilhado em um servidor compatível com Redis.
+
+    Aceita qualquer cliente com get(key), set(key, value, ex=segundos) e delete(key)
+    (a API do redis-py); os valores vão como JSON.
+    """
+
+    def __init__(self, client, prefix='chatbot:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        if redis is None:
+            raise RuntimeError('CACHE_URL aponta para Redis, mas o pacote redis não está instalado')
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return False, None
+        return True, json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+def create_backend(url):
+    """Nível compartilhado a partir da URL (None quando só o nível local deve ser usado)"""
+    if not url or url == 'memory':
+        return None
+    if url.startswith('sqlite:///'):
+        return SQLiteBackend(url[len('sqlite:///'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend.from_url(url)
+    raise ValueError(f'CACHE_URL não suportada: {url}')
+
+
+class TieredCache:
+    """Cache com nome (usado como prefixo das chaves no nível compartilhado) e dois níveis"""
+
+    def __init__(self, name, shared=None, max_items=256, ttl=None, counter=None):
+        self.name = name
+        self.local = LocalLRU(max_items, ttl)
+        self.shared = shared
+        self.ttl = ttl
+        # Contador opcional do registro de métricas, com os rótulos cache, tier e result
+        self.counter = counter
+        self._counts = {(tier, result): 0 for tier in TIERS for result in ('hit', 'miss')}
+        self._lock = threading.Lock()
+
+    def _record(self, tier, result):
+        with self._lock:
+            self._counts[(tier, result)] += 1
+        if self.counter is not None:
+            self.counter.inc(cache=self.name, tier=tier, result=result)
+
+    def _shared_key(self, key):
+        return f'{self.name}:{key}'
+
+    def get(self, key, default=None):
+        found, value = self.local.get(key)
+        if found:
+            self._record('local', 'hit')
+            return value
+        self._record('local', 'miss')
+
+        if self.shared is None:
+            return default
+        found, value = self.shared.get(self._shared_key(key))
+        if not found:
+            self._record('shared', 'miss')
+            return default
+        self._record('shared', 'hit')
+        self.local.set(key, value)
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = ttl if ttl is not None else self.ttl
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), value, ttl)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(key))
+
+    def get_or_set(self, key, factory):
+        """Valor do cache ou, na falta, o de factory() (que não é guardado se for None)"""
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def stats(self):
+        """Acertos, faltas e taxa de acerto por nível"""
+        with self._lock:
+            counts = dict(self._counts)
+        report = {'local_items': len(self.local), 'shared': type(self.shared).__name__ if self.shared else None}
+        for tier in TIERS:
+            hits, misses = counts[(tier, 'hit')], counts[(tier, 'miss')]
+            report[tier] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None
+            }
+        return report
@@ -0,0 +1,551 @@
+// Removido currentSessionId - agora usando conversa única contínua
+
+window.addEventListener('DOMContentLoaded', function() {
+  // Theme toggle functionality
+  const themeBtn = document.getElementById('theme-toggle');
+  themeBtn.addEventListener('click', function() {
+    document.body.classList.toggle('dark-mode');
+    if(document.body.classList.contains('dark-mode')) {
+      themeBtn.textContent = 'Modo Claro';
+    } else {
+      themeBtn.textContent = 'Modo Escuro';
+    }
+  });
+
+  // Removed loadConversationHistory() - no longer needed
+
+  // Chat functionality  
+  const chatInput = document.getElementById('chat-input');
+  const sendBtn = document.getElementById('send-button');
+  const messagesContainer = document.getElementById('chat-messages');
+
+  // Removed search functionality - no longer needed
+
+  function scrollToBottom() {
+    messagesContainer.scrollTop = messagesContainer.scrollHeight;
+  }
+
+  function createHtmlButton(responseId) {
+    const btn = document.createElement('button');
+    btn.className = 'html-generate-btn';
+    btn.innerHTML = '📄';
+    btn.title = 'Gerar HTML desta resposta';
+    btn.onclick = function(e) {
+      e.stopPropagation();
+      generateHtml(responseId);
+    };
+    return btn;
+  }
+
+  async function generateHtml(responseId) {
+    try {
+      const response = await fetch('/generate_html', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ response_id: responseId })
+      });
+
+      const data = await response.json();
+
+      if (data.success) {
+        window.open('/view_html/' + responseId, '_blank');
+      } else {
+        alert('Erro ao gerar HTML: ' + (data.error || 'Erro desconhecido'));
+      }
+    } catch (error) {
+      console.error('Erro ao gerar HTML:', error);
+      alert('Erro ao gerar HTML. Tente novamente.');
+    }
+  }
+
+  // Lista virtualizada: só as mensagens próximas da área visível ficam no DOM.
+  // As alturas são medidas quando a mensagem é renderizada; as demais usam uma estimativa.
+  const PAGE_SIZE = 100;
+  const OVERSCAN = 8;
+  const ESTIMATED_HEIGHT = 90;
+  const rowGap = parseFloat(getComputedStyle(messagesContainer).rowGap) || 0;
+  const transcript = [];
+  let renderedStart = 0;
+  let renderedEnd = 0;
+  let hasMoreHistory = false;
+  let loadingHistory = false;
+  let scrollScheduled = false;
+
+  const topSpacer = document.createElement('div');
+  const bottomSpacer = document.createElement('div');
+  topSpacer.className = 'virtual-spacer';
+  bottomSpacer.className = 'virtual-spacer';
+  messagesContainer.appendChild(topSpacer);
+  messagesContainer.appendChild(bottomSpacer);
+
+  function toItem(msg) {
+    return {
+      id: msg.id,
+      content: msg.content,
+      type: msg.message_type,
+      responseId: msg.response_id,
+      height: 0,
+      el: null,
+      animate: false
+    };
+  }
+
+  function createMessageElement(item) {
+    const message = document.createElement('div');
+    message.className = `message ${item.type}`;
+    if (!item.animate) {
+      message.classList.add('static');
+    }
+    message.textContent = item.content;
+
+    if (item.type === 'ai' && item.responseId) {
+      message.style.position = 'relative';
+      const htmlBtn = createHtmlButton(item.responseId);
+      message.appendChild(htmlBtn);
+    }
+    return message;
+  }
+
+  function itemHeight(item) {
+    return item.height || ESTIMATED_HEIGHT;
+  }
+
+  function heightOf(start, end) {
+    let total = 0;
+    for (let i = start; i < end; i++) {
+      total += itemHeight(transcript[i]);
+    }
+    return total;
+  }
+
+  function buildFragment(start, end) {
+    const fragment = document.createDocumentFragment();
+    for (let i = start; i < end; i++) {
+      const item = transcript[i];
+      item.el = createMessageElement(item);
+      item.animate = false;
+      fragment.appendChild(item.el);
+    }
+    return fragment;
+  }
+
+  function renderRange(start, end) {
+    // Âncora: uma mensagem que continua renderizada, para manter a posição visual estável
+    const keepStart = Math.max(start, renderedStart);
+    const keepEnd = Math.min(end, renderedEnd);
+    const anchor = keepStart < keepEnd ? transcript[keepStart].el : null;
+    const anchorTop = anchor ? anchor.offsetTop : 0;
+
+    // Remover mensagens que saíram da janela
+    for (let i = renderedStart; i < renderedEnd; i++) {
+      if ((i < start || i >= end) && transcript[i].el) {
+        transcript[i].el.remove();
+        transcript[i].el = null;
+      }
+    }
+
+    // Inserir as novas mensagens em no máximo dois DocumentFragments
+    if (anchor) {
+      messagesContainer.insertBefore(buildFragment(start, keepStart), anchor);
+      messagesContainer.insertBefore(buildFragment(keepEnd, end), bottomSpacer);
+    } else {
+      messagesContainer.insertBefore(buildFragment(start, end), bottomSpacer);
+    }
+    renderedStart = start;
+    renderedEnd = end;
+
+    // Medir as mensagens renderizadas (um único reflow) e ajustar os espaçadores
+    for (let i = start; i < end; i++) {
+      transcript[i].height = transcript[i].el.offsetHeight + rowGap;
+    }
+    topSpacer.style.height = Math.max(0, heightOf(0, start) - rowGap) + 'px';
+    bottomSpacer.style.height = Math.max(0, heightOf(end, transcript.length) - rowGap) + 'px';
+
+    if (anchor) {
+      messagesContainer.scrollTop += anchor.offsetTop - anchorTop;
+    }
+  }
+
+  function visibleRange() {
+    const top = messagesContainer.scrollTop;
+    const bottom = top + messagesContainer.clientHeight;
+    let offset = 0;
+    let first = transcript.length;
+    let last = transcript.length;
+
+    for (let i = 0; i < transcript.length; i++) {
+      const height = itemHeight(transcript[i]);
+      if (first === transcript.length && offset + height > top) {
+        first = i;
+      }
+      if (offset >= bottom) {
+        last = i;
+        break;
+      }
+      offset += height;
+    }
+    return [Math.max(0, first - OVERSCAN), Math.min(transcript.length, last + OVERSCAN)];
+  }
+
+  function bottomRangeStart() {
+    let height = 0;
+    let start = transcript.length;
+    while (start > 0 && height < messagesContainer.clientHeight) {
+      start--;
+      height += itemHeight(transcript[start]);
+    }
+    return Math.max(0, start - OVERSCAN);
+  }
+
+  function appendItems(items) {
+    transcript.push(...items);
+    renderRange(bottomRangeStart(), transcript.length);
+    scrollToBottom();
+  }
+
+  function addMessage(content, type, responseId = null) {
+    const item = toItem({ content: content, message_type: type, response_id: responseId });
+    item.animate = true;
+    appendItems([item]);
+  }
+
+  async function fetchPage(beforeId) {
+    let url = '/get_current_conversation?limit=' + PAGE_SIZE;
+    if (beforeId) {
+      url += '&before_id=' + beforeId;
+    }
+    const response = await fetch(url);
+    return response.json();
+  }
+
+  async function loadOlderMessages() {
+    if (loadingHistory || !hasMoreHistory || !transcript.length || !transcript[0].id) {
+      return;
+    }
+    loadingHistory = true;
+    try {
+      const data = await fetchPage(transcript[0].id);
+      if (data.success) {
+        const items = data.messages.map(toItem);
+        transcript.unshift(...items);
+        renderedStart += items.length;
+        renderedEnd += items.length;
+        hasMoreHistory = data.has_more;
+        renderRange(renderedStart, renderedEnd);
+      }
+    } catch (error) {
+      console.error('Erro ao carregar mensagens anteriores:', error);
+    } finally {
+      loadingHistory = false;
+    }
+  }
+
+  messagesContainer.addEventListener('scroll', function() {
+    if (scrollScheduled) {
+      return;
+    }
+    scrollScheduled = true;
+    requestAnimationFrame(function() {
+      scrollScheduled = false;
+      const [start, end] = visibleRange();
+      if (start !== renderedStart || end !== renderedEnd) {
+        renderRange(start, end);
+      }
+      if (messagesContainer.scrollTop < 200) {
+        loadOlderMessages();
+      }
+    });
+  });
+
+  // Removed loadConversationHistory, loadConversation, and searchConversations functions - no longer needed
+
+  let reuseNotice = null;
+
+  function addReuseNotice(message) {
+    const notice = document.createElement('div');
+    reuseNotice = notice;
+    notice.className = 'message typing';
+    notice.textContent = 'Resposta reaproveitada de uma pergunta semelhante. ';
+    const freshBtn = document.createElement('button');
+    freshBtn.className = 'btn';
+    freshBtn.textContent = 'Gerar resposta nova';
+    freshBtn.onclick = function() {
+      notice.remove();
+      chatInput.value = message;
+      sendMessage(true);
+    };
+    notice.appendChild(freshBtn);
+    messagesContainer.appendChild(notice);
+    scrollToBottom();
+  }
+
+  // Chave de idempotência da última mensagem que não recebeu resposta:
+  // reenviar o mesmo texto reaproveita a chave e o servidor não executa o agente de novo
+  let pendingRequest = null;
+  // Aborta o /chat em andamento (Esc ou saída da página): o servidor cancela a execução do agente
+  let chatAbort = null;
+
+  function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+      return crypto.randomUUID();
+    }
+    const bytes = crypto.getRandomValues(new Uint8Array(16));
+    return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+  }
+
+  async function postChat(message, fresh, key, signal) {
+    // Falhas de rede (timeout, conexão caída) são repetidas com a mesma chave
+    const retryDelays = [1000, 3000];
+    let failures = 0;
+    while (true) {
+      let response;
+      try {
+        response = await fetch('/chat', {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+            'Idempotency-Key': key,
+          },
+          signal: signal,
+          body: JSON.stringify({ 
+            message: message,
+            fresh: fresh
+            // Removed session_id - using single continuous conversation
+          })
+        });
+      } catch (error) {
+        if (error.name === 'AbortError' || failures >= retryDelays.length) {
+          throw error;
+        }
+        await new Promise(resolve => setTimeout(resolve, retryDelays[failures++]));
+        continue;
+      }
+      // 409: a execução original com esta chave ainda está em andamento; pergunta de novo depois do Retry-After
+      if (response.status !== 409) {
+        return response;
+      }
+      const seconds = parseInt(response.headers.get('Retry-After'), 10) || 5;
+      await new Promise(resolve => setTimeout(resolve, seconds * 1000));
+    }
+  }
+
+  async function sendMessage(fresh = false) {
+    const message = chatInput.value.trim();
+    if (message && !sendBtn.disabled) {
+      sendBtn.disabled = true;
+      chatInput.disabled = true;
+
+      if (reuseNotice) {
+        reuseNotice.remove();
+        reuseNotice = null;
+      }
+
+      addMessage(message, 'user');
+
+      const typingMessage = document.createElement('div');
+      typingMessage.className = 'message ai typing';
+      typingMessage.textContent = 'SmartOps AI está digitando...';
+      messagesContainer.appendChild(typingMessage);
+      scrollToBottom();
+
+      chatInput.value = '';
+
+      if (!pendingRequest || pendingRequest.message !== message) {
+        pendingRequest = { message: message, key: newIdempotencyKey() };
+      }
+
+      try {
+        chatAbort = new AbortController();
+        const response = await postChat(message, fresh, pendingRequest.key, chatAbort.signal);
+
+        const data = await response.json();
+        if (response.status !== 409) {
+          pendingRequest = null;
+        }
+        messagesContainer.removeChild(typingMessage);
+        addMessage(
+          data.response || data.error || 'Desculpe, não consegui processar sua mensagem.',
+          'ai',
+          data.response_id
+        );
+
+        if (data.near_duplicate && data.near_duplicate.reused) {
+          addReuseNotice(message);
+        }
+
+        // Removed loadConversationHistory() call - no longer needed
+
+      } catch (error) {
+        messagesContainer.removeChild(typingMessage);
+        if (error.name === 'AbortError') {
+          addMessage('Mensagem cancelada.', 'ai');
+        } else {
+          console.error('Erro ao enviar mensagem:', error);
+          addMessage('Desculpe, ocorreu um erro na comunicação. Tente novamente.', 'ai');
+        }
+      }
+      chatAbort = null;
+
+      sendBtn.disabled = false;
+      chatInput.disabled = false;
+      chatInput.focus();
+    }
+  }
+
+  // Indicador de status do cabeçalho: estado do agente informado pela rota /ready
+  const chatStatus = document.getElementById('chat-status');
+  const chatStatusText = document.getElementById('chat-status-text');
+  const statusLabels = {
+    ready: 'Online',
+    starting: 'Conectando...',
+    warming: 'Aquecendo...',
+    offline: 'Offline',
+    invalid_flow: 'Indisponível',
+    draining: 'Reiniciando...'
+  };
+
+  async function refreshStatus() {
+    let state = 'offline';
+    try {
+      const response = await fetch('/ready', { cache: 'no-store' });
+      state = (await response.json()).state || state;
+    } catch (error) {
+      // Servidor fora do ar: mantém "Offline"
+    }
+    chatStatus.dataset.state = state;
+    chatStatusText.textContent = statusLabels[state] || 'Offline';
+    // Enquanto não estiver pronto, verifica com mais frequência
+    setTimeout(refreshStatus, state === 'ready' ? 30000 : 5000);
+  }
+
+  refreshStatus();
+
+  sendBtn.addEventListener('click', () => sendMessage());
+  document.addEventListener('keydown', function(e) {
+    if (e.key === 'Escape' && chatAbort) {
+      chatAbort.abort();
+    }
+  });
+  window.addEventListener('pagehide', function() {
+    if (chatAbort) {
+      chatAbort.abort();
+    }
+  });
+  chatInput.addEventListener('keypress', function(e) {
+    if (e.key === 'Enter' && !e.shiftKey && !sendBtn.disabled) {
+      e.preventDefault();
+      sendMessage();
+    }
+  });
+
+  chatInput.addEventListener('input', function() {
+    this.style.height = 'auto';
+    this.style.height = Math.min(this.scrollHeight, 100) + 'px';
+  });
+
+  // Removed history modal functionality - no longer needed
+
+  // Cache local do histórico: em visitas seguintes só as mensagens novas são baixadas
+  const CACHE_KEY = 'smartops-transcript';
+  const CACHE_MAX_MESSAGES = 200;
+
+  function readTranscriptCache() {
+    try {
+      return JSON.parse(localStorage.getItem(CACHE_KEY));
+    } catch (error) {
+      return null;
+    }
+  }
+
+  function writeTranscriptCache(conversationId, version) {
+    const messages = transcript
+      .filter(item => item.id)
+      .slice(-CACHE_MAX_MESSAGES)
+      .map(item => ({
+        id: item.id,
+        message_type: item.type,
+        content: item.content,
+        response_id: item.responseId
+      }));
+    const hasMore = hasMoreHistory || messages.length < transcript.filter(item => item.id).length;
+    try {
+      localStorage.setItem(CACHE_KEY, JSON.stringify({
+        conversationId: conversationId,
+        version: version,
+        hasMore: hasMore,
+        messages: messages
+      }));
+    } catch (error) {
+      // Cota do localStorage esgotada - seguir sem cache
+      localStorage.removeItem(CACHE_KEY);
+    }
+  }
+
+  async function syncFromCache(cache) {
+    const lastId = cache.messages[cache.messages.length - 1].id;
+    const response = await fetch('/get_current_conversation/delta?since_id=' + lastId, {
+      headers: cache.version ? { 'If-None-Match': 'W/"' + cache.version + '"' } : {}
+    });
+
+    if (response.status === 304) {
+      hasMoreHistory = cache.hasMore;
+      appendItems(cache.messages.map(toItem));
+      return true;
+    }
+
+    const data = await response.json();
+    if (!data.success || data.conversation_id !== cache.conversationId || data.reset) {
+      return false;
+    }
+
+    hasMoreHistory = cache.hasMore;
+    appendItems(cache.messages.concat(data.messages).map(toItem));
+    writeTranscriptCache(data.conversation_id, data.version);
+    return true;
+  }
+
+  // Load current conversation on page load (apenas a página mais recente; as anteriores sob demanda)
+  async function loadCurrentConversation() {
+    try {
+      // Página mais recente embutida no HTML pelo servidor (sem requisição extra)
+      const initialBlock = document.getElementById('initial-conversation');
+      if (initialBlock) {
+        const initial = JSON.parse(initialBlock.textContent);
+        initialBlock.remove();
+        if (initial.messages.length > 0) {
+          hasMoreHistory = initial.has_more;
+          appendItems(initial.messages.map(toItem));
+          writeTranscriptCache(initial.conversation_id, initial.version);
+          return;
+        }
+      }
+
+      const cache = readTranscriptCache();
+      if (cache && cache.messages && cache.messages.length > 0 && await syncFromCache(cache)) {
+        return;
+      }
+
+      const data = await fetchPage(null);
+
+      if (data.success && data.messages.length > 0) {
+        hasMoreHistory = data.has_more;
+        appendItems(data.messages.map(toItem));
+        writeTranscriptCache(data.conversation_id, data.version);
+      } else {
+        // Show welcome message if no conversation exists
+        localStorage.removeItem(CACHE_KEY);
+        addMessage('Olá! Sou o SmartOps AI. Como posso ajudá-lo hoje?', 'ai');
+      }
+    } catch (error) {
+      console.error('Erro ao carregar conversa:', error);
+      addMessage('Olá! Sou o SmartOps AI. Como posso ajudá-lo hoje?', 'ai');
+    }
+  }
+
+  // Load conversation on page load
+  loadCurrentConversation();
+
+  // Removed loadConversationHistory() - no longer needed
+});
@@ -0,0 +1,129 @@
+"""
+Assets estáticos pré-compilados e pré-comprimidos.
+
+A página inicial, o CSS e o JavaScript são montados uma única vez (na subida do
+servidor), recebem um hash de conteúdo e já ficam guardados em memória nas versões
+identidade, gzip e brotli (quando o módulo brotli estiver instalado). Servir uma
+página passa a ser só escolher a variante certa e comparar o ETag.
+"""
+
+import gzip
+import hashlib
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from flask import Response, request
+
+# Cache longo para arquivos com hash no nome (o conteúdo nunca muda para a mesma URL)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# A página em si sempre revalida (o ETag forte torna a revalidação um 304 barato)
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+def available_encodings():
+    """Codificações suportadas neste processo, em ordem de preferência"""
+    return ('br', 'gzip') if brotli else ('gzip',)
+
+
+def choose_encoding(accept_encoding, encodings=None):
+    """Escolhe a melhor codificação aceita pelo cliente (ou None para identidade)"""
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+    for part in accept_encoding.split(','):
+        pieces = part.strip().split(';')
+        name = pieces[0].strip().lower()
+        quality = 1.0
+        for param in pieces[1:]:
+            param = param.strip()
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+
+    for encoding in encodings or available_encodings():
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+
+def compress(body, encoding, level=None):
+    """Comprime o corpo com a codificação indicada"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=11 if level is None else level)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=9 if level is None else level, mtime=0)
+    return body
+
+
+class StaticAsset:
+    """Um arquivo em memória com hash de conteúdo e variantes pré-comprimidas"""
+
+    def __init__(self, body, content_type, cache_control):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = {None: body}
+        for encoding in available_encodings():
+            self.variants[encoding] = compress(body, encoding)
+
+    def etag(self, encoding):
+        return self.digest if encoding is None else f"{self.digest}-{encoding}"
+
+    def to_response(self):
+        """Monta a resposta para a requisição atual (304 se o ETag bater)"""
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''), list(self.variants))
+        etag = self.etag(encoding)
+
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(self.variants[encoding], content_type=self.content_type)
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = self.cache_control
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+class AssetBundle:
+    """Conjunto de assets da página inicial, montado uma vez na subida do servidor"""
+
+    def __init__(self, static_folder, url_prefix='/assets'):
+        self.static_folder = static_folder
+        self.url_prefix = url_prefix
+        self.assets = {}
+        self.page = None
+        self.page_parts = None
+
+    def add_file(self, relative_path, content_type):
+        """Carrega um arquivo estático e o registra com o hash no nome. Retorna a URL"""
+        with open(os.path.join(self.static_folder, relative_path), 'rb') as f:
+            asset = StaticAsset(f.read(), content_type, IMMUTABLE_CACHE_CONTROL)
+
+        base, extension = os.path.splitext(os.path.basename(relative_path))
+        name = f"{base}.{asset.digest}{extension}"
+        self.assets[name] = asset
+        return f"{self.url_prefix}/{name}"
+
+    def set_page(self, html, split_marker='</body>'):
+        self.page = StaticAsset(html, 'text/html; charset=utf-8', REVALIDATE_CACHE_CONTROL)
+        # Partes da página antes/depois do marcador, para embutir dados por requisição
+        index = html.rindex(split_marker)
+        self.page_parts = (html[:index].encode('utf-8'), html[index:].encode('utf-8'))
+
+    def get(self, name):
+        return self.assets.get(name)
@@ -0,0 +1,178 @@
+"""
+Logging estruturado e não bloqueante.
+
+Os registros são montados na thread da requisição (com request id e prefixo do hash
+do usuário) e entregues a uma fila; uma thread de background formata em JSON e
+escreve no stdout. Assim o caminho quente nunca espera por syscalls de escrita.
+Amostragem e limite de taxa descartam registros antes de entrarem na fila.
+
+Configuração por ambiente:
+    LOG_LEVEL        nível mínimo (padrão INFO)
+    LOG_FORMAT       'json' (padrão) ou 'text'
+    LOG_SAMPLE_RATE  fração dos registros abaixo de WARNING que são mantidos (padrão 1.0)
+    LOG_RATE_LIMIT   máximo de registros por segundo abaixo de WARNING (0 = sem limite)
+    LOG_QUEUE_SIZE   tamanho máximo da fila (registros excedentes são descartados)
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+from flask import g, has_request_context
+
+LOGGER_NAME = 'chatbot'
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage()
+        }
+        for key in ('request_id', 'user'):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legível para desenvolvimento: evento seguido dos campos"""
+
+    def format(self, record):
+        fields = getattr(record, 'fields', None) or {}
+        extra = ' '.join(f"{key}={value}" for key, value in fields.items())
+        prefix = f"[{getattr(record, 'request_id', '-') or '-'}]"
+        return f"{self.formatTime(record)} {record.levelname} {prefix} {record.getMessage()} {extra}".rstrip()
+
+
+class RequestContextFilter(logging.Filter):
+    """Anexa o request id e o prefixo do hash do usuário da requisição atual"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.user = g.get('user_hash')
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Mantém apenas uma fração dos registros abaixo de WARNING"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket: no máximo `rate` registros por segundo abaixo de WARNING"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            self.dropped += 1
+            return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta (e conta) registros quando a fila está cheia"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._exception_formatter = logging.Formatter()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Resolve a mensagem e o traceback na thread de origem, mas mantém a
+        # exceção separada da mensagem (o QueueHandler padrão junta as duas)
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(stream=None):
+    """Configura o logger da aplicação e inicia a thread de escrita. Retorna o logger"""
+    logger = logging.getLogger(LOGGER_NAME)
+    if getattr(logger, '_structured_listener', None):
+        return logger
+
+    level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    log_format = os.environ.get('LOG_FORMAT', 'json')
+    sample_rate = float(os.environ.get('LOG_SAMPLE_RATE', '1.0'))
+    rate_limit = float(os.environ.get('LOG_RATE_LIMIT', '0'))
+    queue_size = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if log_format == 'json' else TextFormatter())
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+    if sample_rate < 1:
+        handler.addFilter(SamplingFilter(sample_rate))
+    if rate_limit > 0:
+        handler.addFilter(RateLimitFilter(rate_limit))
+
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    listener.start()
+    atexit.register(listener.stop)
+
+    def restart_after_fork():
+        # A thread de escrita não existe no processo filho e a fila pode ter ficado
+        # com o lock preso no momento do fork: recria as duas
+        fresh_queue = queue.Queue(maxsize=queue_size)
+        handler.queue = listener.queue = fresh_queue
+        listener._thread = None
+        listener.start()
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=restart_after_fork)
+
+    logger.setLevel(level)
+    logger.addHandler(handler)
+    logger.propagate = False
+    logger._structured_listener = listener
+    return logger
@@ -0,0 +1,142 @@
+"""
+Gerador de dados sintéticos em português para benchmarks e testes de carga.
+"""
+
+import hashlib
+import itertools
+import math
+import random
+import sqlite3
+import time
+import uuid
+
+SUBJECTS = [
+    'o servidor de arquivos', 'a VPN corporativa', 'o backup noturno', 'o cluster Kubernetes',
+    'a rotina de deploy', 'o banco de dados de produção', 'o Active Directory', 'o firewall',
+    'a fila de mensagens', 'o monitoramento do Zabbix', 'o certificado SSL', 'o pipeline de CI'
+]
+VERBS = [
+    'reiniciar', 'configurar', 'verificar', 'atualizar', 'migrar', 'monitorar',
+    'automatizar', 'documentar', 'restaurar', 'escalar'
+]
+QUESTION_TEMPLATES = [
+    'Como faço para {verb} {subject}?',
+    'Qual é o procedimento para {verb} {subject} sem indisponibilidade?',
+    'Preciso {verb} {subject} hoje, o que devo checar antes?',
+    'Por que não consigo {verb} {subject}?',
+    'Existe um script para {verb} {subject}?'
+]
+SENTENCES = [
+    'Antes de qualquer alteração, confirme que existe uma janela de manutenção aprovada.',
+    'Verifique os logs do serviço para identificar mensagens de erro recentes.',
+    'Execute o comando de status e confira se todos os nós estão saudáveis.',
+    'Caso o problema persista, abra um chamado com a equipe de infraestrutura.',
+    'Recomendo automatizar essa etapa com um playbook para evitar erros manuais.',
+    'Lembre-se de validar as permissões da conta de serviço utilizada.',
+    'Depois da mudança, acompanhe os indicadores de desempenho por pelo menos uma hora.',
+    'Documente o procedimento na base de conhecimento para consultas futuras.',
+    'Se houver dependências, notifique os responsáveis pelos sistemas afetados.',
+    'Uma alternativa é realizar a operação de forma gradual, servidor por servidor.'
+]
+HEADINGS = ['Passo a passo', 'Pré-requisitos', 'Observações importantes', 'Resumo', 'Próximos passos']
+
+
+def random_question(rng=random):
+    template = rng.choice(QUESTION_TEMPLATES)
+    return template.format(verb=rng.choice(VERBS), subject=rng.choice(SUBJECTS))
+
+
+def random_answer(rng=random, min_chars=200, max_chars=4000):
+    """Resposta em markdown com títulos, listas e parágrafos, com tamanho entre min_chars e max_chars"""
+    target = rng.randint(min_chars, max_chars)
+    parts = []
+    size = 0
+    while size < target:
+        block = rng.random()
+        if block < 0.2:
+            text = f"## {rng.choice(HEADINGS)}"
+        elif block < 0.5:
+            text = "\n".join(f"{i}. **{rng.choice(VERBS).capitalize()}**: {rng.choice(SENTENCES)}"
+                             for i in range(1, rng.randint(2, 5)))
+        else:
+            text = " ".join(rng.choice(SENTENCES) for _ in range(rng.randint(2, 5)))
+        parts.append(text)
+        size += len(text) + 2
+    return "\n\n".join(parts)[:max_chars]
+
+
+def lognormal_length(rng, median, sigma, minimum, maximum):
+    """Tamanho com distribuição log-normal (muitas mensagens curtas, cauda de mensagens longas)"""
+    return int(min(max(rng.lognormvariate(math.log(median), sigma), minimum), maximum))
+
+
+def random_user_message(rng=random, median_chars=90):
+    """Pergunta do usuário com tamanho realista: às vezes só a pergunta, às vezes com contexto"""
+    target = lognormal_length(rng, median_chars, 0.8, 15, 2000)
+    text = random_question(rng)
+    while len(text) < target:
+        text += ' ' + rng.choice(SENTENCES)
+    return text[:target] if len(text) > 2 * target else text
+
+
+def user_ip(index):
+    """IP sintético estável para o usuário de índice index"""
+    return f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+
+
+def activity_weights(users, exponent=0.8):
+    """Pesos acumulados da atividade por usuário (Zipf: o usuário 0 é o mais ativo)"""
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(users)))
+
+
+def populate_database(db_path, users, messages, rng=random, pool_size=4000, batch_size=20000):
+    """Insere diretamente no banco (já inicializado pelo DatabaseManager) `users` usuários,
+    cada um com sua conversa única, e `messages` mensagens alternando pergunta e resposta.
+
+    A atividade segue uma distribuição de Zipf (poucos usuários muito ativos) e os textos
+    vêm de um conjunto pré-gerado, o que permite gerar milhões de mensagens em minutos.
+    """
+    questions = [random_user_message(rng) for _ in range(pool_size)]
+    answers = []
+    for _ in range(pool_size):
+        length = lognormal_length(rng, 900, 0.7, 80, 8000)
+        answers.append(random_answer(rng, length, length))
+
+    started_at = time.time() - messages * 30
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('PRAGMA synchronous = OFF')
+
+        cursor.executemany('''
+            INSERT INTO users (ip_hash, total_messages) VALUES (?, 0)
+        ''', ((hashlib.sha256(user_ip(i).encode()).hexdigest(),) for i in range(users)))
+        cursor.execute('SELECT MIN(id) FROM users WHERE ip_hash = ?',
+                       (hashlib.sha256(user_ip(0).encode()).hexdigest(),))
+        first_user_id = cursor.fetchone()[0]
+
+        cursor.executemany('''
+            INSERT INTO conversations (user_id, session_id, title) VALUES (?, 'main_conversation', 'Conversa Principal')
+        ''', ((first_user_id + i,) for i in range(users)))
+        cursor.execute('SELECT id FROM conversations WHERE user_id >= ? ORDER BY user_id', (first_user_id,))
+        conversation_ids = [row[0] for row in cursor.fetchall()]
+
+        cum_weights = activity_weights(users)
+        pairs = messages // 2
+        counts = [0] * users
+        for start in range(0, pairs, batch_size // 2):
+            rows = []
+            owners = rng.choices(range(users), cum_weights=cum_weights, k=min(batch_size // 2, pairs - start))
+            for offset, owner in enumerate(owners):
+                timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(started_at + (start + offset) * 60))
+                conversation_id = conversation_ids[owner]
+                rows.append((conversation_id, 'user', rng.choice(questions), timestamp, None))
+                rows.append((conversation_id, 'ai', rng.choice(answers), timestamp, uuid.uuid4().hex))
+                counts[owner] += 2
+            cursor.executemany('''
+                INSERT INTO messages (conversation_id, message_type, content, timestamp, response_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+
+        cursor.executemany('UPDATE users SET total_messages = ? WHERE id = ?',
+                           ((count, first_user_id + i) for i, count in enumerate(counts)))
+        conn.commit()
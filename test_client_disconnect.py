@@ -0,0 +1,142 @@
+"""
+Script de teste para o cancelamento do agente quando o cliente desconecta
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from client_disconnect import ClientDisconnected, is_disconnected, run_cancellable
+from fake_langflow import FakeLangflow
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida a tempo"
+        time.sleep(0.02)
+
+def test_disconnect_detection():
+    """Testa a detecção no socket e o retorno imediato de run_cancellable"""
+
+    print("✂️ Testando detecção de desconexão...")
+
+    server, client = socket.socketpair()
+    try:
+        assert not is_disconnected(server)
+        # Dados pendentes (keep-alive) não são desconexão
+        client.sendall(b'GET')
+        assert not is_disconnected(server)
+        assert server.recv(3) == b'GET'
+        assert run_cancellable(lambda: 42, server, poll_interval=0.01) == 42
+
+        cancelled = []
+        client.close()
+        started = time.monotonic()
+        try:
+            run_cancellable(lambda: time.sleep(5), server, on_cancel=lambda: cancelled.append(True), poll_interval=0.01)
+            raise AssertionError("deveria ter levantado ClientDisconnected")
+        except ClientDisconnected:
+            pass
+        assert time.monotonic() - started < 1 and cancelled == [True]
+    finally:
+        server.close()
+        client.close()
+
+    # Sem socket (test client): chamada direta, exceções propagam
+    try:
+        run_cancellable(lambda: 1 / 0, None)
+        raise AssertionError("deveria ter levantado ZeroDivisionError")
+    except ZeroDivisionError:
+        pass
+
+    print("✅ Detecção de desconexão funcionando corretamente!")
+
+def test_cancel_on_client_abort():
+    """Fecha a conexão no meio de um /chat: o Langflow é cancelado, nada é gravado e a métrica conta"""
+
+    print("✂️ Testando cancelamento no servidor...")
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    fake = FakeLangflow(latency_ms=20000, latency_sigma=0, max_chars=300).start()
+    db_path = os.path.join(tmp_dir.name, 'cancel.db')
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), HOST='127.0.0.1', DATABASE_PATH=db_path,
+               LANGFLOW_URL=fake.url, LANGFLOW_CANCEL_PATH='/api/v1/runs/{run_id}/cancel',
+               APP_CONFIG='production', LOG_LEVEL='INFO', LOG_FORMAT='json',
+               RATE_LIMIT_ENABLED='0', NEAR_DUPLICATE_ENABLED='0', LANGFLOW_WARMUP_PROMPT='')
+    process = subprocess.Popen([sys.executable, 'app.py'], env=env,
+                               cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                requests.get(base_url + '/metrics', timeout=1)
+                break
+            except requests.exceptions.RequestException:
+                assert time.monotonic() < deadline and process.poll() is None, "servidor não subiu"
+                time.sleep(0.1)
+
+        body = json.dumps({'message': 'Gere o relatório completo', 'fresh': True}).encode('utf-8')
+        client = socket.create_connection(('127.0.0.1', port))
+        client.sendall(b'POST /chat HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                       + f'Content-Length: {len(body)}\r\n\r\n'.encode('ascii') + body)
+        wait_for(lambda: fake.in_flight == 1)
+
+        # O usuário fecha a aba: o agente para em segundos, não em 20
+        started = time.monotonic()
+        client.close()
+        wait_for(lambda: fake.cancelled == 1 and fake.in_flight == 0, timeout=5)
+        print(f"   cancelado em {(time.monotonic() - started) * 1000:.0f} ms")
+
+        metrics = requests.get(base_url + '/metrics', timeout=5).text
+        assert 'chat_cancelled_total{cancel_api="sent"} 1' in metrics
+        with sqlite3.connect(db_path) as conn:
+            saved = conn.execute("SELECT COUNT(*) FROM messages WHERE message_type = 'ai'").fetchone()[0]
+        assert saved == 0
+
+        # Langflow sem cancelamento: a chamada segue na thread auxiliar depois da desconexão e
+        # o gauge de chamadas em andamento só desce quando ela termina
+        fake.latency_ms = 1500
+        fake.cancel = lambda run_id: False
+        client = socket.create_connection(('127.0.0.1', port))
+        client.sendall(b'POST /chat HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+                       + f'Content-Length: {len(body)}\r\n\r\n'.encode('ascii') + body)
+        wait_for(lambda: fake.in_flight == 1)
+        client.close()
+        wait_for(lambda: 'chat_cancelled_total{cancel_api="failed"} 1' in
+                 requests.get(base_url + '/metrics', timeout=5).text)
+        assert 'langflow_requests_in_flight 1' in requests.get(base_url + '/metrics', timeout=5).text
+        wait_for(lambda: fake.in_flight == 0)
+        wait_for(lambda: 'langflow_requests_in_flight 0' in requests.get(base_url + '/metrics', timeout=5).text)
+
+        # O worker continua atendendo normalmente
+        fake.latency_ms = 0
+        response = requests.post(base_url + '/chat', json={'message': 'oi', 'fresh': True}, timeout=10)
+        assert response.status_code == 200 and response.json()['response_id']
+
+        print("✅ Cancelamento no servidor funcionando corretamente!")
+
+    finally:
+        process.kill()
+        process.wait()
+        fake.stop()
+        tmp_dir.cleanup()
+
+if __name__ == "__main__":
+    test_disconnect_detection()
+    test_cancel_on_client_abort()
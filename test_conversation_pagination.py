@@ -0,0 +1,82 @@
+"""
+Script de teste para a paginação do histórico da conversa única
+"""
+
+import os
+import tempfile
+
+def test_conversation_pagination():
+    """Testa a navegação por páginas usando before_id e a sincronização por delta"""
+    
+    import app as chatbot
+    from app import DatabaseManager
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_db = chatbot.db_manager
+        chatbot.db_manager = DatabaseManager(os.path.join(tmp_dir, 'pagination.db'))
+        try:
+            client = chatbot.app.test_client()
+            headers = {'X-Forwarded-For': '10.0.0.4'}
+            
+            user_id = chatbot.db_manager.get_user_id('10.0.0.4')
+            conversation_id = chatbot.db_manager.get_current_conversation_id(user_id)
+            for i in range(25):
+                chatbot.db_manager.save_message(conversation_id, 'user' if i % 2 == 0 else 'ai', f"Mensagem {i}")
+            
+            print("📄 Testando paginação do histórico...")
+            
+            collected = []
+            before_id = None
+            while True:
+                url = '/get_current_conversation?limit=10' + (f'&before_id={before_id}' if before_id else '')
+                data = client.get(url, headers=headers).get_json()
+                assert data['success']
+                collected = data['messages'] + collected
+                if not data['has_more']:
+                    break
+                before_id = data['messages'][0]['id']
+            
+            assert [m['content'] for m in collected] == [f"Mensagem {i}" for i in range(25)]
+            
+            # Sem limit, a rota devolve a conversa inteira (até MAX_PAGE_SIZE mensagens)
+            full = client.get('/get_current_conversation', headers=headers).get_json()
+            assert len(full['messages']) == 25 and full['has_more'] is False
+            
+            # Delta: só as mensagens novas, com ETag para revalidação
+            first_page = client.get('/get_current_conversation?limit=10', headers=headers).get_json()
+            version = first_page['version']
+            last_id = first_page['messages'][-1]['id']
+            
+            unchanged = client.get(f'/get_current_conversation/delta?since_id={last_id}',
+                                   headers={**headers, 'If-None-Match': f'W/"{version}"'})
+            assert unchanged.status_code == 304
+            
+            chatbot.db_manager.save_message(conversation_id, 'user', "Mensagem nova")
+            delta = client.get(f'/get_current_conversation/delta?since_id={last_id}',
+                               headers={**headers, 'If-None-Match': f'W/"{version}"'})
+            assert delta.status_code == 200
+            data = delta.get_json()
+            assert [m['content'] for m in data['messages']] == ["Mensagem nova"]
+            assert data['version'] != version and not data['reset']
+
+            # Parâmetros inválidos viram 400 (antes eram ignorados em silêncio ou viravam LIMIT negativo)
+            for url in ('/get_current_conversation?limit=abc',
+                        '/get_current_conversation?limit=-5',
+                        '/get_current_conversation?limit=0',
+                        '/get_current_conversation?limit=10&before_id=x',
+                        '/get_current_conversation/delta?since_id=-1',
+                        '/get_current_conversation/delta?since_id=1.5'):
+                bad = client.get(url, headers=headers)
+                assert bad.status_code == 400, url
+                assert bad.get_json()['success'] is False
+
+            # limit acima do máximo é limitado, não rejeitado
+            clamped = client.get('/get_current_conversation?limit=100000', headers=headers).get_json()
+            assert clamped['success'] and len(clamped['messages']) == 26
+
+            print("✅ Paginação do histórico funcionando corretamente!")
+        finally:
+            chatbot.db_manager = original_db
+
+if __name__ == "__main__":
+    test_conversation_pagination()
@@ -0,0 +1,102 @@
+"""
+Script de teste para os resumos hierárquicos da conversa única
+"""
+
+import os
+import tempfile
+
+def test_conversation_summaries():
+    """Testa a criação de resumos, a condensação em níveis e o contexto gerado"""
+    
+    from app import DatabaseManager, build_context_from_history
+    from conversation_summary import ExtractiveSummarizer, summarize_conversation, get_summary_context
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager = DatabaseManager(os.path.join(tmp_dir, 'summary.db'))
+        
+        user_id = db_manager.get_user_id("10.0.0.2")
+        conversation_id = db_manager.get_current_conversation_id(user_id)
+        for i in range(60):
+            db_manager.save_message(conversation_id, 'user', f"Como reinicio o servidor de banco número {i}?")
+            db_manager.save_message(conversation_id, 'ai', f"Para reiniciar o servidor {i}, use o painel de operações. Depois verifique os logs.")
+        
+        print("🗂️ Testando resumos hierárquicos...")
+        
+        # 120 mensagens - 12 recentes = 108 fora da janela -> 5 blocos de 20 mensagens
+        created = summarize_conversation(db_manager, conversation_id, ExtractiveSummarizer(),
+                                         every_turns=10, keep_recent=12, fanout=4)
+        assert created == 6  # 5 resumos de nível 0 + 1 de nível 1
+        
+        levels = sorted(s[1] for s in db_manager.get_active_summaries(conversation_id))
+        assert levels == [0, 1]
+        
+        # Execução repetida não cria resumos novos
+        assert summarize_conversation(db_manager, conversation_id, ExtractiveSummarizer()) == 0
+        
+        summary = get_summary_context(db_manager, conversation_id, max_chars=500)
+        assert summary and len(summary) <= 503
+        
+        recent = db_manager.get_recent_session_messages(conversation_id, limit=12)
+        context = build_context_from_history(recent, summary=summary)
+        assert context.startswith("🗂️ **Resumo da conversa até aqui:**")
+        assert "**Interação 1:**" in context
+        
+        # Dois workers com a mesma faixa pendente: o segundo a gravar não duplica o resumo
+        other_id = db_manager.get_user_id("10.0.0.3")
+        other_conversation = db_manager.get_current_conversation_id(other_id)
+        for i in range(16):
+            db_manager.save_message(other_conversation, 'user' if i % 2 == 0 else 'ai', f"Mensagem {i} sobre o backup")
+        extractive = ExtractiveSummarizer()
+        raced = []
+        
+        def racing_summarizer(texts, max_chars=600):
+            # Enquanto este worker resume, outro processa a mesma faixa e grava primeiro
+            if not raced:
+                raced.append(summarize_conversation(db_manager, other_conversation, extractive,
+                                                    every_turns=2, keep_recent=4, fanout=10))
+            return extractive(texts, max_chars)
+        
+        created = summarize_conversation(db_manager, other_conversation, racing_summarizer,
+                                         every_turns=2, keep_recent=4, fanout=10)
+        assert raced == [3] and created == 0
+        summaries = db_manager.get_active_summaries(other_conversation)
+        assert len(summaries) == 3 and len({s[2] for s in summaries}) == 3
+        
+        print("✅ Resumos da conversa funcionando corretamente!")
+
+def test_duplicate_summaries_migration():
+    """Testa a migração de um banco com resumos duplicados da mesma faixa (antes do índice único)"""
+    
+    import sqlite3
+    from app import DatabaseManager
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'legacy.db')
+        db_manager = DatabaseManager(path)
+        conversation_id = db_manager.get_current_conversation_id(db_manager.get_user_id("10.0.0.4"))
+        with sqlite3.connect(path) as conn:
+            conn.execute('DROP INDEX idx_summaries_range')
+            rows = [(conversation_id, 0, 1, 20, 'a'), (conversation_id, 0, 1, 20, 'a (duplicado)'),
+                    (conversation_id, 0, 21, 40, 'b'), (conversation_id, 1, 1, 40, 'a + b')]
+            conn.executemany('''
+                INSERT INTO conversation_summaries (conversation_id, level, start_message_id, end_message_id, content)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+            # O filho duplicado foi o condensado pelo resumo de nível 1
+            conn.execute('UPDATE conversation_summaries SET superseded_by = 4 WHERE id IN (2, 3)')
+            conn.execute('PRAGMA user_version = 7')
+        
+        print("🗂️ Testando migração de resumos duplicados...")
+        
+        db_manager = DatabaseManager(path)
+        with sqlite3.connect(path) as conn:
+            remaining = conn.execute('SELECT id, superseded_by FROM conversation_summaries ORDER BY id').fetchall()
+        assert remaining == [(1, 4), (3, 4), (4, None)]
+        assert [s[0] for s in db_manager.get_active_summaries(conversation_id)] == [4]
+        assert db_manager.save_summary(conversation_id, 0, 1, 20, 'de novo') is None
+        
+        print("✅ Migração de resumos duplicados funcionando corretamente!")
+
+if __name__ == "__main__":
+    test_conversation_summaries()
+    test_duplicate_summaries_migration()
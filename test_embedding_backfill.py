@@ -0,0 +1,69 @@
+"""
+Script de teste para o worker de backfill de embeddings
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+def test_embedding_backfill():
+    """Testa o processamento em lotes, o checkpoint e a retomada do backfill"""
+    
+    from app import EMBEDDING_MODEL, DatabaseManager, embed_texts
+    from embedding_backfill import EmbeddingBackfillWorker, CHECKPOINT_NAME
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager = DatabaseManager(os.path.join(tmp_dir, 'backfill.db'))
+        
+        user_id = db_manager.get_user_id("10.0.0.1")
+        conversation_id = db_manager.get_current_conversation_id(user_id)
+        for i in range(25):
+            db_manager.save_message(conversation_id, 'user', f"Pergunta número {i} sobre o servidor")
+        
+        print("🧮 Testando backfill de embeddings...")
+        
+        worker = EmbeddingBackfillWorker(db_manager, embed_texts, EMBEDDING_MODEL, batch_size=10, pause=0)
+        assert worker.run() == 25
+        assert db_manager.get_checkpoint(CHECKPOINT_NAME) == 25
+        
+        vector = db_manager.get_message_embedding(1)
+        assert vector is not None
+        assert abs(sum(v * v for v in vector) - 1.0) < 1e-3
+        
+        # Retomar a partir do checkpoint processa apenas as mensagens novas
+        for i in range(5):
+            db_manager.save_message(conversation_id, 'ai', f"Resposta {i}")
+        
+        worker = EmbeddingBackfillWorker(db_manager, embed_texts, EMBEDDING_MODEL, batch_size=10, pause=0)
+        assert worker.run() == 5
+        assert db_manager.get_checkpoint(CHECKPOINT_NAME) == 30
+        
+        # Falha no embedder: o lote é registrado no log, tentado de novo e o worker continua
+        for i in range(5):
+            db_manager.save_message(conversation_id, 'user', f"Pergunta extra {i}")
+        calls = []
+        
+        def flaky_embed(texts):
+            calls.append(len(texts))
+            if len(calls) == 1:
+                raise ConnectionError("endpoint de embeddings fora do ar")
+            return embed_texts(texts)
+        
+        worker = EmbeddingBackfillWorker(db_manager, flaky_embed, EMBEDDING_MODEL, batch_size=10, pause=0,
+                                         max_backoff=0.01)
+        assert worker.run() == 5
+        assert calls == [5, 5]
+        assert db_manager.get_checkpoint(CHECKPOINT_NAME) == 35
+        
+        print("✅ Backfill de embeddings funcionando corretamente!")
+
+def test_embedding_backfill_does_not_import_app():
+    """Importar o worker não carrega o app (com `python app.py`, seria uma segunda cópia do módulo)"""
+    
+    code = "import sys, embedding_backfill; assert 'app' not in sys.modules"
+    subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+if __name__ == "__main__":
+    test_embedding_backfill()
+    test_embedding_backfill_does_not_import_app()
@@ -0,0 +1,35 @@
+"""
+Script de teste para o Langflow falso usado nos testes de carga
+"""
+
+import requests
+
+def test_fake_langflow():
+    """Testa se a resposta do Langflow falso é interpretada como a do Langflow real"""
+
+    from app import extract_clean_response
+    from fake_langflow import FakeLangflow
+
+    print("🤖 Testando Langflow falso...")
+
+    fake = FakeLangflow(latency_ms=0, min_chars=300, max_chars=300, seed=3).start()
+    failing = FakeLangflow(latency_ms=0, error_rate=1.0, pool_size=1).start()
+    try:
+        response = requests.post(f"{fake.url}/api/v1/run/fluxo", json={"input_value": "oi"}, timeout=5)
+        assert response.status_code == 200
+        text = extract_clean_response(response.json())
+        assert len(text) == 300 and not text.startswith('Desculpe')
+
+        assert requests.get(f"{fake.url}/health", timeout=5).json() == {"status": "ok"}
+
+        response = requests.post(f"{failing.url}/api/v1/run/fluxo", json={}, timeout=5)
+        assert response.status_code == 500
+        assert failing.requests == 1 and failing.errors == 1
+    finally:
+        fake.stop()
+        failing.stop()
+
+    print("✅ Langflow falso funcionando corretamente!")
+
+if __name__ == "__main__":
+    test_fake_langflow()
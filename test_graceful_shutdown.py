@@ -0,0 +1,136 @@
+"""
+Script de teste para o desligamento gracioso (SIGTERM com conversas em andamento)
+"""
+
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from fake_langflow import FakeLangflow
+from graceful_shutdown import GracefulShutdown
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_drain_rejects_new_chats():
+    """Testa o 503 durante a drenagem e a ordem das rotinas de encerramento"""
+
+    import app as chatbot
+
+    print("🛑 Testando drenagem...")
+
+    shutdown = GracefulShutdown(drain_timeout=1, endpoints=('chatbot.chat',))
+    calls = []
+    shutdown.register(lambda: calls.append('checkpoint'))
+    shutdown.register(lambda: calls.append('flush'), first=True)
+
+    original = chatbot.graceful_shutdown.draining
+    chatbot.graceful_shutdown.draining = shutdown.draining
+    try:
+        assert shutdown.shutdown(timeout=0) == 0
+        assert calls == ['flush', 'checkpoint']
+        assert shutdown.shutdown() == 0 and calls == ['flush', 'checkpoint']
+
+        response = chatbot.app.test_client().post('/chat', json={'message': 'oi'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After']
+    finally:
+        chatbot.graceful_shutdown.draining = original
+
+    print("✅ Drenagem funcionando corretamente!")
+
+def test_sigterm_under_load():
+    """Envia SIGTERM com /chat em andamento: as respostas chegam, são gravadas e o processo sai limpo"""
+
+    print("🛑 Testando SIGTERM sob carga...")
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    fake = FakeLangflow(latency_ms=1500, latency_sigma=0, max_chars=500).start()
+    db_path = os.path.join(tmp_dir.name, 'shutdown.db')
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), HOST='127.0.0.1', DATABASE_PATH=db_path,
+               LANGFLOW_URL=fake.url, APP_CONFIG='production', LOG_LEVEL='INFO', LOG_FORMAT='json',
+               RATE_LIMIT_ENABLED='0', NEAR_DUPLICATE_ENABLED='0', LANGFLOW_WARMUP_PROMPT='')
+    process = subprocess.Popen([sys.executable, 'app.py'], env=env,
+                               cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 20
+        while True:
+            try:
+                requests.get(base_url + '/metrics', timeout=1)
+                break
+            except requests.exceptions.RequestException:
+                assert time.monotonic() < deadline and process.poll() is None, "servidor não subiu"
+                time.sleep(0.1)
+
+        results = {}
+
+        def send(index):
+            response = requests.post(base_url + '/chat', timeout=30,
+                                     json={'message': f'Pergunta longa número {index}', 'fresh': True},
+                                     headers={'X-Forwarded-For': f'10.9.0.{index}'})
+            results[index] = (response.status_code, response.json())
+
+        threads = [threading.Thread(target=send, args=(i,)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        while fake.requests < 3:
+            time.sleep(0.02)
+
+        # Todas as chamadas estão esperando o Langflow
+        process.send_signal(signal.SIGTERM)
+        time.sleep(0.2)
+        try:
+            late = requests.post(base_url + '/chat', json={'message': 'atrasada'}, timeout=10).status_code
+        except requests.exceptions.RequestException:
+            late = None
+        assert late in (None, 503)
+
+        for thread in threads:
+            thread.join()
+        output, _ = process.communicate(timeout=20)
+        assert process.returncode == 0, output
+
+        assert len(results) == 3
+        for status, data in results.values():
+            assert status == 200 and not data['response'].startswith('Erro'), data
+
+        # O checkpoint do desligamento deixa o WAL vazio (tudo já está no arquivo principal)
+        wal_path = db_path + '-wal'
+        assert not os.path.exists(wal_path) or os.path.getsize(wal_path) == 0
+
+        with sqlite3.connect(db_path) as conn:
+            assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+            saved = conn.execute("SELECT COUNT(*) FROM messages WHERE message_type = 'ai'").fetchone()[0]
+        assert saved == 3
+
+        events = [json.loads(line) for line in output.splitlines() if line.startswith('{')]
+        shutdown = [event for event in events if event.get('event') == 'shutdown']
+        assert shutdown and shutdown[0]['in_flight'] == 3 and shutdown[0]['abandoned'] == 0
+
+        print("✅ SIGTERM sob carga funcionando corretamente!")
+
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        fake.stop()
+        tmp_dir.cleanup()
+
+if __name__ == "__main__":
+    test_drain_rejects_new_chats()
+    test_sigterm_under_load()
@@ -0,0 +1,120 @@
+"""
+Script de teste para as chaves de idempotência do /chat
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from fake_langflow import FakeLangflow
+
+
+def count_messages(path, message_type):
+    with sqlite3.connect(path) as conn:
+        return conn.execute('SELECT COUNT(*) FROM messages WHERE message_type = ?', (message_type,)).fetchone()[0]
+
+def test_idempotent_chat():
+    """Testa reenvio com a mesma chave: mesma resposta, sem nova chamada ao agente e sem linhas duplicadas"""
+
+    import app as chatbot
+
+    print("🔁 Testando chaves de idempotência...")
+
+    tmp_dir = tempfile.mkdtemp()
+    fake = FakeLangflow(latency_ms=0, max_chars=300).start()
+    limiter = chatbot.rate_limiter
+    original = (chatbot.db_manager, chatbot.LANGFLOW_URL, limiter.limits)
+    limiter.limits = {'chat': (1e9, 1e9), 'read': (1e9, 1e9)}
+    try:
+        db_path = os.path.join(tmp_dir, 'test.db')
+        chatbot.db_manager = chatbot.DatabaseManager(db_path)
+        chatbot.LANGFLOW_URL = fake.url
+        client = chatbot.app.test_client()
+        user = {'X-Forwarded-For': '10.1.0.1'}
+        payload = {'message': 'Como reinicio o serviço de filas?', 'fresh': True}
+
+        first = client.post('/chat', json=payload, headers=dict(user, **{'Idempotency-Key': 'key-00000001'}))
+        again = client.post('/chat', json=payload, headers=dict(user, **{'Idempotency-Key': 'key-00000001'}))
+        assert first.status_code == again.status_code == 200
+        assert again.headers['Idempotent-Replayed'] == 'true'
+        assert again.get_json()['response_id'] == first.get_json()['response_id']
+        assert again.get_json()['response'] == first.get_json()['response']
+        assert fake.requests == 1
+        assert count_messages(db_path, 'user') == count_messages(db_path, 'ai') == 1
+
+        # Mesma chave com outra mensagem; chave inválida; a chave é por usuário
+        other_message = dict(payload, message='Outra pergunta')
+        assert client.post('/chat', json=other_message, headers=dict(user, **{'Idempotency-Key': 'key-00000001'})).status_code == 422
+        assert client.post('/chat', json=payload, headers=dict(user, **{'Idempotency-Key': 'x y'})).status_code == 400
+        other_user = {'X-Forwarded-For': '10.1.0.2', 'Idempotency-Key': 'key-00000001'}
+        assert 'Idempotent-Replayed' not in client.post('/chat', json=payload, headers=other_user).headers
+        assert fake.requests == 2
+
+        # Reenvio enquanto a execução original ainda espera o agente: a espera curta basta e repete o resultado
+        fake.latency_ms, fake.latency_sigma = 600, 0
+        results = {}
+
+        def send(name):
+            headers = dict(user, **{'Idempotency-Key': 'key-00000002'})
+            results[name] = chatbot.app.test_client().post('/chat', json=dict(payload, message='Demorada'), headers=headers)
+
+        original_thread = threading.Thread(target=send, args=('original',))
+        original_thread.start()
+        while fake.requests < 3:
+            time.sleep(0.01)
+        send('retry')
+        original_thread.join()
+        assert results['retry'].headers['Idempotent-Replayed'] == 'true'
+        assert results['retry'].get_json()['response_id'] == results['original'].get_json()['response_id']
+        assert fake.requests == 3
+        assert chatbot.CHAT_REPLAYS.value(result='completed') >= 2
+
+        # Execução original mais demorada que a espera curta: 409 imediato com Retry-After, sem prender o worker
+        original_wait = chatbot.IDEMPOTENCY_WAIT_SECONDS
+        chatbot.IDEMPOTENCY_WAIT_SECONDS = 0
+        slow = dict(payload, message='Mais demorada')
+        slow_headers = dict(user, **{'Idempotency-Key': 'key-00000004'})
+        try:
+            original_thread = threading.Thread(
+                target=lambda: results.update(slow=chatbot.app.test_client().post('/chat', json=slow, headers=slow_headers)))
+            original_thread.start()
+            while fake.requests < 4:
+                time.sleep(0.01)
+            started = time.monotonic()
+            pending = client.post('/chat', json=slow, headers=slow_headers)
+            assert pending.status_code == 409 and pending.headers['Retry-After']
+            assert time.monotonic() - started < 0.5
+            original_thread.join()
+            # O front end repete depois do Retry-After e recebe o resultado gravado
+            replayed = client.post('/chat', json=slow, headers=slow_headers)
+            assert replayed.headers['Idempotent-Replayed'] == 'true'
+            assert replayed.get_json()['response_id'] == results['slow'].get_json()['response_id']
+            assert fake.requests == 4
+        finally:
+            chatbot.IDEMPOTENCY_WAIT_SECONDS = original_wait
+
+        # Execução que falhou: o reenvio chama o agente de novo, sem gravar a pergunta outra vez
+        fake.latency_ms, fake.error_rate = 0, 1.0
+        users_before = count_messages(db_path, 'user')
+        headers = dict(user, **{'Idempotency-Key': 'key-00000003'})
+        failed = client.post('/chat', json=dict(payload, message='Instável'), headers=headers)
+        assert 'Erro' in failed.get_json()['response']
+        fake.error_rate = 0.0
+        retried = client.post('/chat', json=dict(payload, message='Instável'), headers=headers)
+        assert 'Idempotent-Replayed' not in retried.headers
+        assert 'Erro' not in retried.get_json()['response']
+        assert fake.requests == 6
+        assert count_messages(db_path, 'user') == users_before + 1
+
+        print("✅ Chaves de idempotência funcionando corretamente!")
+
+    finally:
+        chatbot.db_manager, chatbot.LANGFLOW_URL, limiter.limits = original
+        fake.stop()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_idempotent_chat()
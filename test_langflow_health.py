@@ -0,0 +1,116 @@
+"""
+Script de teste para o aquecimento e a sonda de saúde do Langflow
+"""
+
+import time
+
+import requests
+
+from fake_langflow import FakeLangflow
+from langflow_health import LangflowMonitor
+from metrics import MetricsRegistry
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condição não atingida a tempo"
+        time.sleep(0.02)
+
+def test_warm_up_and_probe():
+    """Testa validação do flow, conexões abertas, prompt de aquecimento e a sonda periódica"""
+
+    print("🌡️ Testando aquecimento do Langflow...")
+
+    fake = FakeLangflow(latency_ms=300, latency_sigma=0, max_chars=300, flow_ids={'flow-ok'}).start()
+    gauge = MetricsRegistry().gauge('langflow_up', 'teste')
+    monitor = LangflowMonitor(fake.url, 'flow-ok', warmup_prompt='Olá', warm_connections=3,
+                              probe_interval=0.1, gauge=gauge)
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=4)
+    session.mount('http://', adapter)
+    try:
+        assert monitor.state == 'starting' and not monitor.ready
+        monitor.start(session)
+        # Enquanto o prompt de aquecimento roda, ainda não está pronto
+        wait_for(lambda: fake.in_flight == 1)
+        assert monitor.state == 'warming' and not monitor.ready
+        wait_for(lambda: monitor.ready)
+        assert fake.requests == 1 and monitor.flow_valid is True
+        assert len(adapter.poolmanager.connection_from_url(fake.url).pool.queue) >= 1
+        assert gauge.value() == 1
+
+        # Sondas periódicas não executam o flow de novo
+        time.sleep(0.3)
+        assert fake.requests == 1 and monitor.status()['latency_ms'] is not None
+
+        # Langflow fora do ar: offline e, quando voltar, aquece de novo
+        fake.stop()
+        # As conexões keep-alive ainda seriam atendidas pelas threads do servidor falso
+        adapter.poolmanager.clear()
+        wait_for(lambda: monitor.state == 'offline')
+        assert gauge.value() == 0 and not monitor.warm
+    finally:
+        monitor.stop(timeout=2)
+        fake.server.server_close()
+
+    # flow_id inexistente nunca fica pronto
+    fake = FakeLangflow(latency_ms=0, flow_ids={'flow-ok'}).start()
+    monitor = LangflowMonitor(fake.url, 'flow-errado', warmup_prompt='Olá', probe_interval=0.1)
+    try:
+        monitor._session = requests.Session()
+        assert monitor.warm_up() is False
+        assert monitor.state == 'invalid_flow' and monitor.flow_valid is False
+        assert fake.requests == 0
+    finally:
+        fake.stop()
+
+    print("✅ Aquecimento do Langflow funcionando corretamente!")
+
+def test_ready_route():
+    """Testa a rota /ready: 503 até o Langflow ficar pronto e durante a drenagem"""
+
+    import app as chatbot
+
+    print("🌡️ Testando rota /ready...")
+
+    client = chatbot.app.test_client()
+    monitor = chatbot.langflow_monitor
+    start = chatbot.start_langflow_monitor
+    # Langflow falso no lugar do LANGFLOW_URL configurado (o teste não depende de um Langflow real)
+    fake = FakeLangflow(latency_ms=0, max_chars=300).start()
+    base_url = monitor.base_url
+    try:
+        # O primeiro health check inicia o aquecimento se nenhum hook do servidor iniciou
+        monitor.stop(timeout=5)
+        monitor.base_url = fake.url
+        response = client.get('/ready')
+        assert response.status_code == 503 and monitor.running
+        wait_for(lambda: monitor.ready)
+        assert client.get('/ready').status_code == 200
+
+        # Sem a thread de sondas mexendo no estado durante o resto do teste
+        monitor.stop(timeout=5)
+        chatbot.start_langflow_monitor = lambda flask_app=None: None
+        monitor.state = 'warming'
+        response = client.get('/ready')
+        assert response.status_code == 503 and response.get_json()['state'] == 'warming'
+
+        monitor.state = 'ready'
+        assert client.get('/ready').status_code == 200
+
+        chatbot.graceful_shutdown.draining.set()
+        response = client.get('/ready')
+        assert response.status_code == 503 and response.get_json()['state'] == 'draining'
+    finally:
+        chatbot.graceful_shutdown.draining.clear()
+        chatbot.start_langflow_monitor = start
+        monitor.stop(timeout=5)
+        monitor.base_url = base_url
+        fake.stop()
+
+    print("✅ Rota /ready funcionando corretamente!")
+
+if __name__ == "__main__":
+    test_warm_up_and_probe()
+    test_ready_route()
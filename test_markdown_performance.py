@@ -0,0 +1,27 @@
+"""
+Script de teste para o gate de desempenho da renderização de markdown
+"""
+
+def test_markdown_performance():
+    """Renderiza o corpus realista e adversarial e falha em tempo excessivo ou crescimento superlinear"""
+
+    from app import format_markdown_to_html, markdown_to_html
+    from benchmark_markdown import check, run
+
+    print("⏱️ Testando desempenho da renderização de markdown...")
+
+    results = run(format_markdown_to_html, [8, 32])
+    for result in results:
+        print(f"   {result['case']:24} {result['ms_per_kb']:.3f} ms/KB  n^{result['growth_exponent']}")
+
+    failures = check(results)
+    assert not failures, "\n".join(failures)
+
+    # A correção dos links não pode quebrar os links válidos
+    html = markdown_to_html('Veja [o guia](https://wiki.exemplo.com.br/a?b=1) agora')
+    assert '<a href="https://wiki.exemplo.com.br/a?b=1" target="_blank">o guia</a>' in html
+
+    print("✅ Renderização dentro do orçamento!")
+
+if __name__ == "__main__":
+    test_markdown_performance()
@@ -2,21 +2,25 @@
 Script de teste para verificar o sistema de memória do chatbot baseado em IP
 """
 
-import sqlite3
 import hashlib
 from datetime import datetime
 
 def test_memory_system():
     """Testa o sistema de memória do chatbot"""
     
-    # Conectar ao banco de dados
-    DATABASE = 'chatbot_memory.db'
+    # Conectar ao banco de dados (pela conexão do app: o conteúdo pode estar comprimido)
+    from app import DATABASE, DatabaseManager
+    db_manager = DatabaseManager(DATABASE)
     
     # Simular IP de teste
     test_ip = "192.168.1.100"
     ip_hash = hashlib.sha256(test_ip.encode()).hexdigest()
     
-    with sqlite3.connect(DATABASE) as conn:
+    # Resposta longa o bastante para ser gravada comprimida
+    conversation_id = db_manager.get_current_conversation_id(db_manager.get_user_id(test_ip))
+    db_manager.save_message(conversation_id, 'ai', "Resposta de teste da memória por IP. " * 100)
+    
+    with db_manager._connect() as conn:
         cursor = conn.cursor()
         
         print("🔍 Testando sistema de memória por IP...")
@@ -42,7 +46,7 @@ def test_memory_system():
         if msg_count > 0:
             print("\n📋 Últimas 5 mensagens no banco:")
             cursor.execute('''
-                SELECT m.message_type, m.content, m.timestamp, u.ip_hash
+                SELECT m.message_type, message_content(m.content, m.content_codec), m.timestamp, u.ip_hash
                 FROM messages m
                 JOIN conversations c ON m.conversation_id = c.id
                 JOIN users u ON c.user_id = u.id
@@ -52,6 +56,7 @@ def test_memory_system():
             
             messages = cursor.fetchall()
             for i, (msg_type, content, timestamp, user_hash) in enumerate(messages, 1):
+                assert isinstance(content, str)
                 role = "👤 Usuário" if msg_type == "user" else "🤖 IA"
                 content_preview = content[:100] + "..." if len(content) > 100 else content
                 print(f"  {i}. {role}: {content_preview}")
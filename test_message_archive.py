@@ -0,0 +1,134 @@
+"""
+Script de teste para o arquivamento do histórico antigo em segmentos comprimidos
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+def test_message_archive():
+    """Testa o arquivamento, as leituras que cruzam a borda tabela/arquivo e a repetição do job"""
+
+    from app import DatabaseManager
+    from archive_worker import ArchiveWorker
+    from message_archive import decode_rows, encode_rows
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'archive.db')
+        db_manager = DatabaseManager(db_path)
+
+        user_id = db_manager.get_user_id("10.0.0.9")
+        conversation_id = db_manager.get_current_conversation_id(user_id)
+        for i in range(60):
+            if i % 2 == 0:
+                db_manager.save_message(conversation_id, 'user', f"Pergunta {i} sobre o servidor de arquivos")
+            else:
+                db_manager.save_message(conversation_id, 'ai', f"Resposta {i} com detalhes", response_id=f"resp-{i}")
+
+        # As 50 primeiras ficam com 90 dias; as 10 últimas continuam recentes
+        with db_manager._connect() as conn:
+            conn.execute("UPDATE messages SET timestamp = datetime('now', '-90 days') WHERE id <= 50")
+
+        def all_pages(limit):
+            pages, before_id = [], None
+            while True:
+                messages, has_more = db_manager.get_conversation_messages_page(conversation_id, before_id, limit)
+                pages.append((messages, has_more))
+                if not has_more:
+                    return pages
+                before_id = messages[0][0]
+
+        pages_before = all_pages(7)
+        full_before = db_manager.get_conversation_messages(conversation_id, user_id)
+        since_before = db_manager.get_messages_since(conversation_id, 5, limit=100)
+        answer_before = db_manager.get_response_with_question("resp-3")
+        search_before = db_manager.search_conversations(user_id, "Pergunta 2")
+        wide_search_before = db_manager.search_conversations(user_id, "sobre o servidor")
+        version_before = db_manager.get_conversation_version(conversation_id)
+
+        print("🧊 Testando arquivamento do histórico antigo...")
+
+        worker = ArchiveWorker(db_manager, older_than_days=30, keep_recent=15, block_size=20,
+                               summarized_only=False, pause=0)
+        # Prefixo arquivável: as 50 antigas menos as que caem nas 15 mais recentes -> ids 1 a 45
+        assert worker.run() == 45
+        assert worker.blocks == 3
+
+        with db_manager._connect() as conn:
+            hot = conn.execute('SELECT COUNT(*), MIN(id) FROM messages').fetchone()
+        assert hot == (15, 46)
+        segments = os.listdir(os.path.join(tmp_dir, 'archive_archive'))
+        assert len(segments) == 1 and segments[0].endswith('.seg')
+
+        # Leituras iguais às de antes do arquivamento
+        assert all_pages(7) == pages_before
+        assert db_manager.get_conversation_messages(conversation_id, user_id) == full_before
+        assert db_manager.get_messages_since(conversation_id, 5, limit=100) == since_before
+        assert db_manager.get_messages_since(conversation_id, 5, limit=10) == since_before[:11]
+        assert db_manager.get_message_by_response_id("resp-3") == "Resposta 3 com detalhes"
+        assert db_manager.get_response_with_question("resp-3") == answer_before
+        # Resposta quente cuja pergunta foi para o arquivo
+        assert db_manager.get_response_with_question("resp-45") == (
+            "Resposta 45 com detalhes", "Pergunta 44 sobre o servidor de arquivos")
+
+        # A busca também percorre os blocos arquivados; a versão muda com o arquivamento (ETag)
+        assert sorted(db_manager.search_conversations(user_id, "Pergunta 2")) == sorted(search_before)
+        assert sorted(db_manager.search_conversations(user_id, "sobre o servidor")) == sorted(wide_search_before)
+        assert len(wide_search_before) == 30
+        assert len(db_manager.search_conversations(user_id, "sobre o servidor", limit=20)) == 20
+        assert db_manager.search_conversations(user_id, "PERGUNTA 4_ sobre") != []
+        assert db_manager.search_conversations(user_id, "Pergunta 2%detalhes") == []
+        assert db_manager.get_conversation_version(conversation_id) != version_before
+
+        # Leituras com limite só descomprimem os blocos de que precisam (os mais novos primeiro)
+        reads = []
+        read_block = db_manager.archive.read
+        db_manager.archive.read = lambda *block: reads.append(block) or read_block(*block)
+        assert db_manager.get_conversation_messages(conversation_id, user_id, limit=20) == full_before[-20:]
+        assert len(reads) == 1
+        reads.clear()
+        assert db_manager.get_conversation_messages(conversation_id, user_id, limit=25) == full_before[-25:]
+        assert len(reads) == 2
+        reads.clear()
+        assert db_manager.get_response_with_question("resp-45")[1] == "Pergunta 44 sobre o servidor de arquivos"
+        assert len(reads) == 1
+        del db_manager.archive.read
+
+        conversations = db_manager.get_user_conversations(user_id)
+        assert conversations[0][5] == 60
+
+        # Passada repetida: nada novo a arquivar
+        assert ArchiveWorker(db_manager, older_than_days=30, keep_recent=15, summarized_only=False,
+                             pause=0).run() == 0
+
+        # Outro arquivador que leu as mesmas linhas antes: o índice não é alterado
+        rows = db_manager.get_archivable_messages(conversation_id, 30 * 86400, 5, 2 ** 63 - 1)
+        assert [row[0] for row in rows] == [46, 47, 48, 49, 50]
+        location = db_manager.archive.append(conversation_id, rows)
+        assert db_manager.archive_message_block(conversation_id, rows, location)
+        assert not db_manager.archive_message_block(conversation_id, rows, location)
+        assert all_pages(7) == pages_before
+
+        # Os cabeçalhos dos segmentos permitem reconstruir o índice
+        blocks = list(db_manager.archive.iter_blocks(segments[0]))
+        assert [(block[1], block[2]) for block in blocks] == [(1, 20), (21, 40), (41, 45), (46, 50)]
+
+        # Compressão: o bloco ocupa menos que o JSON original
+        texts = [(i, 'ai', "Resposta longa e repetitiva sobre o servidor " * 20, '2024-01-01', None)
+                 for i in range(50)]
+        data = encode_rows(texts)
+        assert len(data) * 10 < sum(len(row[2]) for row in texts)
+        assert decode_rows(data) == texts
+
+        print("✅ Arquivamento do histórico funcionando corretamente!")
+
+def test_archive_worker_does_not_import_app():
+    """Importar o worker não carrega o app (com `python app.py`, seria uma segunda cópia do módulo)"""
+
+    code = "import sys, archive_worker; assert 'app' not in sys.modules"
+    subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+if __name__ == "__main__":
+    test_message_archive()
+    test_archive_worker_does_not_import_app()
@@ -0,0 +1,108 @@
+"""
+Script de teste para a compressão transparente do conteúdo das mensagens
+"""
+
+import os
+import sqlite3
+import tempfile
+
+def test_message_codec():
+    """Testa a gravação comprimida, as leituras, a busca e as linhas antigas em texto puro"""
+
+    from app import DatabaseManager
+    from message_codec import compress_existing
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'codec.db')
+        db_manager = DatabaseManager(db_path)
+
+        user_id = db_manager.get_user_id("10.0.0.12")
+        conversation_id = db_manager.get_current_conversation_id(user_id)
+        answer = "## Backup\n\nConfigure o **agendador** para copiar os arquivos do servidor. " * 40
+
+        print("🗜️ Testando compressão do conteúdo das mensagens...")
+
+        db_manager.save_message(conversation_id, 'user', "Como configurar o backup?")
+        db_manager.save_message(conversation_id, 'ai', answer, response_id="resp-codec")
+
+        with db_manager._connect() as conn:
+            stored = conn.execute('SELECT content, content_codec FROM messages ORDER BY id').fetchall()
+        # Pergunta curta fica em texto; a resposta grande vira BLOB comprimido
+        assert stored[0] == ("Como configurar o backup?", None)
+        assert stored[1][1] == 'zlib' and isinstance(stored[1][0], bytes)
+        assert len(stored[1][0]) * 5 < len(answer.encode('utf-8'))
+
+        # Todas as leituras devolvem o texto original
+        assert db_manager.get_message_by_response_id("resp-codec") == answer
+        assert db_manager.get_response_with_question("resp-codec") == (answer, "Como configurar o backup?")
+        assert answer in [row[1] for row in db_manager.get_recent_session_messages(conversation_id)]
+        messages, _ = db_manager.get_conversation_messages_page(conversation_id)
+        assert messages[-1][2] == answer
+        assert db_manager.get_conversation_messages(conversation_id, user_id)[-1][1] == answer
+
+        # A busca por texto enxerga o conteúdo comprimido
+        results = db_manager.search_conversations(user_id, 'agendador')
+        assert len(results) == 1 and 'agendador' in results[0][5]
+        # Mensagens em texto puro são comparadas sem passar pela função de descompressão
+        decoded = []
+        def counting_decode(value, codec):
+            decoded.append(codec)
+            return db_manager.content_codec.decode(value, codec)
+        db_manager._connect().create_function('message_content', 2, counting_decode, deterministic=True)
+        assert db_manager.search_conversations(user_id, 'configurar o backup')[0][5] == "Como configurar o backup?"
+        assert decoded.count(None) == 1 and decoded.count('zlib') == 1
+        # A lista de conversas só descomprime a primeira pergunta, não todas as do usuário
+        db_manager.save_message(conversation_id, 'user', "Quero detalhes do agendador de backup. " * 40)
+        decoded.clear()
+        assert db_manager.get_user_conversations(user_id)[0][6] == "Como configurar o backup?"
+        assert decoded == [None]
+        db_manager._connect().create_function('message_content', 2, db_manager.content_codec.decode,
+                                              deterministic=True)
+
+        # Linha antiga em texto puro (gravada antes da compressão) continua legível e pode ser comprimida
+        with db_manager._connect() as conn:
+            conn.execute('''
+                INSERT INTO messages (conversation_id, message_type, content, response_id)
+                VALUES (?, 'ai', ?, 'resp-old')
+            ''', (conversation_id, answer))
+        assert db_manager.get_message_by_response_id("resp-old") == answer
+        assert compress_existing(db_manager, pause=0) == 1
+        assert compress_existing(db_manager, pause=0) == 0
+        assert db_manager.get_message_by_response_id("resp-old") == answer
+
+        print("✅ Compressão do conteúdo funcionando corretamente!")
+
+def test_message_codec_migration():
+    """Testa a migração de um banco criado antes da coluna content_codec"""
+
+    from app import DatabaseManager
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'old.db')
+        with sqlite3.connect(db_path) as conn:
+            conn.execute('''
+                CREATE TABLE messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    conversation_id INTEGER,
+                    message_type TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    response_id TEXT UNIQUE
+                )
+            ''')
+            conn.execute("INSERT INTO messages (conversation_id, message_type, content, response_id) "
+                         "VALUES (1, 'ai', 'Resposta antiga', 'resp-legacy')")
+            conn.execute('PRAGMA user_version = 3')
+
+        print("🧱 Testando migração do esquema para a compressão...")
+
+        db_manager = DatabaseManager(db_path)
+        assert db_manager.get_message_by_response_id("resp-legacy") == 'Resposta antiga'
+        db_manager.save_message(1, 'ai', "Resposta nova e longa. " * 100, response_id="resp-new")
+        assert db_manager.get_message_by_response_id("resp-new") == "Resposta nova e longa. " * 100
+
+        print("✅ Migração funcionando corretamente!")
+
+if __name__ == "__main__":
+    test_message_codec()
+    test_message_codec_migration()
@@ -0,0 +1,109 @@
+"""
+Script de teste para a instrumentação e o endpoint /metrics
+"""
+
+import time
+
+def test_metrics_endpoint():
+    """Testa histogramas, percentis e a exposição no formato do Prometheus"""
+    
+    from metrics import MetricsRegistry
+    
+    print("📈 Testando métricas...")
+    
+    registry = MetricsRegistry()
+    latency = registry.histogram('test_latency_seconds', 'Latência de teste', ('stage',))
+    for i in range(1, 101):
+        latency.observe(i / 1000, stage='db')
+    
+    assert latency.count(stage='db') == 100
+    assert 0.04 <= latency.quantile(0.5, stage='db') <= 0.06
+    assert 0.09 <= latency.quantile(0.99, stage='db') <= 0.1
+    
+    text = registry.render()
+    assert 'test_latency_seconds_bucket{stage="db",le="+Inf"} 100' in text
+    assert 'test_latency_seconds_quantile{stage="db",quantile="0.9"}' in text
+    
+    # Custo por observação precisa ser desprezível perto da duração de uma requisição
+    started = time.perf_counter()
+    for _ in range(10000):
+        with latency.time(stage='overhead'):
+            pass
+    per_observation_us = (time.perf_counter() - started) * 100
+    print(f"⏱️ Custo por observação: {per_observation_us:.2f} µs")
+    assert per_observation_us < 50
+    
+    from app import app
+    client = app.test_client()
+    client.get('/get_conversations', headers={'X-Forwarded-For': '10.0.0.6'})
+    body = client.get('/metrics').data.decode()
+    assert 'http_requests_total{route="/get_conversations",method="GET",status="200"}' in body
+    assert 'db_queries_total{statement="SELECT"}' in body
+    
+    print("✅ Métricas funcionando corretamente!")
+
+def test_shared_metrics():
+    """Testa a soma das métricas de vários processos (workers do gunicorn) pelo arquivo compartilhado"""
+    
+    import multiprocessing
+    import os
+    import sqlite3
+    import subprocess
+    import sys
+    import tempfile
+    from metrics import MetricsRegistry, SharedMetrics
+    
+    print("📈 Testando métricas somadas entre processos...")
+    
+    def build():
+        registry = MetricsRegistry()
+        return (registry, registry.counter('test_requests_total', 'Requisições', ('route',)),
+                registry.gauge('test_in_flight', 'Em andamento'),
+                registry.gauge('test_up', 'No ar', multiprocess_mode='livemax'),
+                registry.histogram('test_latency_seconds', 'Latência'))
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'metrics.db')
+        registry, requests_total, in_flight, up, latency = build()
+        shared = SharedMetrics(path, registry, interval=0)
+        requests_total.inc(2, route='/chat')
+        in_flight.inc()
+        latency.observe(0.2)
+        
+        # Worker filho: herda os valores do mestre, zera no fork e publica só os próprios
+        def worker():
+            requests_total.inc(3, route='/chat')
+            up.set(1)
+            latency.observe(0.4)
+            shared.stop()
+        child = multiprocessing.get_context('fork').Process(target=worker)
+        child.start()
+        child.join()
+        assert child.exitcode == 0
+        
+        text = shared.render()
+        assert 'test_requests_total{route="/chat"} 5' in text
+        assert 'test_latency_seconds_count 2' in text and 'test_latency_seconds_sum 0.6000000000000001' in text
+        assert 'test_in_flight 1' in text and 'test_up 1' in text
+        
+        # Worker que parou de publicar: os contadores continuam na soma, os gauges não
+        with sqlite3.connect(path) as conn:
+            conn.execute('UPDATE worker_metrics SET updated_at = updated_at - 60 WHERE worker != ?', (shared.worker_id,))
+        text = shared.render()
+        assert 'test_requests_total{route="/chat"} 5' in text and 'test_latency_seconds_count 2' in text
+        assert '\ntest_up ' not in text and 'test_in_flight 1' in text
+    
+    # Com mais de um worker, o gunicorn.conf.py compartilha o limite e as métricas
+    env = dict(os.environ, WEB_CONCURRENCY='2', DATABASE_PATH='/dados/chat.db')
+    env.pop('RATE_LIMIT_URL', None)
+    env.pop('METRICS_URL', None)
+    code = "import os, runpy; runpy.run_path('gunicorn.conf.py'); print(os.environ['RATE_LIMIT_URL'], os.environ['METRICS_URL'])"
+    output = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.split()
+    assert output == ['sqlite:////dados/chat_ratelimit.db', 'sqlite:////dados/chat_metrics.db']
+    
+    print("✅ Métricas somadas entre processos funcionando corretamente!")
+
+if __name__ == "__main__":
+    test_metrics_endpoint()
+    test_shared_metrics()
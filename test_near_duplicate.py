@@ -0,0 +1,176 @@
+"""
+Script de teste para a detecção de perguntas quase duplicadas (SimHash)
+"""
+
+import os
+import tempfile
+import time
+
+def test_near_duplicate_index():
+    """Testa o reconhecimento de perguntas reformuladas, o escopo por usuário e o índice compartilhado entre workers"""
+
+    from app import DatabaseManager
+    from near_duplicate import SimHashIndex, hamming_distance, normalize_question, simhash, band_keys, to_signed
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager = DatabaseManager(os.path.join(tmp_dir, 'simhash.db'))
+        user_a = db_manager.get_user_id("10.0.0.21")
+        user_b = db_manager.get_user_id("10.0.0.22")
+
+        print("♻️ Testando índice SimHash...")
+
+        # Normalização ignora acentos, pontuação e caixa
+        assert normalize_question("Como REINICIAR o serviço?") == normalize_question("como reiniciar o servico")
+
+        question = "Como faço para reiniciar o serviço de backup do servidor de arquivos?"
+        # Reformulações que mudam palavras de verdade (não só acentos ou stopwords)
+        plural = "Como faço pra reiniciar o servico de backups do servidor de arquivos"
+        longer = "Como faço para reiniciar o serviço de backup do servidor de arquivos hoje?"
+        different = "Qual é a política de senhas para contas de administrador do domínio?"
+        other_action = "Como faço para parar o serviço de backup do servidor de arquivos?"
+        for rephrased in (plural, longer):
+            assert normalize_question(rephrased) != normalize_question(question)
+            assert hamming_distance(simhash(normalize_question(question)),
+                                    simhash(normalize_question(rephrased))) <= 5
+
+        index = SimHashIndex(db_manager)
+        fp = index.fingerprint
+        index.add(user_a, fp(question), "resp-1")
+
+        assert index.lookup(user_a, fp(plural))[0] == "resp-1"
+        assert index.lookup(user_a, fp(longer))[0] == "resp-1"
+        assert index.lookup(user_a, fp(different)) is None
+        assert index.lookup(user_a, fp(other_action)) is None
+        # Perguntas curtas (follow-ups dependentes de contexto) não são comparadas
+        assert fp("E o clima?") is None and index.lookup(user_a, None) is None
+
+        # A resposta foi gerada com o histórico de A: nunca é oferecida a outro usuário
+        assert index.lookup(user_b, fp(question)) is None
+        assert index.lookup(user_b, fp(plural)) is None
+
+        # Outro worker (outra instância do índice, criada antes) enxerga na hora o que foi
+        # registrado depois: as impressões são lidas do SQLite compartilhado a cada busca
+        other_worker = SimHashIndex(DatabaseManager(os.path.join(tmp_dir, 'simhash.db')))
+        other_question = "Onde encontro os logs de acesso do servidor de arquivos?"
+        assert other_worker.lookup(user_a, fp(other_question)) is None
+        index.add(user_a, fp(other_question), "resp-2")
+        assert other_worker.lookup(user_a, fp(other_question))[0] == "resp-2"
+        assert other_worker.lookup(user_a, fp(question))[0] == "resp-1"
+        assert other_worker.lookup(user_b, fp(question)) is None
+
+        # Muitas perguntas guardadas: a busca por bandas só olha os candidatos que dividem bandas
+        with db_manager._connect() as conn:
+            for i in range(5000):
+                fingerprint = fp(f"Pergunta número {i} sobre o assunto {i * 7919}")
+                fingerprint_id = conn.execute(
+                    'INSERT INTO question_fingerprints (user_id, fingerprint, response_id, created_at) '
+                    'VALUES (?, ?, ?, ?)', (user_a, to_signed(fingerprint), f"bulk-{i}", time.time())
+                ).lastrowid
+                conn.executemany('INSERT INTO question_fingerprint_bands (user_id, band_key, fingerprint_id) '
+                                 'VALUES (?, ?, ?)', [(user_a, key, fingerprint_id) for key in band_keys(fingerprint)])
+        assert other_worker.lookup(user_a, fp(plural))[0] == "resp-1"
+
+        long_question = ("Como configuro o backup incremental do servidor de arquivos com retenção "
+                         "de trinta dias e cópia para a nuvem? " * 6)
+        started = time.perf_counter()
+        for _ in range(200):
+            fingerprint = fp(long_question)
+        fingerprint_ms = (time.perf_counter() - started) * 1000 / 200
+        started = time.perf_counter()
+        for _ in range(200):
+            other_worker.lookup(user_a, fingerprint)
+        lookup_ms = (time.perf_counter() - started) * 1000 / 200
+        print(f"⏱️ Impressão ({len(long_question)} caracteres): {fingerprint_ms:.3f} ms, "
+              f"busca entre 5000 impressões: {lookup_ms:.3f} ms")
+        assert fingerprint_ms < 1.5 and lookup_ms < 1.5
+
+        # Banco de antes da tabela de bandas (esquema 6): a migração indexa as impressões existentes
+        legacy_path = os.path.join(tmp_dir, 'legacy.db')
+        legacy = DatabaseManager(legacy_path)
+        legacy_user = legacy.get_user_id("10.0.0.23")
+        with legacy._connect() as conn:
+            conn.execute('INSERT INTO question_fingerprints (user_id, fingerprint, response_id, created_at) '
+                         'VALUES (?, ?, ?, ?)', (legacy_user, to_signed(fp(question)), "resp-legacy", time.time()))
+            conn.execute('PRAGMA user_version = 6')
+        migrated = SimHashIndex(DatabaseManager(legacy_path))
+        assert migrated.lookup(legacy_user, fp(plural))[0] == "resp-legacy"
+
+        print("✅ Detecção de perguntas semelhantes funcionando corretamente!")
+
+class StubResponse:
+    status_code = 200
+
+    def __init__(self, text):
+        self.text = text
+
+    def json(self):
+        if self.text is None:
+            return {"outputs": []}
+        return {"outputs": [{"outputs": [{"results": {"message": {"data": {"text": self.text}}}}]}]}
+
+class StubSession:
+    """Sessão HTTP no lugar do Langflow: responde 200 com o texto configurado (None: sem texto)"""
+    def __init__(self):
+        self.text = None
+        self.calls = 0
+
+    def post(self, url, **kwargs):
+        self.calls += 1
+        return StubResponse(self.text)
+
+def test_near_duplicate_chat():
+    """Testa o /chat: respostas de erro não são indexadas e a sugestão fica restrita ao usuário"""
+
+    import app as chatbot
+    from near_duplicate import SimHashIndex
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        limiter = chatbot.rate_limiter
+        original = (chatbot.db_manager, chatbot.near_duplicate_index, chatbot.langflow_session, limiter.limits)
+        limiter.limits = {'chat': (1e9, 1e9), 'read': (1e9, 1e9)}
+        chatbot.db_manager = chatbot.DatabaseManager(os.path.join(tmp_dir, 'chat.db'))
+        chatbot.near_duplicate_index = SimHashIndex(chatbot.db_manager)
+        chatbot.langflow_session = session = StubSession()
+        try:
+            client = chatbot.app.test_client()
+            user_a = {'X-Forwarded-For': '10.0.0.31'}
+            user_b = {'X-Forwarded-For': '10.0.0.32'}
+            question = "Como faço para reiniciar o serviço de backup do servidor de arquivos?"
+            rephrased = "Como faço para reiniciar o serviço de backup do servidor de arquivos hoje?"
+
+            print("♻️ Testando perguntas semelhantes no /chat...")
+
+            # 200 sem texto: a resposta de erro não pode ser servida depois como "resposta semelhante"
+            fallback = client.post('/chat', json={'message': question}, headers=user_a).get_json()
+            assert fallback['response'] == "Desculpe, não consegui interpretar a resposta."
+            user_a_id = chatbot.db_manager.get_user_id('10.0.0.31')
+            index = chatbot.near_duplicate_index
+            assert index.lookup(user_a_id, index.fingerprint(question)) is None
+
+            session.text = "Reinicie o serviço com systemctl restart backup."
+            answered = client.post('/chat', json={'message': question}, headers=user_a).get_json()
+            assert 'near_duplicate' not in answered
+
+            # Mesmo usuário: a resposta anterior é indicada, mas o agente responde de novo (padrão)
+            calls = session.calls
+            lookups = chatbot.db_manager.get_response_with_question
+            chatbot.db_manager.get_response_with_question = None  # a resposta tem que vir do cache
+            try:
+                again = client.post('/chat', json={'message': rephrased}, headers=user_a).get_json()
+            finally:
+                chatbot.db_manager.get_response_with_question = lookups
+            assert again['near_duplicate']['response_id'] == answered['response_id']
+            assert again['near_duplicate']['reused'] is False
+            assert session.calls == calls + 1
+
+            # Outro usuário com a mesma pergunta: nada do histórico de A
+            other = client.post('/chat', json={'message': question}, headers=user_b).get_json()
+            assert 'near_duplicate' not in other
+
+            print("✅ Perguntas semelhantes no /chat funcionando corretamente!")
+        finally:
+            chatbot.db_manager, chatbot.near_duplicate_index, chatbot.langflow_session, limiter.limits = original
+
+if __name__ == "__main__":
+    test_near_duplicate_index()
+    test_near_duplicate_chat()
@@ -0,0 +1,198 @@
+"""
+Script de teste para a instrumentação do SQLite e a regressão dos planos de consulta
+"""
+
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+
+# "SCAN <tabela>" sem índice = leitura da tabela inteira ("SCAN (subquery-N)" é só o resultado de uma subconsulta)
+FULL_SCAN = re.compile(r'^SCAN (?!\()(\w+)(?!.*USING (COVERING )?INDEX)')
+
+class CallRecorder:
+    """Repassa as chamadas ao DatabaseManager registrando quais métodos foram usados"""
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.called = set()
+
+    def __getattr__(self, name):
+        self.called.add(name)
+        return getattr(self.db_manager, name)
+
+def exercise_database_manager(db):
+    """Executa todos os métodos públicos do DatabaseManager"""
+    user_id = db.get_user_id('10.0.0.8')
+    db.get_user_id('10.0.0.8')
+    conversation_id = db.get_current_conversation_id(user_id)
+    db.get_current_conversation_id(user_id)
+
+    message_id = db.save_message(conversation_id, 'user', 'Como configurar o backup do servidor?')
+    db.save_message(conversation_id, 'ai', 'Use o agendador de tarefas.', 'plan-response')
+
+    db.get_conversation_history(user_id)
+    db.get_recent_session_messages(conversation_id)
+    db.get_user_conversations(user_id)
+    db.get_conversation_messages(conversation_id, user_id)
+    db.get_conversation_messages(conversation_id, user_id, limit=10)
+    db.get_conversation_messages_page(conversation_id)
+    db.get_conversation_messages_page(conversation_id, before_id=message_id + 1)
+    db.get_messages_since(conversation_id, 0)
+    db.get_conversation_version(conversation_id)
+    db.update_conversation_title(conversation_id, 'Backup')
+    db.search_conversations(user_id, 'backup')
+
+    db.get_messages_after(0)
+    db.save_embeddings([(message_id, [0.1, 0.2])], 'plan-model', 'plan-checkpoint', message_id)
+    db.get_message_embedding(message_id)
+    db.get_checkpoint('plan-checkpoint')
+
+    db.get_last_summarized_id(conversation_id)
+    db.get_unsummarized_messages(conversation_id, 0)
+    summary_id = db.save_summary(conversation_id, 0, 1, 2, 'Resumo')
+    db.save_summary(conversation_id, 1, 1, 2, 'Resumo do resumo', [summary_id])
+    db.get_active_summaries(conversation_id)
+
+    db.save_question_fingerprint(user_id, 42, [42, 256], 'plan-response', time.time())
+    db.get_question_fingerprint_candidates(user_id, [42, 256, 512], 2, 0)
+    db.get_message_by_response_id('plan-response')
+    db.get_response_with_question('plan-response')
+    db.checkpoint_wal()
+    db.claim_chat_request(1, 'plan-key', 'hash', 3600, 60)
+    db.update_chat_request(1, 'plan-key', 'completed', response_id='plan-response')
+    db.get_chat_request(1, 'plan-key')
+
+    db.get_archive_candidates(0)
+    db.get_archivable_messages(conversation_id, 0, 12, message_id)
+    archived_id = db.save_message(conversation_id, 'ai', 'Resposta arquivada.', 'plan-archived')
+    rows = [(archived_id, 'ai', 'Resposta arquivada.', '2020-01-01 00:00:00', 'plan-archived')]
+    db.archive_message_block(conversation_id, rows, db.archive.append(conversation_id, rows))
+    db.get_message_by_response_id('plan-archived')
+    db.get_response_with_question('plan-archived')
+
+    db.save_message(conversation_id, 'ai', 'Resposta longa sobre backup. ' * 100, 'plan-compressed')
+    rows = db.get_uncompressed_messages(0, 0)
+    db.update_message_contents([(rows[0][0], *db.content_codec.encode(rows[0][1]))])
+    db.get_dictionary_samples(10)
+    db.save_content_dictionary(b'plan-dictionary')
+
+def test_query_plans():
+    """Roda EXPLAIN QUERY PLAN em todas as consultas do DatabaseManager e falha em full table scans"""
+
+    import app as chatbot
+
+    print("🗺️ Testando planos de consulta...")
+
+    temp_db = tempfile.NamedTemporaryFile(suffix='.db', delete=False)
+    temp_db.close()
+
+    try:
+        recorder = CallRecorder(chatbot.DatabaseManager(temp_db.name))
+        with chatbot.capture_queries() as statements:
+            exercise_database_manager(recorder)
+
+        # Um método novo precisa entrar no exercício acima para ter o plano verificado
+        public_methods = {name for name, value in vars(chatbot.DatabaseManager).items()
+                          if callable(value) and not name.startswith('_') and name != 'init_database'}
+        missing = public_methods - recorder.called
+        assert not missing, f"Métodos sem verificação de plano: {sorted(missing)}"
+
+        conn = sqlite3.connect(temp_db.name)
+        # As consultas leem o conteúdo pela função registrada em cada conexão do DatabaseManager
+        conn.create_function('message_content', 2, lambda content, codec: content)
+        scans = []
+        checked = 0
+        for statement in dict.fromkeys(statements):
+            if statement.split(None, 1)[0].upper() not in ('SELECT', 'UPDATE', 'DELETE', 'WITH'):
+                continue
+            # O plano não depende dos valores, então todos os parâmetros viram NULL
+            plan = conn.execute('EXPLAIN QUERY PLAN ' + statement, [None] * statement.count('?')).fetchall()
+            checked += 1
+            for row in plan:
+                if FULL_SCAN.match(row[3]):
+                    scans.append(f"{row[3]}  <-  {statement[:120]}")
+        conn.close()
+
+        print(f"📋 Consultas verificadas: {checked}")
+        assert not scans, "Consultas lendo a tabela inteira:\n" + "\n".join(scans)
+
+        # Tempo e linhas por comando chegam às estatísticas
+        stats = {entry['sql']: entry for entry in chatbot.QUERY_STATS.snapshot(limit=500)}
+        entry = stats['SELECT message_content(content, content_codec) FROM messages WHERE response_id = ?']
+        assert entry['calls'] >= 1 and entry['rows'] >= 1
+        assert stats['UPDATE conversations SET title = ? WHERE id = ?']['rows'] >= 1
+
+        print("✅ Nenhuma consulta com full table scan!")
+
+    finally:
+        os.unlink(temp_db.name)
+        shutil.rmtree(os.path.splitext(temp_db.name)[0] + '_archive', ignore_errors=True)
+
+def test_slow_query_log():
+    """Testa o registro de consultas acima do limite de lentidão"""
+
+    import logging
+    import app as chatbot
+
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    chatbot.logger.addHandler(handler)
+    original = chatbot.DB_SLOW_QUERY_MS
+    chatbot.DB_SLOW_QUERY_MS = 0
+
+    try:
+        chatbot.db_manager.get_checkpoint('slow-query-test')
+    finally:
+        chatbot.DB_SLOW_QUERY_MS = original
+        chatbot.logger.removeHandler(handler)
+
+    slow = [record for record in records if record.getMessage() == 'slow_query']
+    assert slow and slow[0].fields['sql'] == 'SELECT last_id FROM worker_checkpoints WHERE name = ?'
+    assert slow[0].fields['rows'] == 0
+    print("✅ Log de consultas lentas funcionando corretamente!")
+
+def test_db_stats_endpoint():
+    """Testa o /admin/db_stats: ranking dos comandos e validação do limit"""
+
+    import app as chatbot
+    from metrics import MetricsRegistry, SharedMetrics
+
+    profiler = chatbot.request_profiler
+    original = profiler.admin_token
+    original_shared = chatbot.shared_metrics
+    profiler.admin_token = 'segredo'
+    try:
+        client = chatbot.app.test_client()
+        admin = {'X-Admin-Token': 'segredo', 'X-Forwarded-For': '10.0.0.8'}
+        chatbot.db_manager.get_checkpoint('db-stats-test')
+
+        stats = client.get('/admin/db_stats?limit=1', headers=admin).get_json()
+        assert len(stats['statements']) == 1
+        assert client.get('/admin/db_stats?limit=100000', headers=admin).status_code == 200
+        for limit in ('abc', '0', '-3'):
+            assert client.get(f'/admin/db_stats?limit={limit}', headers=admin).status_code == 400
+
+        # Com METRICS_URL compartilhada, as estatísticas somam as de todos os workers
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            other_worker = chatbot.QueryStats()
+            other_worker.record('SELECT 1 FROM outro_worker', 2.0, 7)
+            path = os.path.join(tmp_dir, 'metrics.db')
+            SharedMetrics(path, MetricsRegistry(), sources={'query_stats': other_worker}, interval=0).publish()
+            chatbot.shared_metrics = SharedMetrics(path, chatbot.REGISTRY, sources={'query_stats': chatbot.QUERY_STATS},
+                                                   interval=0)
+            stats = client.get('/admin/db_stats', headers=admin).get_json()['statements']
+            assert stats[0] == {'sql': 'SELECT 1 FROM outro_worker', 'calls': 1, 'total_ms': 2000.0,
+                                'mean_ms': 2000.0, 'max_ms': 2000.0, 'rows': 7}
+            assert any(entry['sql'] == 'SELECT last_id FROM worker_checkpoints WHERE name = ?' for entry in stats)
+    finally:
+        profiler.admin_token = original
+        chatbot.shared_metrics = original_shared
+    print("✅ Estatísticas das consultas funcionando corretamente!")
+
+if __name__ == "__main__":
+    test_query_plans()
+    test_slow_query_log()
+    test_db_stats_endpoint()
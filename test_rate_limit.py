@@ -0,0 +1,106 @@
+"""
+Script de teste para o limite de requisições por usuário
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from rate_limit import MemoryBuckets, RateLimiter, SQLiteBuckets
+
+
+def test_token_buckets():
+    """Testa rajada, reposição, Retry-After e o nível compartilhado entre processos"""
+
+    print("🚦 Testando token buckets...")
+
+    # Rajada de 3 e 60 fichas por segundo (uma a cada ~17 ms)
+    buckets = MemoryBuckets()
+    assert [buckets.take('u', 60, 3) for _ in range(3)] == [0, 0, 0]
+    wait = buckets.take('u', 60, 3)
+    assert 0 < wait <= 1 / 60
+    assert buckets.take('outro', 60, 3) == 0
+    time.sleep(0.05)
+    assert buckets.take('u', 60, 3) == 0
+
+    # Só os usuários mais recentes ficam na memória
+    small = MemoryBuckets(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        small.take(key, 1, 1)
+    assert list(small._buckets) == ['b', 'c']
+
+    # Dois workers com baldes locais cheios ainda respeitam o limite global
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp_dir, 'limits.db')
+        worker_a = RateLimiter(limits={'chat': (1, 2)}, shared=SQLiteBuckets(path))
+        worker_b = RateLimiter(limits={'chat': (1, 2)}, shared=SQLiteBuckets(path))
+        assert worker_a.check('ip', 'chat') == 0
+        assert worker_b.check('ip', 'chat') == 0
+        assert worker_a.check('ip', 'chat') > 0
+        assert worker_b.check('ip', 'chat') > 50
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # A checagem em memória custa poucos microssegundos
+    limiter = RateLimiter(limits={'read': (1e9, 1e9)})
+    iterations = 20000
+    started = time.perf_counter()
+    for _ in range(iterations):
+        limiter.check('ip', 'read')
+    per_check_us = (time.perf_counter() - started) / iterations * 1e6
+    print(f"   {per_check_us:.2f} µs por checagem")
+    assert per_check_us < 50
+
+    print("✅ Token buckets funcionando corretamente!")
+
+def test_rate_limited_routes():
+    """Testa o 429 com Retry-After no /chat antes de qualquer acesso ao banco ou ao Langflow"""
+
+    import app as chatbot
+    from fake_langflow import FakeLangflow
+
+    print("🚦 Testando limite nas rotas...")
+
+    limiter = chatbot.rate_limiter
+    tmp_dir = tempfile.mkdtemp()
+    fake = FakeLangflow(latency_ms=0, max_chars=300).start()
+    original = (chatbot.db_manager, chatbot.LANGFLOW_URL, limiter.limits, limiter.local)
+    limiter.limits = {'chat': (1 / 60, 2), 'read': (1 / 60, 3)}
+    limiter.local = MemoryBuckets()
+    try:
+        chatbot.db_manager = chatbot.DatabaseManager(os.path.join(tmp_dir, 'test.db'))
+        chatbot.LANGFLOW_URL = fake.url
+        client = chatbot.app.test_client()
+        abusive = {'X-Forwarded-For': '10.0.0.66'}
+
+        # Dentro da rajada a mensagem vai ao agente; acima dela, 429 sem SQL e sem Langflow
+        for i in range(2):
+            payload = {'message': f'Como configuro o backup do servidor {i}?', 'fresh': True}
+            assert client.post('/chat', json=payload, headers=abusive).status_code == 200
+        db_manager, chatbot.db_manager = chatbot.db_manager, None
+        response = client.post('/chat', json={'message': 'oi'}, headers=abusive)
+        chatbot.db_manager = db_manager
+        assert response.status_code == 429 and fake.requests == 2
+        assert int(response.headers['Retry-After']) >= 1
+        assert response.get_json()['retry_after'] == int(response.headers['Retry-After'])
+        assert chatbot.RATE_LIMITED.value(budget='chat') >= 1
+
+        # Orçamentos separados, por usuário; rotas fora do mapa não são limitadas
+        assert client.get('/metrics', headers=abusive).status_code == 200
+        statuses = [client.get('/get_current_conversation', headers=abusive).status_code for _ in range(4)]
+        assert statuses == [200, 200, 200, 429]
+        other = {'X-Forwarded-For': '10.0.0.67'}
+        assert client.post('/chat', json={'message': 'oi', 'fresh': True}, headers=other).status_code == 200
+
+        print("✅ Limite nas rotas funcionando corretamente!")
+
+    finally:
+        chatbot.db_manager, chatbot.LANGFLOW_URL, limiter.limits, limiter.local = original
+        fake.stop()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_token_buckets()
+    test_rate_limited_routes()
@@ -0,0 +1,85 @@
+"""
+Script de teste para o profiling sob demanda das requisições
+"""
+
+import io
+import os
+import pstats
+import shutil
+import tempfile
+
+def test_request_profiler():
+    """Testa a restrição a administradores, os dois modos e o buffer das mais lentas"""
+
+    import app as chatbot
+    from request_profiler import RequestProfiler
+
+    print("🔬 Testando profiling sob demanda...")
+
+    profiler = chatbot.request_profiler
+    original = (profiler.admin_token, profiler.output_dir, profiler.keep_slowest, profiler.keep_recent_seconds)
+    output_dir = tempfile.mkdtemp()
+    profiler.admin_token = 'segredo'
+    profiler.output_dir = output_dir
+    profiler.keep_slowest = 2
+    profiler.keep_recent_seconds = 0
+
+    try:
+        client = chatbot.app.test_client()
+        ip = {'X-Forwarded-For': '10.0.0.7'}
+        admin = {'X-Admin-Token': 'segredo', **ip}
+
+        # Sem token válido o pedido de profiling é ignorado e o endpoint é negado
+        response = client.get('/get_current_conversation', headers={'X-Profile': 'cprofile', **ip})
+        assert 'X-Profile-Id' not in response.headers
+        assert client.get('/admin/profiles', headers={'X-Admin-Token': 'errado'}).status_code == 403
+
+        response = client.get('/get_current_conversation?profile=cprofile', headers=admin)
+        cprofile_id = response.headers['X-Profile-Id']
+
+        response = client.get('/get_current_conversation', headers={'X-Profile': 'sample', **admin})
+        sample_id = response.headers['X-Profile-Id']
+
+        listing = client.get('/admin/profiles', headers=admin).get_json()['profiles']
+        assert {entry['id'] for entry in listing} == {cprofile_id, sample_id}
+        assert listing[0]['duration_ms'] >= listing[1]['duration_ms']
+
+        # O arquivo .pstats baixado é carregável pelo pstats
+        data = client.get(f'/admin/profiles/{cprofile_id}', headers=admin).data
+        path = os.path.join(output_dir, 'baixado.pstats')
+        with open(path, 'wb') as f:
+            f.write(data)
+        stats = pstats.Stats(path, stream=io.StringIO())
+        assert any(func[2] == 'get_current_conversation' for func in stats.stats)
+
+        text = client.get(f'/admin/profiles/{cprofile_id}?format=text', headers=admin).data.decode()
+        assert 'get_current_conversation' in text
+        text = client.get(f'/admin/profiles/{cprofile_id}?format=text&sort=time&limit=5', headers=admin)
+        assert text.status_code == 200
+        for query in ('sort=bogus', 'limit=x', 'limit=0'):
+            response = client.get(f'/admin/profiles/{cprofile_id}?format=text&{query}', headers=admin)
+            assert response.status_code == 400, query
+
+        # Só as N mais lentas ficam guardadas (e em disco), além da recém-gravada:
+        # o id devolvido no cabeçalho sempre pode ser baixado
+        for _ in range(3):
+            response = client.get('/get_current_conversation', headers={'X-Profile': '1', **admin})
+            profile_id = response.headers['X-Profile-Id']
+            assert client.get(f'/admin/profiles/{profile_id}', headers=admin).status_code == 200
+        entries = profiler.entries()
+        assert len(entries) in (2, 3) and profile_id in {entry['id'] for entry in entries}
+        files = [name for name in os.listdir(output_dir) if not name.startswith('baixado')]
+        assert len(files) == 2 * len(entries)
+
+        # O índice está no diretório compartilhado: outro worker lista e entrega os mesmos perfis
+        other_worker = RequestProfiler(admin_token='segredo', output_dir=output_dir, keep_slowest=2)
+        assert other_worker.entries() == entries
+
+        print("✅ Profiling sob demanda funcionando corretamente!")
+
+    finally:
+        profiler.admin_token, profiler.output_dir, profiler.keep_slowest, profiler.keep_recent_seconds = original
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_request_profiler()
@@ -0,0 +1,48 @@
+"""
+Script de teste para a compressão das respostas JSON de histórico
+"""
+
+import gzip
+import os
+import tempfile
+
+def test_json_compression():
+    """Testa a negociação, o limite de tamanho e a compressão do corpo"""
+    
+    import app as chatbot
+    from app import DatabaseManager
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_db = chatbot.db_manager
+        chatbot.db_manager = DatabaseManager(os.path.join(tmp_dir, 'compression.db'))
+        try:
+            client = chatbot.app.test_client()
+            headers = {'X-Forwarded-For': '10.0.0.3'}
+            
+            print("🗜️ Testando compressão das respostas JSON...")
+            
+            # Conversa vazia: corpo pequeno não é comprimido
+            small = client.get('/get_current_conversation', headers={**headers, 'Accept-Encoding': 'gzip'})
+            assert 'Content-Encoding' not in small.headers
+            assert 'Accept-Encoding' in small.headers['Vary']
+            
+            user_id = chatbot.db_manager.get_user_id('10.0.0.3')
+            conversation_id = chatbot.db_manager.get_current_conversation_id(user_id)
+            for i in range(200):
+                chatbot.db_manager.save_message(conversation_id, 'ai', f"Resposta longa número {i}. " * 80)
+            
+            plain = client.get('/get_current_conversation', headers=headers)
+            assert 'Content-Encoding' not in plain.headers
+            
+            compressed = client.get('/get_current_conversation', headers={**headers, 'Accept-Encoding': 'gzip'})
+            assert compressed.headers['Content-Encoding'] == 'gzip'
+            assert int(compressed.headers['Content-Length']) == len(compressed.data)
+            assert gzip.decompress(compressed.data) == plain.data
+            assert len(compressed.data) < len(plain.data) / 5
+            
+            print("✅ Compressão das respostas funcionando corretamente!")
+        finally:
+            chatbot.db_manager = original_db
+
+if __name__ == "__main__":
+    test_json_compression()
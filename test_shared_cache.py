@@ -0,0 +1,130 @@
+"""
+Script de teste para o cache em dois níveis compartilhado entre workers
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from shared_cache import LocalLRU, RedisBackend, SQLiteBackend, TieredCache
+
+
+class FakeRedis:
+    """Substituto local de um cliente Redis (mesma API do redis-py usada pelo adaptador)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.time():
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (value.encode('utf-8'), time.time() + ex if ex else None)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def test_shared_cache():
+    """Testa o LRU local, o nível SQLite visto por dois "workers" e o adaptador Redis"""
+
+    print("🗄️ Testando cache em dois níveis...")
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        # LRU: descarta o menos usado e respeita o TTL
+        lru = LocalLRU(max_items=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        assert lru.get('b') == (False, None)
+        assert lru.get('a') == (True, 1)
+        lru.set('d', 4, ttl=0.01)
+        time.sleep(0.02)
+        assert lru.get('d') == (False, None)
+
+        # Dois processos = dois níveis locais sobre o mesmo arquivo SQLite
+        path = os.path.join(tmp_dir, 'cache.db')
+        worker_a = TieredCache('responses', SQLiteBackend(path))
+        worker_b = TieredCache('responses', SQLiteBackend(path))
+        worker_a.set('r1', {'response': 'texto', 'question': 'pergunta'})
+
+        assert worker_b.get('r1') == {'response': 'texto', 'question': 'pergunta'}
+        assert worker_b.get('r1')['response'] == 'texto'
+        stats = worker_b.stats()
+        assert stats['local'] == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+        assert stats['shared'] == {'hits': 1, 'misses': 0, 'hit_rate': 1.0}
+
+        # Faltas não são guardadas; o nome do cache separa as chaves no nível compartilhado
+        assert worker_b.get_or_set('inexistente', lambda: None) is None
+        assert TieredCache('html', SQLiteBackend(path)).get('r1') is None
+
+        # A limpeza mantém só as entradas mais recentes (a de 'r1' é a mais antiga de todas)
+        backend = SQLiteBackend(path, max_entries=3)
+        for i in range(5):
+            backend.set(f'k{i}', i)
+        backend.prune()
+        assert [backend.get(f'k{i}')[0] for i in range(5)] == [False, False, True, True, True]
+
+        # Adaptador Redis contra o substituto local
+        fake = FakeRedis()
+        cache = TieredCache('html', RedisBackend(fake), ttl=60)
+        cache.set('r2', '<p>ok</p>')
+        assert b'<p>ok</p>' in fake.data['chatbot:html:r2'][0]
+        assert TieredCache('html', RedisBackend(fake)).get('r2') == '<p>ok</p>'
+        cache.delete('r2')
+        assert TieredCache('html', RedisBackend(fake)).get('r2') is None
+
+        print("✅ Cache em dois níveis funcionando corretamente!")
+
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def test_view_html_uses_cache():
+    """Testa que /view_html busca no banco uma vez e depois serve o corpo do cache"""
+
+    import app as chatbot
+
+    print("🗄️ Testando cache do /view_html...")
+
+    tmp_dir = tempfile.mkdtemp()
+    original = (chatbot.db_manager, chatbot.response_cache, chatbot.html_cache)
+    try:
+        db_manager = chatbot.DatabaseManager(os.path.join(tmp_dir, 'test.db'))
+        chatbot.db_manager = db_manager
+        shared = SQLiteBackend(os.path.join(tmp_dir, 'cache.db'))
+        chatbot.response_cache = TieredCache('responses', shared)
+        chatbot.html_cache = TieredCache('html', shared)
+
+        user_id = db_manager.get_user_id('10.0.0.9')
+        conversation_id = db_manager.get_current_conversation_id(user_id)
+        db_manager.save_message(conversation_id, 'user', 'Como reinicio o serviço?')
+        db_manager.save_message(conversation_id, 'ai', '**Passo 1:** reinicie o serviço', 'resp-cache')
+
+        client = chatbot.app.test_client()
+        first = client.get('/view_html/resp-cache').data.decode()
+        assert '<strong>Passo 1:</strong>' in first
+        assert '<strong>Passo 1:</strong>' in client.get('/view_html/resp-cache').data.decode()
+        assert chatbot.html_cache.stats()['local']['hits'] == 1
+        assert chatbot.response_cache.stats()['local']['misses'] == 1
+
+        # Outro worker: o corpo vem do nível compartilhado, sem tocar no banco
+        chatbot.html_cache = TieredCache('html', shared)
+        chatbot.db_manager = None
+        assert '<strong>Passo 1:</strong>' in client.get('/view_html/resp-cache').data.decode()
+        assert chatbot.html_cache.stats()['shared']['hits'] == 1
+
+        print("✅ Cache do /view_html funcionando corretamente!")
+
+    finally:
+        chatbot.db_manager, chatbot.response_cache, chatbot.html_cache = original
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_shared_cache()
+    test_view_html_uses_cache()
@@ -0,0 +1,110 @@
+"""
+Script de teste para o tempo de subida (import do app e inicialização do banco)
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+# Tempo próprio do módulo app (sem contar as bibliotecas que ele importa)
+IMPORT_BUDGET_MS = float(os.environ.get('STARTUP_IMPORT_BUDGET_MS', '40'))
+# Módulos que só devem ser carregados quando usados
+LAZY_MODULES = ('cProfile', 'pstats', 'embedding_backfill', 'synthetic_data')
+
+
+def parse_importtime(output):
+    """Linhas do -X importtime -> {módulo: (próprio µs, acumulado µs)}"""
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+def test_schema_version_short_circuit():
+    """Testa que um banco já na versão atual do esquema não executa DDL"""
+
+    import app as chatbot
+
+    print("⏱️ Testando versão do esquema...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'startup.db')
+        chatbot.DatabaseManager(path)
+        with sqlite3.connect(path) as conn:
+            assert conn.execute('PRAGMA user_version').fetchone()[0] == chatbot.SCHEMA_VERSION
+
+        with chatbot.capture_queries() as queries:
+            chatbot.DatabaseManager(path)
+        assert not [sql for sql in queries if sql.lstrip().upper().startswith('CREATE')]
+
+        # Banco antigo (sem versão): recebe o esquema e passa a ter a versão
+        with sqlite3.connect(path) as conn:
+            conn.execute('PRAGMA user_version = 0')
+            conn.execute('DROP TABLE worker_checkpoints')
+        chatbot.DatabaseManager(path).get_checkpoint('backfill')
+        with sqlite3.connect(path) as conn:
+            assert conn.execute('PRAGMA user_version').fetchone()[0] == chatbot.SCHEMA_VERSION
+
+    print("✅ Versão do esquema funcionando corretamente!")
+
+def test_import_time():
+    """Roda python -X importtime -c 'import app' e compara com o orçamento"""
+
+    print("⏱️ Testando tempo de import...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, DATABASE_PATH=os.path.join(tmp_dir, 'startup.db'),
+                   APP_CONFIG='development', LOG_LEVEL='WARNING')
+        # Com bytecode em cache: o custo de compilar o fonte não é o que se quer medir
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        command = [sys.executable, '-X', 'importtime', '-c', 'import app']
+        cwd = os.path.dirname(os.path.abspath(__file__))
+
+        # A primeira execução grava o bytecode
+        subprocess.run(command, env=env, cwd=cwd, capture_output=True, check=True)
+        runs = [parse_importtime(subprocess.run(command, env=env, cwd=cwd, capture_output=True,
+                                                text=True, check=True).stderr)
+                for _ in range(3)]
+
+    self_ms = min(run['app'][0] for run in runs) / 1000
+    total_ms = min(run['app'][1] for run in runs) / 1000
+    heaviest = sorted(runs[0].items(), key=lambda item: item[1][1], reverse=True)[:5]
+    print(f"   app: {self_ms:.1f} ms próprios, {total_ms:.1f} ms com dependências")
+    print("   mais pesados: " + ', '.join(f"{name} {cumulative / 1000:.0f} ms" for name, (_, cumulative) in heaviest))
+
+    assert self_ms <= IMPORT_BUDGET_MS, f"import do app levou {self_ms:.1f} ms (orçamento {IMPORT_BUDGET_MS} ms)"
+    loaded = [name for name in LAZY_MODULES if name in runs[0]]
+    assert not loaded, f"módulos carregados na subida sem necessidade: {loaded}"
+
+    print("✅ Tempo de import dentro do orçamento!")
+
+
+def test_import_creates_no_files():
+    """Testa que importar o app (como fazem os CLIs com --db) não cria o banco nem o cache no diretório atual"""
+
+    print("⏱️ Testando import sem efeitos no disco...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)), LOG_LEVEL='WARNING')
+        for name in ('DATABASE_PATH', 'CACHE_URL', 'ARCHIVE_DIR', 'APP_CONFIG'):
+            env.pop(name, None)
+        code = ("import os, app, archive_worker, message_codec; print(sorted(os.listdir('.')));"
+                "app.db_manager.get_user_id('10.0.0.1'); app.response_cache.set('r', 1);"
+                "print(sorted(os.listdir('.')))")
+        output = subprocess.run([sys.executable, '-c', code], env=env, cwd=tmp_dir, capture_output=True,
+                                text=True, check=True).stdout.splitlines()
+
+    assert output[0] == '[]', output
+    # No primeiro uso o servidor cria os arquivos de sempre
+    assert "'chatbot_memory.db'" in output[1] and "'chatbot_memory_cache.db'" in output[1]
+
+    print("✅ Import sem efeitos no disco!")
+
+if __name__ == "__main__":
+    test_schema_version_short_circuit()
+    test_import_time()
+    test_import_creates_no_files()
@@ -0,0 +1,70 @@
+"""
+Script de teste para a entrega pré-compilada da página inicial
+"""
+
+import re
+
+def test_home_page_assets():
+    """Testa ETag, cache e variantes comprimidas da página inicial e dos assets"""
+    
+    from app import app
+    client = app.test_client()
+    
+    print("📦 Testando assets estáticos da página inicial...")
+    
+    page = client.get('/')
+    assert page.status_code == 200
+    assert page.headers['Cache-Control'] == 'no-cache'
+    etag = page.headers['ETag']
+    
+    # Revalidação com o mesmo ETag não reenvia a página
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
+    
+    compressed = client.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert compressed.headers['ETag'] != etag
+    assert len(compressed.data) < len(page.data)
+    
+    urls = re.findall(r'/assets/[\w.]+', page.data.decode())
+    assert len(urls) == 2
+    for url in urls:
+        asset = client.get(url)
+        assert asset.status_code == 200
+        assert 'immutable' in asset.headers['Cache-Control']
+    
+    print("✅ Assets estáticos funcionando corretamente!")
+
+def test_inline_initial_conversation():
+    """Testa o bloco JSON com a conversa embutido na página inicial"""
+    
+    import json
+    import os
+    import tempfile
+    import app as chatbot
+    from app import DatabaseManager
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        original_db, original_flag = chatbot.db_manager, chatbot.INLINE_INITIAL_CONVERSATION
+        chatbot.db_manager = DatabaseManager(os.path.join(tmp_dir, 'inline.db'))
+        chatbot.INLINE_INITIAL_CONVERSATION = True
+        try:
+            user_id = chatbot.db_manager.get_user_id('10.0.0.5')
+            conversation_id = chatbot.db_manager.get_current_conversation_id(user_id)
+            chatbot.db_manager.save_message(conversation_id, 'ai', "Use </script> com cuidado")
+            
+            page = chatbot.app.test_client().get('/', headers={'X-Forwarded-For': '10.0.0.5'})
+            assert page.headers['Cache-Control'] == 'no-store'
+            
+            html = page.data.decode()
+            block = html.split('id="initial-conversation">')[1].split('</script>')[0]
+            data = json.loads(block)
+            assert data['messages'][0]['content'] == "Use </script> com cuidado"
+            assert html.rstrip().endswith('</html>')
+            
+            print("✅ Conversa embutida na página funcionando corretamente!")
+        finally:
+            chatbot.db_manager, chatbot.INLINE_INITIAL_CONVERSATION = original_db, original_flag
+
+if __name__ == "__main__":
+    test_home_page_assets()
+    test_inline_initial_conversation()
@@ -0,0 +1,81 @@
+"""
+Script de teste para o logging estruturado (fila + JSON + amostragem)
+"""
+
+import io
+import json
+import logging
+import logging.handlers
+import queue
+import time
+
+def test_structured_logging():
+    """Testa o formato JSON, o contexto da requisição e o descarte sem bloquear"""
+
+    from flask import Flask, g
+    from structured_logging import (
+        JsonFormatter, NonBlockingQueueHandler, RateLimitFilter, RequestContextFilter
+    )
+
+    print("🪵 Testando logging estruturado...")
+
+    stream = io.StringIO()
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(maxsize=2)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(RequestContextFilter())
+
+    logger = logging.getLogger('chatbot.test_structured')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(handler)
+
+    flask_app = Flask(__name__)
+    with flask_app.test_request_context('/chat'):
+        g.request_id = 'abc123'
+        g.user_hash = 'deadbeef0000'
+        logger.info('chat', extra={'fields': {'context_chars': 42, 'stages_ms': {'langflow': 1.5}}})
+        try:
+            raise ValueError("falha de teste")
+        except ValueError:
+            logger.exception('chat_failed')
+
+    # Fila cheia: o registro é descartado em vez de bloquear a requisição
+    started = time.perf_counter()
+    logger.info('descartado')
+    assert time.perf_counter() - started < 0.1
+    assert handler.dropped == 1
+
+    listener = logging.handlers.QueueListener(log_queue, output)
+    listener.start()
+    listener.stop()
+    logger.removeHandler(handler)
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert len(lines) == 2
+    assert lines[0]['event'] == 'chat'
+    assert lines[0]['request_id'] == 'abc123'
+    assert lines[0]['user'] == 'deadbeef0000'
+    assert lines[0]['stages_ms'] == {'langflow': 1.5}
+    assert lines[1]['event'] == 'chat_failed'
+    assert 'ValueError' in lines[1]['exception']
+
+    # Limite de taxa: no máximo 5 registros por segundo abaixo de WARNING
+    limiter = RateLimitFilter(5)
+    info = logging.LogRecord('chatbot', logging.INFO, __file__, 0, 'x', None, None)
+    error = logging.LogRecord('chatbot', logging.ERROR, __file__, 0, 'x', None, None)
+    kept = sum(limiter.filter(info) for _ in range(50))
+    assert kept <= 6
+    assert limiter.filter(error)
+
+    # Toda resposta devolve o request id usado nos logs
+    from app import app
+    response = app.test_client().get('/get_conversations', headers={'X-Request-ID': 'req-42'})
+    assert response.headers['X-Request-ID'] == 'req-42'
+
+    print("✅ Logging estruturado funcionando corretamente!")
+
+if __name__ == "__main__":
+    test_structured_logging()
@@ -0,0 +1,11 @@
+"""
+Ponto de entrada WSGI para servidores de produção.
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+"""
+
+import os
+
+os.environ.setdefault('APP_CONFIG', 'production')
+
+from app import app as application  # noqa: E402